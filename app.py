@@ -1,18 +1,26 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify, send_from_directory, send_file, redirect, Response, stream_with_context
 from flask_cors import CORS
 import os
 import sys
 import json
+import re
 import logging
+import logging.handlers
+import time
 import traceback
-from datetime import datetime
 
-# Configurar logging
+# Configurar logging (app.log é rotacionado por tamanho, mantendo alguns backups)
+LOG_FILE = 'app.log'
 logging.basicConfig(
-    level=logging.INFO,
+    level=getattr(logging, os.environ.get('LOG_LEVEL', 'INFO').upper(), logging.INFO),
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('app.log'),
+        logging.handlers.RotatingFileHandler(
+            LOG_FILE,
+            maxBytes=int(float(os.environ.get('LOG_MAX_MB', 5)) * 1024 * 1024),
+            backupCount=int(os.environ.get('LOG_BACKUP_COUNT', 3)),
+            encoding='utf-8'
+        ),
         logging.StreamHandler()
     ]
 )
@@ -20,121 +28,904 @@ logger = logging.getLogger(__name__)
 
 # Adicionar o diretório atual ao path para importar o scraper
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from scraper import setup_driver, scrape_products
+from scraper import get_working_strategy, CHROME_USER_AGENT
+from driver_pool import DriverPool, DriverPoolTimeout
+from engines import HttpEngine, SeleniumEngine, iter_search, scrape_search
+from governor import HostRateLimiter, CircuitOpenError, classify_error, set_default_limiter
+from cache import ResultCache, normalize_term
+from http_cache import DiskResponseCache
+from pricing import price_product, apply_shipping
+from jobs import Job, JobManager, JobQueueFull
+from logtail import read_tail, read_since
+from store import PriceStore
+from batch import unique_terms, run_batch, merge_products, products_to_csv
+from scheduler import WatchScheduler
+from capture import DebugCapture
+from results import ProductTable, export
+from catalog import SHARED_FIELDS, ProductIndex, compact_products, compact_rows
+from images import ImageProxy, host_allowed
+import metrics
 
 app = Flask(__name__)
 CORS(app)
 
+# Pool de navegadores reutilizáveis (evita iniciar o Chrome a cada requisição)
+driver_pool = DriverPool(
+    size=int(os.environ.get('DRIVER_POOL_SIZE', 2)),
+    max_uses=int(os.environ.get('DRIVER_MAX_USES', 50)),
+    lease_timeout=float(os.environ.get('DRIVER_LEASE_TIMEOUT', 60))
+)
+if os.environ.get('DRIVER_POOL_WARMUP', '1') != '0':
+    driver_pool.start()
+
+# Cache em disco das páginas (HTTP_CACHE_MAX_MB=0 desativa)
+HTTP_CACHE_MAX_MB = float(os.environ.get('HTTP_CACHE_MAX_MB', 200))
+http_cache = DiskResponseCache(
+    directory=os.environ.get('HTTP_CACHE_DIR', 'http_cache'),
+    ttl=float(os.environ.get('HTTP_CACHE_TTL', 60)),
+    max_bytes=int(HTTP_CACHE_MAX_MB * 1024 * 1024)
+) if HTTP_CACHE_MAX_MB > 0 else None
+
+# Engines de busca: HTTP (padrão, rápido) e Selenium (quando a página exige JS)
+http_engine = HttpEngine(
+    pool_size=int(os.environ.get('HTTP_POOL_SIZE', 10)),
+    timeout=float(os.environ.get('HTTP_TIMEOUT', 15)),
+    cache=http_cache
+)
+selenium_engine = SeleniumEngine(driver_pool)
+FETCH_ENGINES = ('auto', 'http', 'selenium')
+
+# Captura do HTML para depuração: desligada por padrão; com DEBUG_CAPTURE=1 grava
+# as páginas sem produtos ou com erros de extração e uma amostra das demais
+debug_capture = DebugCapture(
+    directory=os.environ.get('DEBUG_CAPTURE_DIR', 'debug_pages'),
+    sample_rate=float(os.environ.get('DEBUG_CAPTURE_SAMPLE', 0)),
+    max_bytes=int(float(os.environ.get('DEBUG_CAPTURE_MAX_MB', 50)) * 1024 * 1024)
+) if os.environ.get('DEBUG_CAPTURE', '0') == '1' else None
+
+# Governa todas as requisições ao site (HTTP, httpx e Selenium): concorrência e
+# balde de tokens por host, novas tentativas com espera exponencial, desaceleração
+# em 429/5xx e circuito que suspende as requisições enquanto o site estiver fora
+rate_limiter = HostRateLimiter(
+    max_concurrency=int(os.environ.get('HOST_MAX_CONCURRENCY', 3)),
+    min_interval=float(os.environ.get('HOST_MIN_INTERVAL', 0.5)),
+    burst=int(os.environ.get('HOST_BURST', 1)),
+    max_retries=int(os.environ.get('FETCH_MAX_RETRIES', 2)),
+    backoff_base=float(os.environ.get('FETCH_BACKOFF_BASE', 0.5)),
+    backoff_max=float(os.environ.get('FETCH_BACKOFF_MAX', 8)),
+    failure_threshold=int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', 5)),
+    recovery_time=float(os.environ.get('CIRCUIT_RECOVERY_TIME', 30)),
+    max_slowdown=float(os.environ.get('HOST_MAX_SLOWDOWN', 8))
+)
+# Chamadas sem governador explícito (ex: scrape_search direto) usam este mesmo
+set_default_limiter(rate_limiter)
+MAX_PAGES_LIMIT = int(os.environ.get('MAX_PAGES_LIMIT', 20))
+
+# Resultados com páginas que falharam ficam pouco tempo no cache
+PARTIAL_RESULT_TTL = float(os.environ.get('PARTIAL_RESULT_TTL', 30))
+
+# Cache de resultados por termo normalizado (o frete é aplicado depois do cache)
+result_cache = ResultCache(
+    ttl=float(os.environ.get('CACHE_TTL', 300)),
+    stale_ttl=float(os.environ.get('CACHE_STALE_TTL', 1800)),
+    max_bytes=int(float(os.environ.get('CACHE_MAX_MB', 32)) * 1024 * 1024),
+    ttl_for=lambda result: PARTIAL_RESULT_TTL if result.get('failed_pages') else None
+)
+
+# Histórico de produtos e preços (substitui os arquivos produtos_<termo>_<data>.json)
+price_store = PriceStore(
+    path=os.environ.get('STORE_PATH', 'produtos.db'),
+    retention_days=float(os.environ.get('STORE_RETENTION_DAYS', 180))
+)
+# Retenção aplicada uma vez por dia numa thread própria, fora das buscas
+price_store.start_compaction()
+
+# Miniaturas das imagens dos produtos em cache no disco (IMAGE_CACHE_MAX_MB=0 desativa;
+# o /img passa a redirecionar para a imagem original)
+IMAGE_CACHE_MAX_MB = float(os.environ.get('IMAGE_CACHE_MAX_MB', 100))
+IMAGE_PROXY_HOSTS = [host.strip().lower() for host in os.environ.get(
+    'IMAGE_PROXY_HOSTS', '.linodeobjects.com,comprasparaguai.com.br').split(',') if host.strip()]
+IMAGE_PREFETCH = os.environ.get('IMAGE_PREFETCH', '1') != '0'
+image_proxy = ImageProxy(
+    directory=os.environ.get('IMAGE_CACHE_DIR', 'image_cache'),
+    sizes=[int(size) for size in os.environ.get('IMAGE_THUMB_SIZES', '150,300').split(',')],
+    max_bytes=int(IMAGE_CACHE_MAX_MB * 1024 * 1024),
+    quality=int(os.environ.get('IMAGE_QUALITY', 80)),
+    allowed_hosts=IMAGE_PROXY_HOSTS,
+    workers=int(os.environ.get('IMAGE_PREFETCH_WORKERS', 4)),
+    user_agent=CHROME_USER_AGENT
+) if IMAGE_CACHE_MAX_MB > 0 else None
+IMAGE_MAX_AGE = 365 * 86400
+
+# Índice canônico dos produtos de todos os termos (ID do modelo + nomes parecidos),
+# semeado com os produtos mais recentes do histórico
+product_index = ProductIndex(
+    threshold=float(os.environ.get('PRODUCT_MATCH_THRESHOLD', 0.8)),
+    max_entries=int(os.environ.get('PRODUCT_INDEX_MAX', 50000))
+)
+product_index.load(price_store.recent_products(product_index.max_entries))
+logger.info(f"📇 Índice de produtos: {len(product_index)} produtos do histórico")
+
 @app.route('/')
 def index():
     return send_from_directory('.', 'index.html')
 
+def parse_scrape_params(data):
+    """Valida o corpo JSON de uma busca; levanta ValueError com a mensagem de erro"""
+    if not isinstance(data, dict):
+        raise ValueError('Corpo JSON inválido')
+    params = {
+        'search_term': str(data.get('search_term', '')).strip(),
+        'shipping_cost': float(data.get('shipping_cost', 0)),
+        'engine': data.get('engine', 'auto'),
+        'max_pages': int(data.get('max_pages', 1)),
+        'max_products': int(data['max_products']) if data.get('max_products') else None,
+        'use_cache': data.get('use_cache', True) is not False,
+        'include_timings': data.get('include_timings', False) is True,
+        'compact': data.get('compact', False) is True,
+        'known_ids': parse_known_ids(data.get('known_ids')),
+    }
+    if not params['search_term']:
+        raise ValueError('Termo de busca é obrigatório')
+    if params['engine'] not in FETCH_ENGINES:
+        raise ValueError(f"Engine inválido: {params['engine']}. Use um de {', '.join(FETCH_ENGINES)}")
+    if not 1 <= params['max_pages'] <= MAX_PAGES_LIMIT:
+        raise ValueError(f'max_pages deve estar entre 1 e {MAX_PAGES_LIMIT}')
+    return params
+
+KNOWN_IDS_LIMIT = 5000
+
+def parse_known_ids(value):
+    """IDs de produtos que o cliente já tem (lista ou texto separado por vírgulas)"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list):
+        raise ValueError('known_ids deve ser uma lista de IDs')
+    return [str(key).strip() for key in value[:KNOWN_IDS_LIMIT] if str(key).strip()]
+
+def search_kwargs(params):
+    """Argumentos de iter_search/scrape_search a partir dos parâmetros da busca"""
+    return {
+        'http_engine': http_engine,
+        'selenium_engine': selenium_engine,
+        'engine': params['engine'],
+        'max_pages': params['max_pages'],
+        'max_products': params['max_products'],
+        'rate_limiter': rate_limiter,
+        'capture': debug_capture,
+    }
+
+def result_cache_key(params):
+    # O engine pedido faz parte da chave: engine='selenium' não pode receber um resultado do HTTP
+    return (normalize_term(params['search_term']), params['max_pages'], params['max_products'], params['engine'])
+
+def scrape_result(params, on_page=None):
+    """Busca o termo, grava no histórico e retorna o valor guardado no cache"""
+    search_term = params['search_term']
+    info = {}
+    products, used_engine = scrape_search(search_term, on_page=on_page, info=info, **search_kwargs(params))
+    save_scrape(search_term, products, used_engine)
+    return {'products': products, 'engine': used_engine, 'failed_pages': info.get('failed_pages', [])}
+
+def save_scrape(search_term, products, engine, watch=False):
+    """Grava a busca no histórico, registra os produtos no índice e agenda o cache das
+    imagens; erros do banco não interrompem a busca"""
+    if image_proxy is not None and IMAGE_PREFETCH:
+        image_proxy.prefetch(product.get('Imagem') for product in products)
+    # O índice só agrupa e compacta as respostas: o histórico usa o ID do link de cada linha
+    product_index.load(products)
+    try:
+        with metrics.span('store_save'):
+            return price_store.record_scrape(search_term, products, engine=engine, watch=watch)
+    except Exception as e:
+        logger.error(f"❌ Erro ao gravar histórico de preços: {str(e)}")
+        return None
+
+def fallback_result(params, error):
+    """Resultado guardado do termo quando o site está fora do ar (circuito aberto ou
+    falha de rede): o último do cache, mesmo expirado, ou a última busca gravada"""
+    if not isinstance(error, CircuitOpenError) and classify_error(error) is None:
+        return None
+    cached = result_cache.last_known(result_cache_key(params))
+    if cached is not None:
+        return dict(cached, cache='fallback')
+    try:
+        products = price_store.cheapest(params['search_term'], limit=params['max_products'])
+    except Exception as e:
+        logger.error(f"❌ Erro ao ler histórico de preços: {str(e)}")
+        return None
+    if not products:
+        return None
+    return {'products': products, 'engine': 'history', 'cache': 'fallback'}
+
+def run_scrape(params, on_page=None):
+    """Executa a busca (passando pelo cache); retorna produtos sem frete, engine e status do cache"""
+    search_term = params['search_term']
+
+    # Buscar com o engine HTTP e escalar para o navegador só se necessário
+    def compute():
+        logger.info(f"🔍 Iniciando scraping para '{search_term}'...")
+        return scrape_result(params, on_page=on_page)
+
+    try:
+        if params['use_cache']:
+            result, cache_status = result_cache.get_or_compute(result_cache_key(params), compute)
+        else:
+            result, cache_status = compute(), 'bypass'
+    except Exception as e:
+        fallback = fallback_result(params, e)
+        if fallback is None:
+            raise
+        logger.warning(f"🛟 Site indisponível ({str(e)}); servindo o resultado guardado de '{search_term}'")
+        return fallback
+    logger.info(f"📊 Scraping concluído via {result['engine']} (cache: {cache_status}). {len(result['products'])} produtos encontrados")
+    return dict(result, cache=cache_status)
+
+def scrape_job(job):
+    """Função executada pelos workers de jobs"""
+    def on_page(page, total_pages, new_products):
+        # Roda dentro do cálculo compartilhado do cache: só registra, não levanta
+        # JobCancelled (cancelaria também os outros jobs do mesmo termo)
+        job.add_partial(new_products, pages_done=page, pages_total=total_pages)
+    # Tempos por fase desta busca (vazios quando o resultado vem do cache)
+    with metrics.collect() as timings:
+        result = run_scrape(job.params, on_page=on_page)
+    job.raise_if_cancelled()
+    return dict(result, timings=timings.summary())
+
+def job_to_dict(job, compact=False, known_ids=()):
+    snapshot = job.snapshot()
+    shipping_cost = snapshot['params']['shipping_cost']
+    result = snapshot['result'] or {}
+    products = apply_shipping(result.get('products', snapshot['partial']), shipping_cost)
+    return {
+        'id': snapshot['id'],
+        'status': snapshot['status'],
+        'search_term': snapshot['params']['search_term'],
+        'shipping_cost': shipping_cost,
+        'created_at': snapshot['created_at'],
+        'started_at': snapshot['started_at'],
+        'finished_at': snapshot['finished_at'],
+        'progress': snapshot['progress'],
+        **(compact_products(products, product_index, known_ids) if compact else {'products': products}),
+        'count': len(products),
+        'engine': result.get('engine'),
+        'cache': result.get('cache'),
+        'failed_pages': result.get('failed_pages', []),
+        'timings': result.get('timings'),
+        'error': snapshot['error'],
+    }
+
+BATCH_MAX_TERMS = int(os.environ.get('BATCH_MAX_TERMS', 100))
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 3))
+
+def parse_batch_params(data):
+    """Valida o corpo de um lote: os mesmos campos do /scrape, com 'terms' no lugar de 'search_term'"""
+    if not isinstance(data, dict) or not isinstance(data.get('terms'), list):
+        raise ValueError("Envie a lista de termos no campo 'terms'")
+    terms = unique_terms(data['terms'])
+    if not terms:
+        raise ValueError('Informe pelo menos um termo de busca')
+    if len(terms) > BATCH_MAX_TERMS:
+        raise ValueError(f'Máximo de {BATCH_MAX_TERMS} termos por lote')
+    params = parse_scrape_params(dict(data, search_term=terms[0]))
+    del params['search_term']
+    params['terms'] = terms
+    return params
+
+def batch_job(job):
+    """Executa os termos do lote em paralelo, reaproveitando engines, pool e cache"""
+    params = job.params
+
+    def scrape_term(term):
+        return run_scrape(dict(params, search_term=term))
+
+    def on_result(entry, progress):
+        job.add_partial([entry], **progress)
+        job.raise_if_cancelled()
+
+    job.add_partial([], terms_total=len(params['terms']), terms_done=0, terms_failed=0)
+    return {'terms': run_batch(params['terms'], scrape_term, workers=BATCH_WORKERS, on_result=on_result)}
+
+def batch_to_dict(job, include_products=True, compact=False, known_ids=()):
+    """Lote com os produtos de cada termo e a planilha combinada.
+
+    Com ``compact`` os produtos (por termo e combinados) voltam só com o ID
+    canônico, o link da oferta e os preços; nome e imagem de cada produto vêm
+    uma vez no ``catalog``, mesmo que ele apareça em vários termos.
+    """
+    snapshot = job.snapshot()
+    shipping_cost = snapshot['params']['shipping_cost']
+    entries = (snapshot['result'] or {}).get('terms', snapshot['partial'])
+    combined = apply_shipping(merge_products(entries, product_index), shipping_cost)
+    catalog = compact_products(combined, product_index, known_ids) if compact else None
+    terms = []
+    for entry in entries:
+        entry = dict(entry, products=apply_shipping(entry['products'], shipping_cost))
+        if not include_products:
+            del entry['products']
+        elif compact:
+            entry['products'] = compact_rows(entry['products'], product_index)
+        terms.append(entry)
+    return {
+        'id': snapshot['id'],
+        'status': snapshot['status'],
+        'search_terms': snapshot['params']['terms'],
+        'shipping_cost': shipping_cost,
+        'created_at': snapshot['created_at'],
+        'started_at': snapshot['started_at'],
+        'finished_at': snapshot['finished_at'],
+        'progress': snapshot['progress'],
+        'terms': terms,
+        'combined': catalog['products'] if compact else combined,
+        'combined_count': len(combined),
+        **({'catalog': catalog['catalog'], 'images': catalog['images']} if compact else {}),
+        'error': snapshot['error'],
+    }
+
+def refresh_watched_term(search_term, interval):
+    """Busca um termo acompanhado, grava as mudanças e deixa o cache aquecido até a próxima rodada"""
+    params = parse_scrape_params({'search_term': search_term})
+    info = {}
+    products, used_engine = scrape_search(search_term, info=info, **search_kwargs(params))
+    failed_pages = info.get('failed_pages', [])
+    # Só as atualizações do agendador (sempre com os mesmos parâmetros) são comparadas entre si;
+    # uma busca incompleta não entra na comparação (os produtos das páginas perdidas pareceriam removidos)
+    saved = save_scrape(search_term, products, used_engine, watch=not failed_pages)
+    # TTL cobre o intervalo com jitter: o /scrape do termo responde do cache entre as rodadas
+    ttl = interval * (1 + watch_scheduler.jitter) + watch_scheduler.min_gap
+    result_cache.set(result_cache_key(params), {'products': products, 'engine': used_engine, 'failed_pages': failed_pages}, ttl=ttl)
+    return {'count': len(products), 'engine': used_engine, 'failed_pages': failed_pages,
+            'changes': saved['changes'] if saved else None}
+
+# Agendador dos termos acompanhados (lista persistida no banco e semeada por WATCH_TERMS)
+watch_scheduler = WatchScheduler(
+    refresh_watched_term,
+    default_interval=float(os.environ.get('WATCH_INTERVAL', 1800)),
+    jitter=float(os.environ.get('WATCH_JITTER', 0.1)),
+    max_concurrency=int(os.environ.get('WATCH_CONCURRENCY', 1)),
+    min_gap=float(os.environ.get('WATCH_MIN_GAP', 10))
+)
+WATCH_MIN_INTERVAL = 60
+for watched_term in filter(None, (t.strip() for t in os.environ.get('WATCH_TERMS', '').split(','))):
+    price_store.add_watch(watched_term, watch_scheduler.default_interval)
+for watch in price_store.list_watches():
+    watch_scheduler.add(watch['term'], watch['interval'])
+if os.environ.get('WATCH_ENABLED', '1') != '0':
+    watch_scheduler.start()
+
+# Workers de scraping em segundo plano, com fila limitada
+job_manager = JobManager(
+    workers=int(os.environ.get('JOB_WORKERS', 2)),
+    max_queue=int(os.environ.get('JOB_MAX_QUEUE', 20)),
+    retention=float(os.environ.get('JOB_RETENTION', 3600))
+)
+job_manager.start()
+SCRAPE_WAIT_TIMEOUT = float(os.environ.get('SCRAPE_WAIT_TIMEOUT', 110))
+
+def scrape_response(params, result, queue_wait, started_at):
+    """Corpo da resposta do /scrape: produtos com o frete aplicado e, se pedido, os tempos"""
+    timings = metrics.Timings()
+    # Adicionar preço de venda calculado para cada produto
+    logger.info("💰 Calculando preços finais...")
+    with metrics.collect(timings), metrics.span('pricing'):
+        products = apply_shipping(result['products'], params['shipping_cost'])
+
+    logger.info(f"🎉 Busca concluída com sucesso! {len(products)} produtos encontrados")
+
+    response = {
+        'success': True,
+        # compact: nome e imagem de cada produto uma vez no catálogo
+        **(compact_products(products, product_index, params['known_ids']) if params['compact'] else {'products': products}),
+        'shipping_cost': params['shipping_cost'],
+        'count': len(products),
+        'search_term': params['search_term'],
+        'engine': result['engine'],
+        'cache': result['cache'],
+        # Páginas 2..N que falharam: o resultado está incompleto
+        'failed_pages': result.get('failed_pages', [])
+    }
+    if params['include_timings']:
+        response['timings'] = dict(
+            result.get('timings') or {},
+            **timings.summary(),
+            queue_wait=round(queue_wait, 4),
+            total=round(time.time() - started_at, 4)
+        )
+    return response
+
 @app.route('/scrape', methods=['POST'])
 def scrape_endpoint():
     try:
         logger.info("🔄 Iniciando nova requisição de scraping")
         
-        data = request.get_json()
-        search_term = data.get('search_term', '').strip()
-        shipping_cost = float(data.get('shipping_cost', 0))
+        try:
+            params = parse_scrape_params(request.get_json())
+        except (ValueError, TypeError) as e:
+            logger.warning(f"❌ Requisição inválida: {str(e)}")
+            return jsonify({'error': str(e)}), 400
+        search_term = params['search_term']
+        shipping_cost = params['shipping_cost']
         
         logger.info(f"📝 Dados recebidos - Termo: '{search_term}', Frete: R$ {shipping_cost:.2f}")
         
-        if not search_term:
-            logger.warning("❌ Termo de busca vazio")
-            return jsonify({'error': 'Termo de busca é obrigatório'}), 400
-        
         print(f"🔍 Buscando por: {search_term}")
         print(f"🚚 Frete: R$ {shipping_cost:.2f}")
         
-        # Setup driver and scrape
-        logger.info("🚀 Configurando driver do Chrome...")
-        driver = None
+        # Enfileirar no pool de workers e aguardar o resultado
         try:
-            driver = setup_driver()
-            if driver is None:
-                logger.error("❌ setup_driver retornou None")
-                return jsonify({'error': 'Erro ao configurar navegador: Driver não foi inicializado'}), 500
-            logger.info("✅ Driver configurado com sucesso")
-        except Exception as e:
-            logger.error(f"❌ Erro ao configurar driver: {str(e)}")
-            logger.error(f"📋 Traceback: {traceback.format_exc()}")
-            return jsonify({'error': f'Erro ao configurar navegador: {str(e)}'}), 500
-        
+            job = job_manager.submit(scrape_job, params)
+        except JobQueueFull as e:
+            logger.warning(f"⚠️ {str(e)}")
+            return jsonify({'error': f'Servidor ocupado, tente novamente: {str(e)}'}), 429
+
+        if not job.wait(SCRAPE_WAIT_TIMEOUT):
+            logger.warning(f"⏰ Busca ainda em andamento após {SCRAPE_WAIT_TIMEOUT}s (job {job.id})")
+            return jsonify({'error': 'A busca está demorando; acompanhe pelo job', 'job_id': job.id}), 504
+
+        snapshot = job.snapshot()
+        if snapshot['status'] != Job.DONE:
+            logger.error(f"❌ Erro durante o scraping: {snapshot['error']}")
+            if snapshot['error_type'] == DriverPoolTimeout.__name__:
+                return jsonify({'error': f"Servidor ocupado, tente novamente: {snapshot['error']}"}), 503
+            if snapshot['error_type'] == CircuitOpenError.__name__:
+                return jsonify({'error': snapshot['error']}), 503
+            return jsonify({'error': f"Erro durante a busca: {snapshot['error']}"}), 500
         try:
-            # Validar se o driver está funcionando
-            if not hasattr(driver, 'get') or not callable(getattr(driver, 'get')):
-                logger.error("❌ Driver não possui método 'get' válido")
-                return jsonify({'error': 'Driver do navegador inválido'}), 500
-                
-            logger.info(f"🔍 Iniciando scraping para '{search_term}'...")
-            products = scrape_products(driver, search_term)
-            logger.info(f"📊 Scraping concluído. {len(products)} produtos encontrados")
-            
-            # Adicionar preço de venda calculado para cada produto
-            logger.info("💰 Calculando preços finais...")
-            for i, product in enumerate(products):
-                try:
-                    # Extrair preço BRL e calcular preço de venda final em reais
-                    brl_price_str = product.get('Preço (R$)', '0')
-                    if brl_price_str != 'N/A':
-                        brl_price = float(brl_price_str)
-                        final_price_brl = brl_price + shipping_cost
-                        product['Preço Final (R$)'] = f"{final_price_brl:.2f}"
-                        logger.debug(f"Produto {i+1}: R$ {brl_price:.2f} + R$ {shipping_cost:.2f} = R$ {final_price_brl:.2f}")
-                    else:
-                        product['Preço Final (R$)'] = 'N/A'
-                        logger.debug(f"Produto {i+1}: Preço N/A")
-                except (ValueError, TypeError) as e:
-                    product['Preço Final (R$)'] = 'N/A'
-                    logger.warning(f"⚠️ Erro ao calcular preço do produto {i+1}: {str(e)}")
-            
-            # Save results with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            # Save JSON
-            json_filename = f'produtos_{search_term}_{timestamp}.json'
-            logger.info(f"💾 Salvando resultados em {json_filename}...")
-            
-            try:
-                with open(json_filename, 'w', encoding='utf-8') as f:
-                    json.dump(products, f, ensure_ascii=False, indent=4)
-                logger.info("✅ Arquivo JSON salvo com sucesso")
-            except Exception as e:
-                logger.error(f"❌ Erro ao salvar JSON: {str(e)}")
-                # Continua mesmo se não conseguir salvar o arquivo
-            
-            logger.info(f"🎉 Busca concluída com sucesso! {len(products)} produtos encontrados")
-            
-            return jsonify({
-                'success': True,
-                'products': products,
-                'shipping_cost': shipping_cost,
-                'count': len(products),
-                'search_term': search_term,
-                'json_file': json_filename
-            })
-            
+            return jsonify(scrape_response(
+                params, snapshot['result'],
+                queue_wait=snapshot['started_at'] - snapshot['created_at'],
+                started_at=snapshot['created_at']
+            ))
         except Exception as e:
-            logger.error(f"❌ Erro durante o scraping: {str(e)}")
+            logger.error(f"❌ Erro ao processar resultados: {str(e)}")
             logger.error(f"📋 Traceback completo: {traceback.format_exc()}")
-            return jsonify({'error': f'Erro durante a busca: {str(e)}'}), 500
-            
-        finally:
-            if driver is not None:
-                try:
-                    driver.quit()
-                    logger.info("🔒 Driver fechado com sucesso")
-                except Exception as e:
-                    logger.warning(f"⚠️ Erro ao fechar driver: {str(e)}")
-            else:
-                logger.info("ℹ️ Driver era None, não foi necessário fechar")
+            return jsonify({'error': f'Erro ao processar resultados: {str(e)}'}), 500
             
     except Exception as e:
         logger.error(f"💥 Erro crítico na aplicação: {str(e)}")
         logger.error(f"📋 Traceback completo: {traceback.format_exc()}")
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
 
+@app.route('/scrape/stream', methods=['POST'])
+def scrape_stream():
+    """Busca com resposta em NDJSON: cada produto é enviado assim que é extraído.
+
+    Linhas: {"type": "start"}, {"type": "product", "product": {...}} por
+    produto (já com 'Preço Final (R$)'), e {"type": "done"} (com as
+    ``failed_pages``, se alguma página falhou) ou {"type": "error"} no final.
+    """
+    try:
+        params = parse_scrape_params(request.get_json())
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    search_term = params['search_term']
+    shipping_cost = params['shipping_cost']
+    logger.info(f"📡 Streaming de busca - Termo: '{search_term}', Frete: R$ {shipping_cost:.2f}")
+
+    def line(payload):
+        return json.dumps(payload, ensure_ascii=False) + '\n'
+
+    known_ids = set(params['known_ids'])
+
+    def product_line(product, count):
+        # Produtos que o cliente já conhece vão sem nome e imagem (o link é de cada oferta)
+        key = product_index.lookup(product)
+        priced = price_product(product, shipping_cost, count)
+        if key in known_ids:
+            priced = {k: v for k, v in priced.items() if k not in SHARED_FIELDS}
+        return line({'type': 'product', 'id': key, 'product': priced})
+
+    def refresh():
+        return scrape_result(params)
+
+    def compute(publish):
+        # Cada produto é publicado no cálculo compartilhado assim que é extraído
+        info, products = {}, []
+        for product in iter_search(search_term, info=info, **search_kwargs(params)):
+            products.append(product)
+            publish(product)
+        save_scrape(search_term, products, info.get('engine'))
+        return {'products': products, 'engine': info.get('engine'), 'failed_pages': info.get('failed_pages', [])}
+
+    def generate():
+        yield line({'type': 'start', 'search_term': search_term, 'shipping_cost': shipping_cost})
+        count = 0
+        try:
+            cached, cache_status = (None, None)
+            if params['use_cache']:
+                cached, cache_status = result_cache.lookup(result_cache_key(params), refresh=refresh)
+
+            if cached is None and params['use_cache']:
+                # Streams e /scrape simultâneos do mesmo termo compartilham uma única busca:
+                # quem chega depois recebe os produtos já extraídos e acompanha os seguintes
+                flight, cache_status = result_cache.join_or_start(result_cache_key(params), compute)
+                for product in flight.follow():
+                    yield product_line(product, count)
+                    count += 1
+                if flight.error is not None:
+                    raise flight.error
+                cached = flight.value
+
+            if cached is not None:
+                used_engine = cached['engine']
+                failed_pages = cached.get('failed_pages', [])
+                # Cálculos do /scrape não publicam produtos: enviar os que faltam do resultado
+                for product in cached['products'][count:]:
+                    yield product_line(product, count)
+                    count += 1
+            else:
+                cache_status = 'bypass'
+                info, products = {}, []
+                for product in iter_search(search_term, info=info, **search_kwargs(params)):
+                    products.append(product)
+                    yield product_line(product, count)
+                    count += 1
+                used_engine = info.get('engine')
+                failed_pages = info.get('failed_pages', [])
+                save_scrape(search_term, products, used_engine)
+
+            logger.info(f"🎉 Streaming concluído: {count} produtos (engine: {used_engine}, cache: {cache_status})")
+            yield line({'type': 'done', 'count': count, 'engine': used_engine, 'cache': cache_status,
+                        'failed_pages': failed_pages})
+        except Exception as e:
+            fallback = fallback_result(params, e) if count == 0 else None
+            if fallback is not None:
+                logger.warning(f"🛟 Site indisponível ({str(e)}); enviando o resultado guardado de '{search_term}'")
+                for product in fallback['products']:
+                    yield product_line(product, count)
+                    count += 1
+                yield line({'type': 'done', 'count': count, 'engine': fallback['engine'], 'cache': 'fallback'})
+                return
+            logger.error(f"❌ Erro durante o streaming: {str(e)}")
+            logger.error(f"📋 Traceback completo: {traceback.format_exc()}")
+            yield line({'type': 'error', 'error': f'Erro durante a busca: {str(e)}', 'count': count})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Cria um job de scraping e retorna seu id imediatamente"""
+    try:
+        params = parse_scrape_params(request.get_json())
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        job = job_manager.submit(scrape_job, params)
+    except JobQueueFull as e:
+        logger.warning(f"⚠️ {str(e)}")
+        return jsonify({'error': f'Servidor ocupado, tente novamente: {str(e)}'}), 429
+    return jsonify({'success': True, 'job_id': job.id, 'status': job.status}), 202
+
+def compact_args():
+    """?compact=1&known=<ids separados por vírgula> das consultas de jobs e lotes"""
+    return request.args.get('compact', '0') == '1', parse_known_ids(request.args.get('known'))
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Status do job e resultados (parciais enquanto estiver rodando)"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado ou expirado'}), 404
+    try:
+        compact, known_ids = compact_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if 'terms' in job.params:
+        return jsonify({'success': True, 'job': batch_to_dict(job, compact=compact, known_ids=known_ids)})
+    return jsonify({'success': True, 'job': job_to_dict(job, compact=compact, known_ids=known_ids)})
+
+@app.route('/batch', methods=['POST'])
+def create_batch():
+    """Cria um job com vários termos de busca e retorna seu id imediatamente"""
+    try:
+        params = parse_batch_params(request.get_json())
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        job = job_manager.submit(batch_job, params)
+    except JobQueueFull as e:
+        logger.warning(f"⚠️ {str(e)}")
+        return jsonify({'error': f'Servidor ocupado, tente novamente: {str(e)}'}), 429
+    logger.info(f"📦 Lote {job.id} com {len(params['terms'])} termos enfileirado")
+    return jsonify({'success': True, 'job_id': job.id, 'status': job.status, 'terms': params['terms']}), 202
+
+def get_batch_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None or 'terms' not in job.params:
+        return None
+    return job
+
+@app.route('/batch/<job_id>')
+def get_batch(job_id):
+    """Resultados por termo e planilha combinada (parciais enquanto o lote roda)"""
+    job = get_batch_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Lote não encontrado ou expirado'}), 404
+    include_products = request.args.get('products', '1') != '0'
+    try:
+        compact, known_ids = compact_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'success': True, 'batch': batch_to_dict(job, include_products, compact, known_ids)})
+
+@app.route('/batch/<job_id>/sheet.csv')
+def get_batch_sheet(job_id):
+    """Planilha combinada do lote em CSV (um produto por linha, com os termos)"""
+    job = get_batch_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Lote não encontrado ou expirado'}), 404
+    batch = batch_to_dict(job, include_products=False)
+    return Response(
+        products_to_csv(batch['combined']),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=lote_{job.id}.csv'}
+    )
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancela um job na fila ou em execução"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado ou expirado'}), 404
+    return jsonify({'success': True, 'job_id': job.id, 'status': job.status})
+
+@app.route('/jobs/status')
+def jobs_status():
+    """Endpoint com estatísticas da fila de jobs"""
+    return jsonify({'success': True, 'jobs': job_manager.stats()})
+
+@app.after_request
+def count_request(response):
+    if request.endpoint not in (None, 'static', 'metrics_endpoint'):
+        metrics.REQUESTS.inc(endpoint=request.endpoint, status=response.status_code)
+    return response
+
+# Estado do pool, do cache e da fila também exportado no /metrics
+metrics.REGISTRY.register_gauges('scraper_driver_pool', 'Estado do pool de drivers', driver_pool.stats)
+metrics.REGISTRY.register_gauges('scraper_result_cache', 'Estado do cache de resultados', result_cache.stats)
+if debug_capture is not None:
+    metrics.REGISTRY.register_gauges('scraper_debug_capture', 'Estado da captura de HTML para depuração', debug_capture.stats)
+if http_cache is not None:
+    metrics.REGISTRY.register_gauges('scraper_http_cache', 'Estado do cache HTTP em disco', http_cache.stats)
+metrics.REGISTRY.register_gauges('scraper_jobs', 'Estado da fila de jobs', job_manager.stats)
+if image_proxy is not None:
+    metrics.REGISTRY.register_gauges('scraper_image_cache', 'Estado do cache de miniaturas das imagens', image_proxy.stats)
+metrics.REGISTRY.register_gauges('scraper_outbound', 'Requisições ao site: novas tentativas, circuitos abertos e desaceleração', rate_limiter.stats)
+metrics.REGISTRY.register_gauges('scraper_product_index', 'Estado do índice canônico de produtos', product_index.stats)
+metrics.REGISTRY.register_gauges('scraper_store', 'Tamanho do histórico de preços', price_store.stats)
+metrics.REGISTRY.register_gauges('scraper_watch', 'Estado do agendador de termos acompanhados', watch_scheduler.stats)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métricas no formato texto do Prometheus"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/watch')
+def list_watches():
+    """Termos acompanhados e o estado de cada atualização"""
+    return jsonify({'success': True, 'watch': watch_scheduler.stats()})
+
+@app.route('/watch', methods=['POST'])
+def add_watch():
+    """Passa a acompanhar um termo (campo ``interval`` opcional, em segundos)"""
+    data = request.get_json()
+    try:
+        search_term = str((data or {}).get('search_term', '')).strip()
+        interval = float((data or {}).get('interval') or watch_scheduler.default_interval)
+        if not search_term:
+            raise ValueError('Termo de busca é obrigatório')
+        if interval < WATCH_MIN_INTERVAL:
+            raise ValueError(f'interval deve ser de pelo menos {WATCH_MIN_INTERVAL} segundos')
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    term = price_store.add_watch(search_term, interval)
+    watch_scheduler.add(term, interval)
+    logger.info(f"👀 Termo '{term}' acompanhado a cada {interval:.0f}s")
+    return jsonify({'success': True, 'search_term': term, 'interval': interval}), 201
+
+@app.route('/watch/<path:search_term>', methods=['DELETE'])
+def remove_watch(search_term):
+    """Deixa de acompanhar um termo (as mudanças já registradas são mantidas)"""
+    removed = price_store.remove_watch(search_term)
+    removed = watch_scheduler.remove(search_term) or removed
+    if not removed:
+        return jsonify({'error': 'Termo não acompanhado'}), 404
+    return jsonify({'success': True, 'search_term': normalize_term(search_term)})
+
+@app.route('/watch/changes')
+def watch_changes():
+    """Produtos adicionados, removidos ou com preço alterado nas atualizações dos termos acompanhados"""
+    try:
+        shipping_cost = float(request.args.get('shipping_cost', 0))
+        hours = float(request.args.get('hours', 24))
+        limit = min(max(int(request.args.get('limit', 100)), 1), 1000)
+    except ValueError as e:
+        return jsonify({'error': f'Parâmetro inválido: {str(e)}'}), 400
+    changes = price_store.watch_changes(
+        request.args.get('term'), since=time.time() - hours * 3600, limit=limit
+    )
+    return jsonify({'success': True, 'changes': apply_shipping(changes, shipping_cost), 'count': len(changes)})
+
+def history_args():
+    """Parâmetros comuns das consultas ao histórico: frete, janela em dias e limite"""
+    shipping_cost = float(request.args.get('shipping_cost', 0))
+    days = int(request.args.get('days', 30))
+    limit = int(request.args.get('n', request.args.get('limit', 10)))
+    if not 1 <= days <= 3650:
+        raise ValueError('days deve estar entre 1 e 3650')
+    if not 1 <= limit <= 1000:
+        raise ValueError('n deve estar entre 1 e 1000')
+    return shipping_cost, days, limit
+
+def priced_stats(stats, shipping_cost):
+    """Aplica o frete (Preço Final) ao mínimo, à média e ao máximo"""
+    return dict(stats, **{key: price_product(stats[key], shipping_cost) for key in ('min', 'avg', 'max')})
+
+@app.route('/history/products/<int:product_id>')
+def product_history(product_id):
+    """Série de preços e mínimo/média/máximo de um produto, sem fazer scraping"""
+    try:
+        shipping_cost, days, _ = history_args()
+    except ValueError as e:
+        return jsonify({'error': f'Parâmetro inválido: {str(e)}'}), 400
+    product = price_store.get_product(product_id)
+    if product is None:
+        return jsonify({'error': 'Produto não encontrado no histórico'}), 404
+    since = time.time() - days * 86400
+    return jsonify({
+        'success': True,
+        'product': price_product(product, shipping_cost),
+        'series': apply_shipping(price_store.price_series(product_id, since=since), shipping_cost),
+        'stats': priced_stats(price_store.price_stats(pid=product_id, days=days), shipping_cost),
+        'days': days,
+        'shipping_cost': shipping_cost,
+    })
+
+@app.route('/history/terms/<path:search_term>/stats')
+def term_history_stats(search_term):
+    """Mínimo/média/máximo do termo e de cada produto na janela de ``days`` dias"""
+    try:
+        shipping_cost, days, limit = history_args()
+    except ValueError as e:
+        return jsonify({'error': f'Parâmetro inválido: {str(e)}'}), 400
+    products = [
+        dict(price_product(product, shipping_cost, i), stats=priced_stats(product['stats'], shipping_cost))
+        for i, product in enumerate(price_store.term_product_stats(search_term, days=days, limit=limit))
+    ]
+    return jsonify({
+        'success': True,
+        'search_term': normalize_term(search_term),
+        'stats': priced_stats(price_store.price_stats(search_term=search_term, days=days), shipping_cost),
+        'products': products,
+        'days': days,
+        'shipping_cost': shipping_cost,
+    })
+
+@app.route('/history/terms/<path:search_term>/cheapest')
+def term_cheapest(search_term):
+    """Os ``n`` produtos mais baratos da última busca gravada do termo"""
+    try:
+        shipping_cost, _, limit = history_args()
+    except ValueError as e:
+        return jsonify({'error': f'Parâmetro inválido: {str(e)}'}), 400
+    products = apply_shipping(price_store.cheapest(search_term, limit=limit), shipping_cost)
+    last = price_store.last_scrapes(search_term, 1)
+    return jsonify({
+        'success': True,
+        'search_term': normalize_term(search_term),
+        'scraped_at': last[0]['scraped_at'] if last else None,
+        'products': products,
+        'count': len(products),
+        'shipping_cost': shipping_cost,
+    })
+
+@app.route('/history/terms/<path:search_term>/drops')
+def term_price_drops(search_term):
+    """Produtos cujo preço caiu entre as duas últimas buscas gravadas do termo"""
+    try:
+        shipping_cost, _, _ = history_args()
+    except ValueError as e:
+        return jsonify({'error': f'Parâmetro inválido: {str(e)}'}), 400
+    products = apply_shipping(price_store.price_drops(search_term), shipping_cost)
+    scrapes = price_store.last_scrapes(search_term, 2)
+    return jsonify({
+        'success': True,
+        'search_term': normalize_term(search_term),
+        'scraped_at': scrapes[0]['scraped_at'] if scrapes else None,
+        'previous_scraped_at': scrapes[1]['scraped_at'] if len(scrapes) > 1 else None,
+        'products': products,
+        'count': len(products),
+        'shipping_cost': shipping_cost,
+    })
+
+DOWNLOAD_MAX_PRODUCTS = 20000
+
+def download_slug(search_term):
+    return re.sub(r'\W+', '_', normalize_term(search_term), flags=re.ASCII) or 'busca'
+
+def download_table(args):
+    """Produtos a exportar: de um job (busca ou lote) ou, no export do histórico, da última busca gravada do termo"""
+    job_id = args.get('job_id')
+    if job_id:
+        job = job_manager.get(job_id)
+        if job is None:
+            return None, None
+        snapshot = job.snapshot()
+        if 'terms' in job.params:
+            entries = (snapshot['result'] or {}).get('terms', snapshot['partial'])
+            return ProductTable.from_products(merge_products(entries), extra_columns=['Termos']), f'lote_{job.id}'
+        products = (snapshot['result'] or {}).get('products', snapshot['partial'])
+        return ProductTable.from_products(products), f'job_{job.id}'
+    search_term = args.get('search_term', '').strip()
+    if not search_term:
+        raise ValueError('Informe job_id ou search_term')
+    products = price_store.cheapest(search_term, limit=None)
+    if not products and not price_store.last_scrapes(search_term, 1):
+        return None, None
+    return ProductTable.from_products(products), f'historico_{download_slug(search_term)}'
+
+def posted_table(data):
+    """Produtos enviados no corpo do POST /download (o resultado que o cliente está mostrando)"""
+    if not isinstance(data, dict) or not isinstance(data.get('products'), list):
+        raise ValueError("Envie os produtos no campo 'products'")
+    if len(data['products']) > DOWNLOAD_MAX_PRODUCTS:
+        raise ValueError(f'Máximo de {DOWNLOAD_MAX_PRODUCTS} produtos por exportação')
+    products = [product for product in data['products'] if isinstance(product, dict)]
+    return ProductTable.from_products(products), f"produtos_{download_slug(str(data.get('search_term', '')))}"
+
+def prepare_download(args, data=None):
+    """Arquivo a exportar: ``(tabela, nome, partes, mimetype, extensão)`` ou None se não houver resultado.
+
+    Com ``data`` (POST) exporta os produtos enviados, na ordem recebida; sem
+    ele, um job ou o histórico do termo (``args``). Levanta ValueError para
+    parâmetros inválidos e RuntimeError para formatos indisponíveis.
+    """
+    options = data if data is not None else args
+    if data is not None:
+        table, basename = posted_table(data)
+    else:
+        table, basename = download_table(args)
+    if table is None:
+        return None
+    shipping_cost = float(options.get('shipping_cost') or 0)
+    chunks, mimetype, extension = export(table, str(options.get('format') or 'csv').lower(), shipping_cost)
+    return table, basename, chunks, mimetype, extension
+
+@app.route('/download', methods=['GET', 'POST'])
+def download_results():
+    """Exporta os produtos em CSV, JSON, NDJSON, XLSX, Parquet ou Arrow, enviando o arquivo em partes.
+
+    POST: corpo JSON com ``products`` (o resultado mostrado na tela, exportado
+    como está), ``search_term``, ``format`` e ``shipping_cost``. GET:
+    ``job_id`` ou ``search_term`` (export do histórico: última busca gravada,
+    do mais barato ao mais caro), ``format`` (padrão csv) e ``shipping_cost``.
+    """
+    try:
+        data = request.get_json(silent=True) if request.method == 'POST' else None
+        if request.method == 'POST' and data is None:
+            raise ValueError('Corpo JSON inválido')
+        prepared = prepare_download(request.args, data)
+        if prepared is None:
+            return jsonify({'error': 'Nenhum resultado encontrado para exportar'}), 404
+        table, basename, chunks, mimetype, extension = prepared
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 501
+    logger.info(f"📥 Exportando {len(table)} produtos em {extension}")
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{basename}.{extension}"'}
+    )
+
 @app.route('/download/<filename>')
 def download_file(filename):
     try:
@@ -142,24 +933,124 @@ def download_file(filename):
     except FileNotFoundError:
         return jsonify({'error': 'Arquivo não encontrado'}), 404
 
+@app.route('/catalog/search')
+def catalog_search():
+    """Produtos do índice com nome parecido com ``q`` (de todos os termos já buscados)"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Informe o parâmetro q'}), 400
+    try:
+        limit = min(max(int(request.args.get('n', 10)), 1), 100)
+    except ValueError as e:
+        return jsonify({'error': f'Parâmetro inválido: {str(e)}'}), 400
+    products = product_index.search(query, limit=limit)
+    return jsonify({'success': True, 'products': products, 'count': len(products), 'index': product_index.stats()})
+
+@app.route('/pool/status')
+def pool_status():
+    """Endpoint com métricas do pool de drivers"""
+    stats = driver_pool.stats()
+    stats['driver_strategy'] = get_working_strategy()
+    return jsonify({'success': True, 'pool': stats})
+
+@app.route('/img')
+def product_image():
+    """Miniatura da imagem de um produto: ?src=<url da imagem>&w=<largura>"""
+    src = request.args.get('src', '')
+    try:
+        width = int(request.args.get('w', 150))
+    except ValueError as e:
+        return jsonify({'error': f'Parâmetro inválido: {str(e)}'}), 400
+    if image_proxy is None:
+        if not host_allowed(src, IMAGE_PROXY_HOSTS):
+            return jsonify({'error': 'URL de imagem não permitida'}), 400
+        return redirect(src)
+    try:
+        path, mimetype, etag = image_proxy.get(src, width)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.warning(f"⚠️ Imagem indisponível ({src}): {str(e)}")
+        return jsonify({'error': f'Imagem indisponível: {str(e)}'}), 502
+    # A miniatura de uma URL não muda: o navegador pode guardar por um ano
+    response = send_file(path, mimetype=mimetype, etag=etag, max_age=IMAGE_MAX_AGE, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/outbound/status')
+def outbound_status():
+    """Estado das requisições ao site por host: circuito, falhas, desaceleração e novas tentativas"""
+    return jsonify({'success': True, 'hosts': rate_limiter.host_status(), 'totals': rate_limiter.stats()})
+
+@app.route('/cache/status')
+def cache_status_endpoint():
+    """Endpoint com estatísticas do cache de resultados e do cache HTTP em disco"""
+    return jsonify({
+        'success': True,
+        'cache': result_cache.stats(),
+        'http_cache': http_cache.stats() if http_cache is not None else None,
+        'images': image_proxy.stats() if image_proxy is not None else None,
+    })
+
+@app.route('/cache/clear', methods=['POST'])
+def clear_cache():
+    """Endpoint para limpar o cache de resultados"""
+    result_cache.invalidate()
+    if http_cache is not None:
+        http_cache.clear()
+    if image_proxy is not None:
+        image_proxy.clear()
+    logger.info("🗑️ Cache de resultados limpo")
+    return jsonify({'success': True, 'message': 'Cache limpo com sucesso'})
+
+@app.route('/debug/captures')
+def list_debug_captures():
+    """Lista os HTMLs capturados para depuração (mais recentes primeiro)"""
+    if debug_capture is None:
+        return jsonify({'success': False, 'error': 'Captura de HTML desativada (DEBUG_CAPTURE=1 ativa)'}), 404
+    return jsonify({'success': True, 'captures': debug_capture.list_captures(), 'stats': debug_capture.stats()})
+
+@app.route('/debug/captures/<name>')
+def download_debug_capture(name):
+    """Baixa um HTML capturado (comprimido com gzip)"""
+    path = debug_capture.path_for(name) if debug_capture is not None else None
+    if path is None:
+        return jsonify({'success': False, 'error': 'Captura não encontrada'}), 404
+    return send_from_directory(os.path.abspath(debug_capture.directory), name, mimetype='application/gzip', as_attachment=True)
+
+LOGS_MAX_LIMIT = 1000
+
+def read_logs(args):
+    """Corpo da resposta do /logs a partir dos parâmetros; levanta ValueError se forem inválidos"""
+    limit = min(max(int(args.get('limit', 100)), 1), LOGS_MAX_LIMIT)
+    level = args.get('level') or None
+    keyword = args.get('q') or None
+    after = args.get('after')
+    before = args.get('before')
+
+    if after is not None:
+        result = read_since(LOG_FILE, int(after), limit=limit, level=level, keyword=keyword)
+    else:
+        result = read_tail(LOG_FILE, limit=limit, before=int(before) if before else None,
+                           level=level, keyword=keyword)
+
+    lines = result.pop('lines')
+    return dict(result, success=True, logs=lines, showing_lines=len(lines))
+
 @app.route('/logs')
 def view_logs():
-    """Endpoint para visualizar logs da aplicação"""
+    """Endpoint para visualizar logs da aplicação.
+
+    Sem parâmetros retorna as últimas 100 linhas. Parâmetros opcionais:
+    ``limit``, ``level`` (nível mínimo), ``q`` (palavra-chave), ``before``
+    (cursor para linhas mais antigas) e ``after`` (offset devolvido em
+    ``next``, para buscar só as linhas novas no modo follow).
+    """
     try:
-        log_lines = []
-        if os.path.exists('app.log'):
-            with open('app.log', 'r', encoding='utf-8') as f:
-                log_lines = f.readlines()
-        
-        # Pegar as últimas 100 linhas
-        recent_logs = log_lines[-100:] if len(log_lines) > 100 else log_lines
-        
-        return jsonify({
-            'success': True,
-            'logs': recent_logs,
-            'total_lines': len(log_lines),
-            'showing_lines': len(recent_logs)
-        })
+        return jsonify(read_logs(request.args))
+    except ValueError as e:
+        return jsonify({'error': f'Parâmetro inválido: {str(e)}'}), 400
     except Exception as e:
         logger.error(f"Erro ao ler logs: {str(e)}")
         return jsonify({'error': f'Erro ao ler logs: {str(e)}'}), 500
@@ -168,8 +1059,8 @@ def view_logs():
 def clear_logs():
     """Endpoint para limpar logs da aplicação"""
     try:
-        if os.path.exists('app.log'):
-            with open('app.log', 'w') as f:
+        if os.path.exists(LOG_FILE):
+            with open(LOG_FILE, 'w') as f:
                 f.write('')
             logger.info("📝 Logs limpos pelo usuário")
             return jsonify({'success': True, 'message': 'Logs limpos com sucesso'})
@@ -0,0 +1,192 @@
+import asyncio
+import contextlib
+import logging
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.security import safe_join
+
+import app as web
+from driver_pool import DriverPoolTimeout
+from engines import AsyncHttpEngine, async_scrape_search
+from governor import CircuitOpenError
+import metrics
+
+# Modo assíncrono: uvicorn asgi:app --host 0.0.0.0 --port $PORT
+#
+# /scrape, /logs e os downloads rodam no loop de eventos (HTTP com httpx,
+# arquivos e SQLite em threads, Selenium num executor limitado). As demais
+# rotas, incluindo /scrape/stream e os jobs, continuam no Flask via a2wsgi,
+# com os mesmos objetos (cache, pool, banco) do modo WSGI.
+
+logger = logging.getLogger(__name__)
+
+ASGI_HTTP_POOL_SIZE = int(os.environ.get('ASGI_HTTP_POOL_SIZE', 100))
+ASGI_MAX_PENDING = int(os.environ.get('ASGI_MAX_PENDING', 500))
+ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 8))
+
+async_http_engine = AsyncHttpEngine(
+    pool_size=ASGI_HTTP_POOL_SIZE,
+    timeout=float(os.environ.get('HTTP_TIMEOUT', 15)),
+    cache=web.http_cache
+)
+# Uma thread por navegador do pool: as demais buscas esperam na fila do executor
+selenium_executor = ThreadPoolExecutor(max_workers=web.driver_pool.size, thread_name_prefix='selenium')
+_pending = 0
+
+
+def async_search_kwargs(params):
+    return dict(web.search_kwargs(params), http_engine=async_http_engine, executor=selenium_executor)
+
+
+async def run_scrape_async(params):
+    """Versão asyncio de ``app.run_scrape``; retorna produtos sem frete, engine, cache e tempos"""
+    search_term = params['search_term']
+
+    async def compute():
+        logger.info(f"🔍 Iniciando scraping para '{search_term}'...")
+        info = {}
+        products, used_engine = await async_scrape_search(search_term, info=info, **async_search_kwargs(params))
+        await asyncio.to_thread(web.save_scrape, search_term, products, used_engine)
+        return {'products': products, 'engine': used_engine, 'failed_pages': info.get('failed_pages', [])}
+
+    with metrics.collect() as timings:
+        try:
+            if params['use_cache']:
+                result, cache_status = await web.result_cache.aget_or_compute(web.result_cache_key(params), compute)
+            else:
+                result, cache_status = await compute(), 'bypass'
+        except Exception as e:
+            fallback = await asyncio.to_thread(web.fallback_result, params, e)
+            if fallback is None:
+                raise
+            logger.warning(f"🛟 Site indisponível ({str(e)}); servindo o resultado guardado de '{search_term}'")
+            return dict(fallback, timings=timings.summary())
+    logger.info(f"📊 Scraping concluído via {result['engine']} (cache: {cache_status}). {len(result['products'])} produtos encontrados")
+    return dict(result, cache=cache_status, timings=timings.summary())
+
+
+def counted(endpoint):
+    """Conta as requisições no /metrics com o mesmo nome de endpoint das rotas do Flask"""
+    def decorator(handler):
+        async def wrapper(request):
+            response = await handler(request)
+            metrics.REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+            return response
+        return wrapper
+    return decorator
+
+
+@counted('scrape_endpoint')
+async def scrape(request):
+    global _pending
+    started_at = time.time()
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    try:
+        params = web.parse_scrape_params(data)
+    except (ValueError, TypeError) as e:
+        logger.warning(f"❌ Requisição inválida: {str(e)}")
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    if _pending >= ASGI_MAX_PENDING:
+        logger.warning(f"⚠️ {_pending} buscas em andamento, recusando '{params['search_term']}'")
+        return JSONResponse({'error': 'Servidor ocupado, tente novamente'}, status_code=429)
+
+    logger.info(f"📝 Dados recebidos - Termo: '{params['search_term']}', Frete: R$ {params['shipping_cost']:.2f}")
+    _pending += 1
+    try:
+        result = await asyncio.wait_for(run_scrape_async(params), web.SCRAPE_WAIT_TIMEOUT)
+        return JSONResponse(web.scrape_response(params, result, queue_wait=0.0, started_at=started_at))
+    except asyncio.TimeoutError:
+        # A busca continua em segundo plano e fica no cache para a próxima requisição
+        logger.warning(f"⏰ Busca ainda em andamento após {web.SCRAPE_WAIT_TIMEOUT}s")
+        return JSONResponse({'error': 'A busca está demorando; tente novamente em instantes'}, status_code=504)
+    except DriverPoolTimeout as e:
+        return JSONResponse({'error': f'Servidor ocupado, tente novamente: {str(e)}'}, status_code=503)
+    except CircuitOpenError as e:
+        return JSONResponse({'error': str(e)}, status_code=503)
+    except Exception as e:
+        logger.error(f"❌ Erro durante o scraping: {str(e)}")
+        logger.error(f"📋 Traceback completo: {traceback.format_exc()}")
+        return JSONResponse({'error': f'Erro durante a busca: {str(e)}'}, status_code=500)
+    finally:
+        _pending -= 1
+
+
+@counted('view_logs')
+async def logs(request):
+    try:
+        return JSONResponse(await asyncio.to_thread(web.read_logs, request.query_params))
+    except ValueError as e:
+        return JSONResponse({'error': f'Parâmetro inválido: {str(e)}'}, status_code=400)
+    except Exception as e:
+        logger.error(f"Erro ao ler logs: {str(e)}")
+        return JSONResponse({'error': f'Erro ao ler logs: {str(e)}'}, status_code=500)
+
+
+@counted('download_results')
+async def download(request):
+    try:
+        data = None
+        if request.method == 'POST':
+            try:
+                data = await request.json()
+            except ValueError:
+                raise ValueError('Corpo JSON inválido')
+        prepared = await asyncio.to_thread(web.prepare_download, request.query_params, data)
+        if prepared is None:
+            return JSONResponse({'error': 'Nenhum resultado encontrado para exportar'}, status_code=404)
+        table, basename, chunks, mimetype, extension = prepared
+    except (ValueError, TypeError) as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    except RuntimeError as e:
+        return JSONResponse({'error': str(e)}, status_code=501)
+    logger.info(f"📥 Exportando {len(table)} produtos em {extension}")
+    # Iteradores síncronos são consumidos numa thread pelo Starlette
+    return StreamingResponse(
+        chunks, media_type=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{basename}.{extension}"'}
+    )
+
+
+@counted('download_file')
+async def download_file(request):
+    filename = request.path_params['filename']
+    # Mesmo diretório do send_from_directory('.') do Flask
+    path = safe_join(web.app.root_path, filename)
+    if path is None or not os.path.isfile(path):
+        return JSONResponse({'error': 'Arquivo não encontrado'}, status_code=404)
+    return FileResponse(path, filename=filename)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_app):
+    logger.info(f"⚡ Modo ASGI: até {ASGI_HTTP_POOL_SIZE} conexões HTTP, {web.driver_pool.size} thread(s) de Selenium")
+    yield
+    await async_http_engine.close()
+    selenium_executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = Starlette(
+    routes=[
+        Route('/scrape', scrape, methods=['POST']),
+        Route('/logs', logs),
+        Route('/download', download, methods=['GET', 'POST']),
+        Route('/download/{filename}', download_file),
+        Mount('/', WSGIMiddleware(web.app, workers=ASGI_WSGI_THREADS)),
+    ],
+    # Equivalente ao CORS(app) do Flask para as rotas atendidas aqui
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan,
+)
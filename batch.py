@@ -0,0 +1,97 @@
+import csv
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cache import normalize_term
+from catalog import product_key
+
+logger = logging.getLogger(__name__)
+
+SHEET_COLUMNS = ['Nome', 'Preço (US$)', 'Preço (R$)', 'Preço Final (R$)', 'Termos', 'Link', 'Imagem']
+
+
+def unique_terms(terms):
+    """Remove termos vazios e repetidos (pelo termo normalizado), mantendo a ordem"""
+    seen = set()
+    result = []
+    for term in terms:
+        term = str(term).strip()
+        key = normalize_term(term)
+        if key and key not in seen:
+            seen.add(key)
+            result.append(term)
+    return result
+
+
+def run_batch(terms, scrape_term, workers=3, on_result=None):
+    """Executa ``scrape_term(termo)`` para cada termo em até ``workers`` threads.
+
+    A falha de um termo não interrompe os demais: ele volta com status
+    'failed' e a mensagem de erro. ``on_result(entrada, progresso)`` é
+    chamado a cada termo concluído; uma exceção levantada por ele (ex:
+    cancelamento do job) interrompe o lote. Retorna as entradas na ordem
+    dos termos.
+    """
+    results = [None] * len(terms)
+    progress = {'terms_total': len(terms), 'terms_done': 0, 'terms_failed': 0}
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(terms) or 1)), thread_name_prefix='batch-term')
+    try:
+        futures = {executor.submit(scrape_term, term): i for i, term in enumerate(terms)}
+        for future in as_completed(futures):
+            i = futures[future]
+            entry = {'search_term': terms[i]}
+            try:
+                result = future.result()
+                entry.update(
+                    status='done',
+                    products=result['products'],
+                    count=len(result['products']),
+                    engine=result.get('engine'),
+                    cache=result.get('cache'),
+                    failed_pages=result.get('failed_pages', []),
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Lote: termo '{terms[i]}' falhou: {str(e)}")
+                entry.update(status='failed', products=[], count=0, error=str(e), error_type=type(e).__name__)
+                progress['terms_failed'] += 1
+            progress['terms_done'] += 1
+            results[i] = entry
+            if on_result is not None:
+                on_result(entry, dict(progress))
+    finally:
+        # Termos ainda na fila não começam se o lote for interrompido
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    logger.info(f"📦 Lote concluído: {progress['terms_done']} termos, {progress['terms_failed']} com falha")
+    return results
+
+
+def merge_products(entries, index=None):
+    """Planilha combinada: cada produto uma única vez, com os termos em que apareceu.
+
+    Os produtos são agrupados pela chave canônica do ``index`` (ID do modelo
+    ou, sem ID no link, o nome parecido); sem índice, pelo ID do modelo no Link.
+    """
+    lookup = index.lookup if index is not None else product_key
+    combined = {}
+    for entry in entries:
+        for product in entry.get('products', []):
+            key = lookup(product)
+            merged = combined.get(key)
+            if merged is None:
+                merged = combined[key] = dict(product, Termos=[])
+            if entry['search_term'] not in merged['Termos']:
+                merged['Termos'].append(entry['search_term'])
+    return list(combined.values())
+
+
+def products_to_csv(products):
+    """Gera o CSV da planilha combinada"""
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=SHEET_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    for product in products:
+        writer.writerow(dict(product, Termos='; '.join(product.get('Termos', []))))
+    return output.getvalue()
@@ -0,0 +1,297 @@
+"""Benchmark offline do parsing do scraper usando páginas capturadas.
+
+Mede, sem acessar o comprasparaguai.com.br, o tempo de cada fase
+(parse, extração, normalização de preços, serialização e o fluxo completo
+via um engine HTTP falso), itens/segundo e pico de memória, para as páginas
+capturadas no repositório e para páginas sintéticas com milhares de cards.
+
+Uso:
+    python benchmarks/bench_parser.py
+    python benchmarks/bench_parser.py --sizes 1000 5000 --repeat 7
+    python benchmarks/bench_parser.py --update-baseline
+    python benchmarks/bench_parser.py --update-baseline --timings --baseline /tmp/local.json
+
+Na mesma execução o parse e a extração também são medidos com o
+BeautifulSoup; os produtos dos dois precisam ser idênticos e a razão entre
+os tempos (speedup) não depende da máquina. O baseline versionado
+(``benchmarks/baseline.json``) guarda só esses speedups, e o script sai com
+código 1 se o speedup de alguma página cair mais que ``--threshold``, se os
+produtos divergirem ou se o baseline não existir. Um baseline gerado com
+``--timings`` também guarda os tempos absolutos e compara fase a fase, mas
+só vale na máquina em que foi gerado.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from scraper import BASE_URL  # noqa: E402
+from parsers import get_parser, clean_price, SoupParser, USD_PRICE_RE, BRL_PRICE_RE  # noqa: E402
+from pricing import apply_shipping  # noqa: E402
+from engines import scrape_search  # noqa: E402
+from governor import HostRateLimiter  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'results.json')
+FIXTURES = ['debug_page.html', 'compras_paraguai_structure.html']
+CARD_START = '<div class="promocao-produtos-item '
+CARD_END = '<!-- Ad meio busca -->'
+PRODUCT_ID_RE = re.compile(r'_(\d+)/')
+
+# Estatística usada na comparação: o mínimo é o menos sensível a ruído da máquina
+COMPARE_STAT = 'min'
+# Fases abaixo deste tempo são ignoradas na comparação (ruído de medição)
+NOISE_FLOOR_SECONDS = 0.005
+# Fases medidas também com o parser de referência (BeautifulSoup)
+RELATIVE_PHASES = ('parse', 'extract')
+
+
+class FakeHttpEngine:
+    """Substituto local do HttpEngine que devolve sempre a mesma página"""
+
+    name = 'http'
+
+    def __init__(self, html):
+        self.html = html
+
+    def fetch(self, url):
+        return self.html
+
+    def fetch_page(self, url, rate_limiter=None):
+        return self.html, self.name
+
+
+def load_fixture(name):
+    with open(os.path.join(ROOT_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def build_synthetic_page(template_html, card_count):
+    """Gera uma página com ``card_count`` cards copiando os cards da página capturada"""
+    start = template_html.index(CARD_START)
+    end = template_html.rindex(CARD_END)
+    cards = [CARD_START + chunk for chunk in template_html[start:end].split(CARD_START) if chunk]
+    # O último card da página fica depois do último marcador e é mantido no final
+    tail_cards = template_html[end:].count(CARD_START)
+    repeated = []
+    for i in range(max(card_count - tail_cards, 0)):
+        card = cards[i % len(cards)]
+        # IDs únicos para não serem removidos como duplicados
+        repeated.append(PRODUCT_ID_RE.sub(lambda m: f'_{m.group(1)}{i}/', card))
+    return template_html[:start] + ''.join(repeated) + template_html[end:]
+
+
+def time_phase(func, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - started)
+    return result, {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'max': max(samples),
+    }
+
+
+def bench_parsing(html, parser, repeat):
+    cards, parse_t = time_phase(lambda: parser.find_cards(html), repeat)
+    products, extract_t = time_phase(lambda: [parser.extract(card, BASE_URL) for card in cards], repeat)
+    return products, parse_t, extract_t
+
+
+def bench_page(html, parser, repeat, reference=None):
+    products, parse_t, extract_t = bench_parsing(html, parser, repeat)
+
+    raw_prices = [m.group(1) for m in USD_PRICE_RE.finditer(html)] + [m.group(1) for m in BRL_PRICE_RE.finditer(html)]
+
+    def normalize_prices():
+        cleaned = [clean_price(price) for price in raw_prices]
+        return cleaned, apply_shipping(products, 50.0)
+
+    (_, priced), pricing_t = time_phase(normalize_prices, repeat)
+    _, serialize_t = time_phase(lambda: json.dumps(priced, ensure_ascii=False, indent=4), repeat)
+
+    engine = FakeHttpEngine(html)
+    limiter = HostRateLimiter(max_concurrency=1, min_interval=0)
+    _, e2e_t = time_phase(lambda: scrape_search('bench', engine, None, engine='http', rate_limiter=limiter), repeat)
+
+    # Pico de memória medido à parte (tracemalloc deixa o código mais lento)
+    tracemalloc.start()
+    scrape_search('bench', engine, None, engine='http', rate_limiter=limiter)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    items = len(products)
+    parse_extract = parse_t['median'] + extract_t['median']
+    speedup = mismatches = None
+    if reference is not None:
+        # Mesma página, mesma execução: a razão não depende da máquina
+        ref_products, ref_parse_t, ref_extract_t = bench_parsing(html, reference, repeat)
+        own = parse_t[COMPARE_STAT] + extract_t[COMPARE_STAT]
+        ref = ref_parse_t[COMPARE_STAT] + ref_extract_t[COMPARE_STAT]
+        # Páginas sem produtos medem só ruído
+        speedup = round(ref / own, 2) if own and items else None
+        # Um parser rápido que perde campos não conta
+        mismatches = abs(len(products) - len(ref_products)) + sum(
+            1 for product, expected in zip(products, ref_products) if product != expected)
+    return {
+        'items': items,
+        'html_bytes': len(html.encode('utf-8')),
+        'phases': {
+            'parse': parse_t,
+            'extract': extract_t,
+            'price_normalization': pricing_t,
+            'serialization': serialize_t,
+            'end_to_end': e2e_t,
+        },
+        'items_per_second': round(items / parse_extract, 1) if parse_extract and items else 0.0,
+        'peak_memory_bytes': peak,
+        'speedup_vs_reference': speedup,
+        'reference_mismatches': mismatches,
+    }
+
+
+def relative_baseline(results):
+    """Baseline independente da máquina: só os speedups de cada página"""
+    return {
+        'parser': results['parser'],
+        'reference': results['reference'],
+        'pages': {page: {'speedup_vs_reference': data['speedup_vs_reference']}
+                  for page, data in results['pages'].items() if data['speedup_vs_reference']},
+    }
+
+
+def check_speedup(results, min_speedup):
+    """Páginas em que o parser não ficou ``min_speedup`` vezes mais rápido que a referência"""
+    slow = []
+    for page, data in results['pages'].items():
+        speedup = data.get('speedup_vs_reference')
+        if speedup is not None and data['items'] and speedup < min_speedup:
+            slow.append(f"{page}: {speedup:.2f}x (mínimo {min_speedup:.2f}x)")
+    return slow
+
+
+def compare(results, baseline, threshold):
+    """Retorna a lista de regressões (fase mais lenta que baseline * (1 + threshold))"""
+    regressions = []
+    for page, data in results['pages'].items():
+        base_page = baseline.get('pages', {}).get(page)
+        if not base_page:
+            continue
+        base_speedup = base_page.get('speedup_vs_reference')
+        speedup = data.get('speedup_vs_reference')
+        if base_speedup and speedup and speedup * (1 + threshold) < base_speedup:
+            regressions.append(f"{page}/speedup: {base_speedup:.2f}x -> {speedup:.2f}x")
+        for phase, timing in data['phases'].items():
+            base_timing = base_page.get('phases', {}).get(phase)
+            if not base_timing or base_timing[COMPARE_STAT] < NOISE_FLOOR_SECONDS:
+                continue
+            ratio = timing[COMPARE_STAT] / base_timing[COMPARE_STAT]
+            if ratio > 1 + threshold:
+                regressions.append(f"{page}/{phase}: {base_timing[COMPARE_STAT] * 1000:.1f} ms -> "
+                                   f"{timing[COMPARE_STAT] * 1000:.1f} ms ({(ratio - 1) * 100:+.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Benchmark offline do parser do scraper')
+    arg_parser.add_argument('--repeat', type=int, default=5, help='execuções por fase')
+    arg_parser.add_argument('--sizes', type=int, nargs='*', default=[1000, 5000], help='tamanhos das páginas sintéticas (cards)')
+    arg_parser.add_argument('--parser', default=None, help="backend: auto, lxml ou beautifulsoup")
+    arg_parser.add_argument('--output', default=DEFAULT_OUTPUT, help='arquivo JSON com os resultados')
+    arg_parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='arquivo JSON do baseline')
+    arg_parser.add_argument('--threshold', type=float, default=0.5, help='regressão máxima aceita (0.5 = 50%%)')
+    arg_parser.add_argument('--min-speedup', type=float, default=1.0,
+                            help='quantas vezes o parser deve ser mais rápido que o BeautifulSoup na mesma execução')
+    arg_parser.add_argument('--update-baseline', action='store_true', help='grava os resultados como novo baseline')
+    arg_parser.add_argument('--timings', action='store_true',
+                            help='com --update-baseline, guarda também os tempos absolutos (baseline só desta máquina)')
+    args = arg_parser.parse_args(argv)
+
+    # Sem logs por página durante as medições (a página sem produtos gera avisos)
+    logging.disable(logging.WARNING)
+    parser = get_parser(args.parser)
+    # Comparar o BeautifulSoup com ele mesmo não diz nada
+    reference = SoupParser() if parser.name != SoupParser.name else None
+
+    pages = {name: load_fixture(name) for name in FIXTURES}
+    for size in args.sizes:
+        pages[f'synthetic_{size}'] = build_synthetic_page(pages['debug_page.html'], size)
+
+    results = {
+        'parser': parser.name,
+        'python': platform.python_version(),
+        'reference': reference.name if reference else None,
+        'repeat': args.repeat,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'pages': {},
+    }
+
+    for name, html in pages.items():
+        data = bench_page(html, parser, args.repeat, reference)
+        results['pages'][name] = data
+        phases = '  '.join(f"{phase}={timing['median'] * 1000:.1f}ms" for phase, timing in data['phases'].items())
+        speedup = f"  {data['speedup_vs_reference']:.1f}x o {reference.name}" if data['speedup_vs_reference'] else ''
+        print(f"📄 {name}: {data['items']} itens  {phases}  "
+              f"{data['items_per_second']:.0f} itens/s  pico {data['peak_memory_bytes'] / 1024 / 1024:.1f} MB{speedup}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"💾 Resultados salvos em {args.output}")
+
+    mismatched = [f"{page}: {data['reference_mismatches']} produto(s)"
+                  for page, data in results['pages'].items() if data['reference_mismatches']]
+    if mismatched:
+        print(f"❌ Produtos do {parser.name} diferentes dos do {reference.name}:")
+        for line in mismatched:
+            print(f"   - {line}")
+        return 1
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results if args.timings else relative_baseline(results), f, ensure_ascii=False, indent=2)
+        print(f"📌 Baseline atualizado em {args.baseline}")
+        return 0
+
+    slow = check_speedup(results, args.min_speedup)
+    if slow:
+        print(f"❌ {parser.name} não ficou {args.min_speedup:.2f}x mais rápido que o {reference.name}:")
+        for line in slow:
+            print(f"   - {line}")
+        return 1
+
+    if not os.path.exists(args.baseline):
+        print(f"❌ Baseline {args.baseline} não encontrado; gere-o com --update-baseline")
+        return 1
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('parser') != results['parser']:
+        # Os speedups do baseline são de outro parser (ex: lxml não instalado)
+        print(f"❌ Baseline medido com o parser {baseline.get('parser')}, não com {results['parser']}")
+        return 1
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"❌ Regressões acima de {args.threshold * 100:.0f}%:")
+        for line in regressions:
+            print(f"   - {line}")
+        return 1
+    print(f"✅ Nenhuma regressão acima de {args.threshold * 100:.0f}%")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
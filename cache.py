@@ -0,0 +1,318 @@
+import asyncio
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_term(search_term):
+    """Normaliza o termo de busca para uso como chave ('  iPhone  17 ' -> 'iphone 17')"""
+    return ' '.join(search_term.lower().split())
+
+
+def _estimate_size(value):
+    try:
+        return len(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+    except (TypeError, ValueError):
+        return 1024
+
+
+class _Entry:
+    def __init__(self, value, size, ttl):
+        self.value = value
+        self.size = size
+        self.ttl = ttl
+        self.created_at = time.time()
+
+
+class _Flight:
+    """Cálculo em andamento compartilhado pelas requisições da mesma chave"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        # Itens parciais publicados pelo cálculo (streaming), na ordem
+        self.items = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._callbacks = []
+
+    def publish(self, item):
+        with self._lock:
+            self.items.append(item)
+            self._changed.notify_all()
+
+    def follow(self):
+        """Gera os itens publicados, os anteriores e os seguintes, até o cálculo terminar"""
+        position = 0
+        while True:
+            with self._lock:
+                while position >= len(self.items) and not self.done.is_set():
+                    self._changed.wait()
+                items = self.items[position:]
+                finished = self.done.is_set()
+            position += len(items)
+            yield from items
+            if finished:
+                return
+
+    def finish(self):
+        with self._lock:
+            self.done.set()
+            self._changed.notify_all()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    async def wait_async(self):
+        """Espera o cálculo terminar sem bloquear o loop de eventos"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        with self._lock:
+            if self.done.is_set():
+                return
+            self._callbacks.append(wake)
+        await future
+
+
+class ResultCache:
+    """Cache de resultados com TTL, LRU por tamanho e coalescência de requisições.
+
+    - Entradas com idade < ``ttl`` são servidas diretamente.
+    - Entradas com idade < ``ttl + stale_ttl`` são servidas na hora (stale) e
+      atualizadas em segundo plano (stale-while-revalidate).
+    - Requisições simultâneas da mesma chave compartilham um único cálculo.
+    - Quando o total estimado passa de ``max_bytes``, as entradas menos
+      usadas recentemente são removidas.
+    - ``ttl_for(valor)``, se informado, pode encurtar o TTL de uma entrada
+      (ex: resultado incompleto); retorna ``None`` para usar o padrão.
+    """
+
+    def __init__(self, ttl=300, stale_ttl=1800, max_bytes=32 * 1024 * 1024, ttl_for=None):
+        self.ttl = ttl
+        self.ttl_for = ttl_for
+        self.stale_ttl = stale_ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._tasks = set()
+        self._bytes = 0
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0, 'refresh_errors': 0,
+                       'fallbacks': 0}
+
+    def lookup(self, key, refresh=None):
+        """Retorna ``(valor, status)`` se houver entrada fresca (hit) ou stale.
+
+        Em entradas stale, ``refresh`` é executado em segundo plano para
+        atualizar o cache. Sem entrada utilizável retorna ``(None, None)``.
+        """
+        with self._lock:
+            return self._lookup_locked(key, refresh)
+
+    def _lookup_locked(self, key, refresh):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, None
+        age = time.time() - entry.created_at
+        if age < entry.ttl:
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry.value, 'hit'
+        if age < entry.ttl + self.stale_ttl:
+            self._entries.move_to_end(key)
+            self._stats['stale_hits'] += 1
+            if refresh is not None and key not in self._flights:
+                flight = self._flights[key] = _Flight()
+                threading.Thread(
+                    target=self._run_flight, args=(key, flight, refresh),
+                    name='cache-refresh', daemon=True
+                ).start()
+            return entry.value, 'stale'
+        return None, None
+
+    def last_known(self, key):
+        """Último valor gravado da chave, mesmo expirado (para quando o site está fora do ar)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._stats['fallbacks'] += 1
+            return entry.value
+
+    def get_or_compute(self, key, compute):
+        """Retorna ``(valor, status)``; status: hit, stale, miss ou coalesced"""
+        with self._lock:
+            value, status = self._lookup_locked(key, compute)
+            if status is not None:
+                return value, status
+
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats['coalesced'] += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                self._stats['misses'] += 1
+                leader = True
+
+        if leader:
+            self._run_flight(key, flight, compute)
+        else:
+            flight.done.wait()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.value, 'miss' if leader else 'coalesced'
+
+    def join_or_start(self, key, compute):
+        """Entra no cálculo em andamento da chave ou inicia um numa thread.
+
+        ``compute(publish)`` calcula o valor chamando ``publish(item)`` para
+        cada item parcial (ex: produto extraído); quem entra depois recebe em
+        ``flight.follow()`` os itens já publicados e os seguintes. Retorna
+        ``(flight, status)`` com status miss ou coalesced; no fim, o valor fica
+        em ``flight.value`` (ou o erro em ``flight.error``) e no cache. Cálculos
+        iniciados por ``get_or_compute`` não publicam itens, só o valor final.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats['coalesced'] += 1
+                return flight, 'coalesced'
+            flight = self._flights[key] = _Flight()
+            self._stats['misses'] += 1
+        # Numa thread própria: se quem iniciou desistir, o cálculo termina para os demais
+        context = contextvars.copy_context()
+        threading.Thread(
+            target=context.run, args=(self._run_flight, key, flight, lambda: compute(flight.publish)),
+            name='cache-stream', daemon=True
+        ).start()
+        return flight, 'miss'
+
+    async def aget_or_compute(self, key, compute):
+        """Versão asyncio de ``get_or_compute``; ``compute`` é uma função assíncrona.
+
+        Quem chega durante um cálculo em andamento (inclusive um iniciado
+        pelo caminho síncrono) espera sem ocupar uma thread. O cálculo roda
+        numa task própria: se quem o iniciou desistir (timeout), o resultado
+        ainda é gravado para os demais.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            value, status = self._lookup_locked(key, None)
+            if status == 'stale' and key not in self._flights:
+                # Atualização em segundo plano, no próprio loop
+                flight = self._flights[key] = _Flight()
+                self._start_task(loop, key, flight, compute)
+            if status is not None:
+                return value, status
+
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats['coalesced'] += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                self._stats['misses'] += 1
+                leader = True
+
+        if leader:
+            await asyncio.shield(self._start_task(loop, key, flight, compute))
+        else:
+            await flight.wait_async()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.value, 'miss' if leader else 'coalesced'
+
+    def _start_task(self, loop, key, flight, compute):
+        task = loop.create_task(self._arun_flight(key, flight, compute))
+        # Manter a referência até o fim para a task não ser coletada
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _run_flight(self, key, flight, compute):
+        try:
+            flight.value = compute()
+            self.set(key, flight.value)
+        except Exception as e:
+            self._flight_failed(key, flight, e)
+        finally:
+            self._release_flight(key, flight)
+
+    async def _arun_flight(self, key, flight, compute):
+        try:
+            flight.value = await compute()
+            self.set(key, flight.value)
+        except asyncio.CancelledError:
+            flight.error = RuntimeError('Cálculo cancelado')
+            raise
+        except Exception as e:
+            self._flight_failed(key, flight, e)
+        finally:
+            self._release_flight(key, flight)
+
+    def _flight_failed(self, key, flight, error):
+        flight.error = error
+        with self._lock:
+            self._stats['refresh_errors'] += 1
+        logger.warning(f"⚠️ Erro ao calcular entrada do cache '{key}': {str(error)}")
+
+    def _release_flight(self, key, flight):
+        with self._lock:
+            self._flights.pop(key, None)
+        flight.finish()
+
+    def set(self, key, value, ttl=None):
+        """Grava a entrada; ``ttl`` substitui o TTL padrão só para ela"""
+        if self.ttl_for is not None:
+            shorter = self.ttl_for(value)
+            if shorter is not None:
+                ttl = shorter if ttl is None else min(ttl, shorter)
+        size = _estimate_size(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            if size > self.max_bytes:
+                logger.info(f"ℹ️ Resultado de '{key}' grande demais para o cache ({size} bytes)")
+                return
+            self._entries[key] = _Entry(value, size, self.ttl if ttl is None else ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self._stats['evictions'] += 1
+                logger.debug(f"🗑️ Cache: removendo '{evicted_key}' (LRU)")
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._bytes -= entry.size
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                ttl=self.ttl,
+                stale_ttl=self.stale_ttl,
+            )
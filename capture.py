@@ -0,0 +1,158 @@
+import gzip
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from urllib.parse import parse_qs, urlparse
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_SUFFIX = '.html.gz'
+_NAME_RE = re.compile(r'^[\w.-]+\.html\.gz$')
+
+
+def _slug(url):
+    """Termo de busca da URL em formato seguro para nome de arquivo"""
+    query = parse_qs(urlparse(url).query)
+    term = query.get('q', ['pagina'])[0]
+    page = query.get('page', ['1'])[0]
+    slug = re.sub(r'[^a-z0-9]+', '-', term.lower()).strip('-')[:40] or 'pagina'
+    return f'{slug}-p{page}'
+
+
+class DebugCapture:
+    """Captura opcional do HTML das páginas buscadas, para depuração.
+
+    Páginas com anomalia (nenhum produto ou erros de extração) são sempre
+    capturadas; as demais com probabilidade ``sample_rate``. A gravação roda
+    numa thread em segundo plano, um arquivo ``.html.gz`` por página em
+    ``directory``; quando o diretório passa de ``max_bytes`` os arquivos mais
+    antigos são apagados. Com a fila cheia a captura é descartada, sem
+    atrasar a busca.
+    """
+
+    def __init__(self, directory='debug_pages', sample_rate=0.0, max_bytes=50 * 1024 * 1024, max_queue=20):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._files = deque()
+        self._bytes = 0
+        self._stats = {'captured': 0, 'dropped': 0, 'rotated': 0, 'errors': 0}
+        self._load_existing()
+        threading.Thread(target=self._writer, name='debug-capture', daemon=True).start()
+
+    def _load_existing(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if _NAME_RE.match(name):
+                path = os.path.join(self.directory, name)
+                files.append((os.path.getmtime(path), name, os.path.getsize(path)))
+        for _, name, size in sorted(files):
+            self._files.append((name, size))
+            self._bytes += size
+
+    def reason_for(self, products, errors):
+        """Motivo da captura ou ``None`` se a página não deve ser capturada"""
+        if products == 0:
+            return 'empty'
+        if errors:
+            return 'errors'
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sample'
+        return None
+
+    def submit(self, html, url, products, errors=0):
+        """Agenda a gravação do HTML se a página tiver anomalia ou for sorteada"""
+        reason = self.reason_for(products, errors)
+        if reason is None:
+            return None
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}_{reason}_{_slug(url)}_{uuid.uuid4().hex[:8]}{CAPTURE_SUFFIX}"
+        try:
+            self._queue.put_nowait((name, html))
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+            logger.warning(f"⚠️ Fila de captura cheia, HTML de {url} descartado")
+            return None
+        logger.info(f"📸 HTML de {url} agendado para captura ({reason})")
+        return name
+
+    def _writer(self):
+        while True:
+            name, html = self._queue.get()
+            try:
+                self._write(name, html)
+            except Exception as e:
+                with self._lock:
+                    self._stats['errors'] += 1
+                logger.warning(f"⚠️ Erro ao gravar captura {name}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, name, html):
+        with metrics.span('debug_dump'):
+            data = gzip.compress(html.encode('utf-8'), compresslevel=6)
+            path = os.path.join(self.directory, name)
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        with self._lock:
+            self._files.append((name, len(data)))
+            self._bytes += len(data)
+            self._stats['captured'] += 1
+            removed = []
+            while self._bytes > self.max_bytes and len(self._files) > 1:
+                old_name, old_size = self._files.popleft()
+                self._bytes -= old_size
+                self._stats['rotated'] += 1
+                removed.append(old_name)
+        for old_name in removed:
+            try:
+                os.remove(os.path.join(self.directory, old_name))
+            except OSError:
+                pass
+        logger.info(f"📸 HTML capturado em {name} ({len(data) / 1024:.0f} KB)")
+
+    def flush(self):
+        """Espera as capturas pendentes serem gravadas"""
+        self._queue.join()
+
+    def list_captures(self):
+        with self._lock:
+            files = list(self._files)
+        return [
+            {'name': name, 'bytes': size, 'reason': name.split('_')[1]}
+            for name, size in reversed(files)
+        ]
+
+    def path_for(self, name):
+        """Caminho do arquivo capturado ou ``None`` se o nome não existir"""
+        if not _NAME_RE.match(name):
+            return None
+        with self._lock:
+            if not any(existing == name for existing, _ in self._files):
+                return None
+        return os.path.join(self.directory, name)
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                files=len(self._files),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                queued=self._queue.qsize(),
+                sample_rate=self.sample_rate,
+            )
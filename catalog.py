@@ -0,0 +1,229 @@
+import hashlib
+import logging
+import math
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from store import product_id
+
+logger = logging.getLogger(__name__)
+
+# '512 GB' e '512GB' viram o mesmo token
+_UNIT_RE = re.compile(r'\b(\d+)\s+(gb|tb|mb|mah|w|hz|mm|mp|pol)\b')
+_NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+# Campos que ficam no catálogo
+CATALOG_FIELDS = ('Nome', 'Link', 'Imagem')
+# Campos que saem das linhas compactas; link e preços são de cada oferta e ficam na linha
+SHARED_FIELDS = ('Nome', 'Imagem')
+
+
+def normalize_name(name):
+    """Nome em minúsculas, sem acentos nem pontuação (ex: 'iPhone 17 Pro Max 512 GB')"""
+    if not name or name == 'N/A':
+        return ''
+    text = unicodedata.normalize('NFKD', str(name).lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = _NON_WORD_RE.sub(' ', text)
+    return _UNIT_RE.sub(r'\1\2', text).strip()
+
+
+def name_tokens(name):
+    return frozenset(normalize_name(name).split())
+
+
+def _name_key(normalized):
+    return 'n' + hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+
+
+def product_key(product):
+    """Chave canônica sem índice: ID do modelo no Link, senão o Link, senão o nome normalizado"""
+    pid = product_id(product.get('Link'))
+    if pid is not None:
+        return str(pid)
+    link = product.get('Link')
+    if link and link != 'N/A':
+        return link
+    return _name_key(normalize_name(product.get('Nome')))
+
+
+class ProductIndex:
+    """Índice canônico dos produtos vistos em todas as buscas.
+
+    A chave de cada produto é o ID numérico do modelo no final do Link
+    (resolvido num dicionário, O(1)). Linhas sem ID são resolvidas pelo nome
+    normalizado exato e, se não houver, pelo índice invertido de tokens:
+    o produto com Jaccard >= ``threshold`` entre os tokens dos nomes. Como
+    dois nomes com Jaccard >= t compartilham pelo menos um dos
+    ``n - ceil(t * n) + 1`` tokens de um deles, só as listas dos tokens mais
+    raros são consultadas. Guarda até ``max_entries`` produtos (os menos
+    usados recentemente saem primeiro).
+    """
+
+    def __init__(self, threshold=0.8, max_entries=50000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._by_name = {}
+        self._postings = {}
+        self._stats = {'known': 0, 'by_name': 0, 'fuzzy': 0, 'new': 0, 'evictions': 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def resolve(self, product):
+        """Chave canônica do produto, registrando-o no índice se for novo"""
+        normalized = normalize_name(product.get('Nome'))
+        with self._lock:
+            key, outcome = self._key_locked(product, normalized)
+            self._stats[outcome] += 1
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                entry = self._entries[key]
+                # O site às vezes omite a imagem em uma das listagens
+                if entry['Imagem'] in (None, 'N/A') and product.get('Imagem') not in (None, 'N/A'):
+                    entry['Imagem'] = product['Imagem']
+            else:
+                self._add_locked(key, product, normalized)
+            return key
+
+    def lookup(self, product):
+        """Chave canônica do produto sem alterar o índice (nem as estatísticas e a ordem LRU)"""
+        normalized = normalize_name(product.get('Nome'))
+        with self._lock:
+            return self._key_locked(product, normalized)[0]
+
+    def _key_locked(self, product, normalized):
+        pid = product_id(product.get('Link'))
+        if pid is not None:
+            key = str(pid)
+            return key, 'known' if key in self._entries else 'new'
+        key = self._by_name.get(normalized) if normalized else None
+        if key is not None:
+            return key, 'by_name'
+        key = self._fuzzy_locked(frozenset(normalized.split()))
+        if key is not None:
+            return key, 'fuzzy'
+        key = product.get('Link') if product.get('Link') not in (None, 'N/A') else _name_key(normalized)
+        return key, 'known' if key in self._entries else 'new'
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return {field: entry[field] for field in CATALOG_FIELDS} if entry else None
+
+    def _add_locked(self, key, product, normalized):
+        tokens = frozenset(normalized.split())
+        self._entries[key] = {
+            'Nome': product.get('Nome', 'N/A'),
+            'Link': product.get('Link', 'N/A'),
+            'Imagem': product.get('Imagem', 'N/A'),
+            'normalized': normalized,
+            'tokens': tokens,
+        }
+        if normalized:
+            self._by_name.setdefault(normalized, key)
+        for token in tokens:
+            self._postings.setdefault(token, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove_locked(*self._entries.popitem(last=False))
+            self._stats['evictions'] += 1
+
+    def _remove_locked(self, key, entry):
+        if self._by_name.get(entry['normalized']) == key:
+            del self._by_name[entry['normalized']]
+        for token in entry['tokens']:
+            keys = self._postings.get(token)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[token]
+
+    def _candidates_locked(self, tokens, threshold):
+        if not tokens:
+            return set()
+        prefix = len(tokens) - math.ceil(threshold * len(tokens)) + 1
+        rarest = sorted(tokens, key=lambda token: len(self._postings.get(token, ())))[:max(1, prefix)]
+        candidates = set()
+        for token in rarest:
+            candidates.update(self._postings.get(token, ()))
+        return candidates
+
+    def _fuzzy_locked(self, tokens):
+        # Tokens com números (capacidade, geração, modelo) precisam ser iguais:
+        # '... 256gb azul' e '... 512gb azul' são produtos diferentes
+        numbers = {token for token in tokens if any(ch.isdigit() for ch in token)}
+        best = None
+        for key in self._candidates_locked(tokens, self.threshold):
+            other = self._entries[key]['tokens']
+            if {token for token in other if any(ch.isdigit() for ch in token)} != numbers:
+                continue
+            score = len(tokens & other) / len(tokens | other)
+            if score >= self.threshold and (best is None or (score, key) > best):
+                best = (score, key)
+        return best[1] if best else None
+
+    def search(self, query, limit=10, threshold=0.5):
+        """Produtos com pelo menos ``threshold`` dos tokens de ``query``, dos mais parecidos aos menos"""
+        tokens = name_tokens(query)
+        with self._lock:
+            scored = []
+            for key in self._candidates_locked(tokens, threshold):
+                other = self._entries[key]['tokens']
+                shared = len(tokens & other)
+                if shared / len(tokens) >= threshold:
+                    scored.append((shared / len(tokens), shared / len(tokens | other), key))
+            scored.sort(key=lambda item: (-item[0], -item[1], item[2]))
+            return [
+                dict({field: self._entries[key][field] for field in CATALOG_FIELDS}, ID=key, score=round(score, 3))
+                for score, _, key in scored[:limit]
+            ]
+
+    def load(self, products):
+        """Registra os produtos no índice (o histórico na inicialização e cada busca gravada)"""
+        for product in products:
+            self.resolve(product)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), names=len(self._by_name),
+                        tokens=len(self._postings), max_entries=self.max_entries)
+
+
+def compact_rows(products, index=None):
+    """Linhas da resposta compacta: ``ID`` canônico, link e preços da oferta, sem nome e imagem.
+
+    Só consulta o ``index`` (não registra produtos), então pode ser usada
+    a cada consulta de um job.
+    """
+    lookup = index.lookup if index is not None else product_key
+    return [
+        dict({'ID': lookup(product)}, **{k: v for k, v in product.items() if k not in SHARED_FIELDS and k != 'ID'})
+        for product in products
+    ]
+
+
+def compact_products(products, index=None, known_ids=()):
+    """Resposta compacta: catálogo e imagens enviados uma vez, linhas só com ID, link e preços.
+
+    Retorna ``{'catalog': {id: {Nome, Link, Imagem}}, 'images': [urls],
+    'products': [{ID, Link, preços...}]}``, onde ``Imagem`` no catálogo é a
+    posição em ``images``. Cada linha mantém o link da própria oferta (duas
+    ofertas do mesmo modelo têm links diferentes). Produtos em ``known_ids``
+    (já recebidos pelo cliente) não entram no catálogo.
+    """
+    rows = compact_rows(products, index)
+    known = {str(key) for key in known_ids}
+    catalog, images, image_pos = {}, [], {}
+    for product, row in zip(products, rows):
+        key = row['ID']
+        if key in known or key in catalog:
+            continue
+        image = product.get('Imagem', 'N/A')
+        if image not in image_pos:
+            image_pos[image] = len(images)
+            images.append(image)
+        catalog[key] = {'Nome': product.get('Nome', 'N/A'), 'Link': product.get('Link', 'N/A'), 'Imagem': image_pos[image]}
+    return {'catalog': catalog, 'images': images, 'products': rows}
@@ -0,0 +1,269 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from selenium.common.exceptions import WebDriverException
+
+from governor import LocalFailure
+from scraper import setup_driver, MockDriver
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class DriverPoolTimeout(Exception):
+    """Nenhum driver ficou disponível dentro do tempo de espera"""
+
+
+class DriverLaunchError(LocalFailure, WebDriverException):
+    """O Chrome local não iniciou; não conta como falha do site no circuito"""
+
+
+class _PooledDriver:
+    def __init__(self, driver, launch_seconds):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = time.time()
+        self.launch_seconds = launch_seconds
+
+
+class DriverPool:
+    """Pool limitado e thread-safe de sessões do WebDriver.
+
+    Os navegadores são iniciados antecipadamente, emprestados às requisições
+    via ``lease()`` e reaproveitados. Entre empréstimos o estado (cookies,
+    navegação) é limpo; drivers que travam ou atingem ``max_uses`` são
+    descartados e substituídos.
+    """
+
+    def __init__(self, size=2, max_uses=50, lease_timeout=60, driver_factory=setup_driver):
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self.lease_timeout = lease_timeout
+        self._driver_factory = driver_factory
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._in_use = 0
+        self._launching = 0
+        self._closed = False
+
+        # Métricas
+        self._recycled = 0
+        self._launches = 0
+        self._launch_failures = 0
+        self._leases = 0
+        self._launch_total_seconds = 0.0
+        self._launch_max_seconds = 0.0
+        self._last_launch_seconds = None
+        self._wait_total_seconds = 0.0
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    def start(self, background=True):
+        """Inicia os navegadores do pool antecipadamente"""
+        def warm():
+            logger.info(f"🔥 Aquecendo pool com {self.size} driver(s)...")
+            for _ in range(self.size):
+                with self._cond:
+                    if self._closed or self._total() >= self.size:
+                        return
+                    self._launching += 1
+                pooled = self._launch()
+                self._release_slot(pooled)
+            logger.info("✅ Pool de drivers aquecido")
+
+        if background:
+            threading.Thread(target=warm, name='driver-pool-warmup', daemon=True).start()
+        else:
+            warm()
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for pooled in idle:
+            self._quit(pooled.driver)
+        logger.info("🔒 Pool de drivers encerrado")
+
+    # ------------------------------------------------------------------
+    # Empréstimo
+    # ------------------------------------------------------------------
+    @contextmanager
+    def lease(self, timeout=None):
+        """Empresta um driver do pool; devolve (ou recicla) ao sair do bloco"""
+        with metrics.span('driver_lease'):
+            pooled = self._acquire(self.lease_timeout if timeout is None else timeout)
+        broken = False
+        try:
+            yield pooled.driver
+        except WebDriverException:
+            # O navegador pode ter travado; não devolver ao pool
+            broken = True
+            raise
+        finally:
+            self._release(pooled, broken)
+
+    def _total(self):
+        return len(self._idle) + self._in_use + self._launching
+
+    def _acquire(self, timeout):
+        started = time.time()
+        deadline = started + timeout
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Pool de drivers encerrado")
+                    if self._idle:
+                        pooled = self._idle.popleft()
+                        self._in_use += 1
+                        break
+                    if self._total() < self.size:
+                        self._launching += 1
+                        pooled = None
+                        break
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise DriverPoolTimeout(f"Nenhum driver disponível após {timeout}s")
+                    self._cond.wait(remaining)
+
+            if pooled is None:
+                pooled = self._launch()
+                if pooled is None:
+                    with self._cond:
+                        self._launching -= 1
+                        self._cond.notify()
+                    raise DriverLaunchError("Não foi possível iniciar um driver para o pool")
+                with self._cond:
+                    self._launching -= 1
+                    self._in_use += 1
+            elif not self._is_healthy(pooled.driver):
+                logger.warning("⚠️ Driver ocioso falhou no health-check, reciclando...")
+                self._discard(pooled)
+                continue
+
+            pooled.uses += 1
+            with self._cond:
+                self._leases += 1
+                self._wait_total_seconds += time.time() - started
+            return pooled
+
+    def _release(self, pooled, broken):
+        recycle = broken or (self.max_uses and pooled.uses >= self.max_uses)
+        if not recycle:
+            try:
+                self._reset(pooled.driver)
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao limpar estado do driver: {str(e)}")
+                recycle = True
+
+        if recycle:
+            reason = 'falha' if broken else 'limite de usos'
+            logger.info(f"♻️ Reciclando driver ({reason}, {pooled.uses} usos)")
+            self._discard(pooled)
+            # Repor a capacidade em segundo plano para manter o pool aquecido
+            self.start(background=True)
+            return
+
+        with self._cond:
+            self._in_use -= 1
+            if self._closed:
+                closed = True
+            else:
+                closed = False
+                self._idle.append(pooled)
+                self._cond.notify()
+        if closed:
+            self._quit(pooled.driver)
+
+    def _release_slot(self, pooled):
+        """Devolve ao pool um driver recém-iniciado pelo aquecimento"""
+        with self._cond:
+            self._launching -= 1
+            if pooled is not None and not self._closed:
+                self._idle.append(pooled)
+                pooled = None
+            self._cond.notify()
+        if pooled is not None:
+            self._quit(pooled.driver)
+
+    def _discard(self, pooled):
+        with self._cond:
+            self._in_use -= 1
+            self._recycled += 1
+            self._cond.notify()
+        self._quit(pooled.driver)
+
+    # ------------------------------------------------------------------
+    # Operações no driver
+    # ------------------------------------------------------------------
+    def _launch(self):
+        started = time.time()
+        try:
+            driver = self._driver_factory()
+        except Exception as e:
+            logger.error(f"❌ Erro ao iniciar driver do pool: {str(e)}")
+            with self._cond:
+                self._launch_failures += 1
+            return None
+        elapsed = time.time() - started
+        with self._cond:
+            self._launches += 1
+            self._launch_total_seconds += elapsed
+            self._launch_max_seconds = max(self._launch_max_seconds, elapsed)
+            self._last_launch_seconds = elapsed
+        logger.info(f"🚀 Driver iniciado em {elapsed:.2f}s ({type(driver).__name__})")
+        return _PooledDriver(driver, elapsed)
+
+    @staticmethod
+    def _is_healthy(driver):
+        if isinstance(driver, MockDriver):
+            return True
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _reset(driver):
+        if isinstance(driver, MockDriver):
+            driver.session.cookies.clear()
+            driver.page_source = ''
+            return
+        driver.delete_all_cookies()
+        driver.get('about:blank')
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao fechar driver: {str(e)}")
+
+    # ------------------------------------------------------------------
+    # Métricas
+    # ------------------------------------------------------------------
+    def stats(self):
+        with self._cond:
+            launches = self._launches
+            return {
+                'size': self.size,
+                'max_uses': self.max_uses,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'launching': self._launching,
+                'recycled': self._recycled,
+                'leases': self._leases,
+                'launches': launches,
+                'launch_failures': self._launch_failures,
+                'launch_seconds_avg': round(self._launch_total_seconds / launches, 3) if launches else None,
+                'launch_seconds_max': round(self._launch_max_seconds, 3) if launches else None,
+                'launch_seconds_last': round(self._last_launch_seconds, 3) if launches else None,
+                'lease_wait_seconds_avg': round(self._wait_total_seconds / self._leases, 3) if self._leases else None,
+            }
@@ -0,0 +1,437 @@
+import asyncio
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import DEFAULT_ACCEPT_ENCODING
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from scraper import (
+    CHROME_USER_AGENT, MockDriver, build_search_url, discover_page_count,
+    load_search_page, iter_products
+)
+from catalog import product_key
+from governor import default_limiter
+import metrics
+
+logger = logging.getLogger(__name__)
+
+BROWSER_HEADERS = {
+    'User-Agent': CHROME_USER_AGENT,
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
+    # gzip/deflate sempre; br quando o pacote brotli estiver instalado
+    'Accept-Encoding': DEFAULT_ACCEPT_ENCODING,
+}
+
+
+class HttpEngine:
+    """Engine de busca via HTTP puro, com sessão e conexões keep-alive reutilizadas.
+
+    Com ``cache`` (um DiskResponseCache), respostas recentes são servidas do
+    disco e as demais são revalidadas com ETag/Last-Modified (304).
+    """
+
+    name = 'http'
+
+    def __init__(self, pool_size=10, timeout=15, cache=None):
+        self.timeout = timeout
+        self.cache = cache
+        self.session = requests.Session()
+        self.session.headers.update(BROWSER_HEADERS)
+        self.session.headers['Connection'] = 'keep-alive'
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def fetch(self, url):
+        meta, fresh = self.cache.lookup(url) if self.cache is not None else (None, False)
+        if fresh:
+            try:
+                html = self.cache.read_body(meta)
+                self.cache.record('hits')
+                logger.info(f"💽 HTTP: {url} servido do cache em disco")
+                return html
+            except OSError:
+                meta = None
+
+        logger.info(f"🌐 HTTP: buscando {url}")
+        headers = self.cache.conditional_headers(meta) if meta else None
+        with metrics.span('page_load', engine=self.name):
+            response = self.session.get(url, timeout=self.timeout, headers=headers)
+            if response.status_code == 304 and meta:
+                try:
+                    html = self.cache.read_body(meta)
+                except OSError:
+                    # Corpo sumiu do disco: buscar de novo sem condicionais
+                    response = self.session.get(url, timeout=self.timeout)
+                else:
+                    self.cache.revalidated(url)
+                    self.cache.record('revalidated')
+                    logger.info(f"💽 HTTP: {url} não mudou (304)")
+                    return html
+            response.raise_for_status()
+
+        if self.cache is not None:
+            self.cache.record('misses')
+            self.cache.store(
+                url, response.text, encoding=response.encoding,
+                etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified')
+            )
+        return response.text
+
+    def fetch_page(self, url, rate_limiter=None):
+        """Retorna ``(html, engine)``; com ``rate_limiter`` a requisição passa pelo governador"""
+        html = rate_limiter.call(url, self.fetch, url) if rate_limiter is not None else self.fetch(url)
+        return html, self.name
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncHttpEngine:
+    """Engine HTTP assíncrono (httpx) usado no modo ASGI.
+
+    Mantém até ``pool_size`` conexões abertas e usa o mesmo cache em disco
+    do ``HttpEngine``; a leitura e a gravação dos arquivos do cache rodam em
+    threads para não bloquear o loop de eventos.
+    """
+
+    name = 'http'
+
+    def __init__(self, pool_size=100, timeout=15, cache=None):
+        if httpx is None:
+            raise RuntimeError("httpx não instalado")
+        self.cache = cache
+        self.client = httpx.AsyncClient(
+            headers=BROWSER_HEADERS,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            follow_redirects=True,
+        )
+
+    async def fetch(self, url):
+        meta, fresh = self.cache.lookup(url) if self.cache is not None else (None, False)
+        if fresh:
+            try:
+                html = await asyncio.to_thread(self.cache.read_body, meta)
+                self.cache.record('hits')
+                logger.info(f"💽 HTTP: {url} servido do cache em disco")
+                return html
+            except OSError:
+                meta = None
+
+        logger.info(f"🌐 HTTP (async): buscando {url}")
+        headers = self.cache.conditional_headers(meta) if meta else None
+        with metrics.span('page_load', engine=self.name):
+            response = await self.client.get(url, headers=headers)
+            if response.status_code == 304 and meta:
+                try:
+                    html = await asyncio.to_thread(self.cache.read_body, meta)
+                except OSError:
+                    response = await self.client.get(url)
+                else:
+                    await asyncio.to_thread(self.cache.revalidated, url)
+                    self.cache.record('revalidated')
+                    logger.info(f"💽 HTTP: {url} não mudou (304)")
+                    return html
+            response.raise_for_status()
+
+        if self.cache is not None:
+            self.cache.record('misses')
+            await asyncio.to_thread(
+                self.cache.store, url, response.text, encoding=response.encoding,
+                etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified')
+            )
+        return response.text
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class SeleniumEngine:
+    """Engine de busca via navegador, usando drivers emprestados do pool"""
+
+    name = 'selenium'
+
+    def __init__(self, driver_pool):
+        self.driver_pool = driver_pool
+
+    def fetch_page(self, url, rate_limiter=None):
+        """Retorna ``(html, engine)``.
+
+        Só a navegação passa pelo ``rate_limiter``: a espera por um navegador
+        livre no pool não ocupa vaga nem token do host. As novas tentativas
+        usam o mesmo navegador; se ele travar, o pool o descarta no fim.
+        """
+        with self.driver_pool.lease() as driver:
+            if rate_limiter is not None:
+                rate_limiter.call(url, load_search_page, driver, url)
+            else:
+                load_search_page(driver, url)
+            # O pool pode conter o MockDriver quando o Chrome não inicia
+            engine = 'requests-fallback' if isinstance(driver, MockDriver) else self.name
+            return driver.page_source, engine
+
+
+class _Deduplicator:
+    """Filtra produtos repetidos (pelo ID do modelo no Link) e controla o limite de produtos"""
+
+    def __init__(self, max_products=None):
+        self.max_products = max_products
+        self.seen = set()
+        self.count = 0
+
+    def accept(self, product):
+        key = product_key(product)
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        self.count += 1
+        return True
+
+    @property
+    def full(self):
+        return bool(self.max_products) and self.count >= self.max_products
+
+
+def _iter_page(html, url, capture):
+    """Gera os produtos de uma página e a entrega à captura de debug ao terminar"""
+    stats = {}
+    yield from iter_products(html, stats=stats)
+    if capture is not None:
+        capture.submit(html, url, stats['extracted'], stats['errors'])
+
+
+def _iter_first_page(search_url, http_engine, selenium_engine, engine, rate_limiter, info, capture=None):
+    """Gera os produtos da primeira página escolhendo o engine mais barato que a resolva.
+
+    Preenche ``info`` com o HTML, o engine usado e o objeto engine a ser
+    reutilizado nas páginas seguintes.
+    """
+    if engine in ('auto', 'http') and http_engine is not None:
+        started = time.time()
+        try:
+            html = rate_limiter.call(search_url, http_engine.fetch, search_url)
+        except requests.RequestException as e:
+            if engine == 'http' or selenium_engine is None:
+                raise
+            logger.warning(f"⚠️ Falha no engine HTTP ({str(e)}), escalando para o Selenium...")
+            html = None
+
+        if html is not None:
+            info.update(html=html, engine=http_engine.name, page_engine=http_engine)
+            count = 0
+            for product in _iter_page(html, search_url, capture):
+                count += 1
+                yield product
+            logger.info(f"⚡ HTTP: {count} produtos em {time.time() - started:.2f}s")
+            if count or engine == 'http' or selenium_engine is None:
+                return
+            logger.info("🔼 HTML estático sem produtos, escalando para o Selenium...")
+
+    if selenium_engine is None:
+        raise ValueError(f"Engine de busca indisponível: {engine}")
+
+    html, used_engine = selenium_engine.fetch_page(search_url, rate_limiter)
+    info.update(html=html, engine=used_engine, page_engine=selenium_engine)
+    yield from _iter_page(html, search_url, capture)
+
+
+def iter_search(search_term, http_engine=None, selenium_engine=None, engine='auto',
+                max_pages=1, max_products=None, rate_limiter=None, on_page=None, info=None, capture=None):
+    """Gera os produtos de uma busca à medida que são extraídos.
+
+    Com ``engine='auto'`` a página é buscada primeiro por HTTP; o navegador
+    só é usado se o HTML estático não trouxer nenhum produto ou se a
+    requisição HTTP falhar. Se ``max_pages`` > 1, a paginação é descoberta
+    na primeira página e as páginas 2..N são buscadas em paralelo com o
+    mesmo engine, respeitando o ``rate_limiter`` por host. Os produtos são
+    entregues sem duplicatas e a busca para ao atingir ``max_products``.
+    ``on_page(pagina, total_de_paginas, novos_produtos)`` é chamado a cada
+    página concluída; uma exceção levantada por ele interrompe a busca.
+    O engine usado, o total de páginas e as páginas 2..N que falharam
+    (``failed_pages``; o resultado fica incompleto) ficam em ``info``. Com ``capture``
+    (um DebugCapture), o HTML das páginas com anomalia é gravado para depuração.
+    """
+    info = {} if info is None else info
+    info['failed_pages'] = []
+    rate_limiter = rate_limiter or default_limiter()
+    search_url = build_search_url(search_term)
+    logger.info(f"🌐 Iniciando scraping para termo: '{search_term}' (engine: {engine})")
+
+    dedup = _Deduplicator(max_products)
+    page_products = []
+    for product in _iter_first_page(search_url, http_engine, selenium_engine, engine, rate_limiter, info, capture):
+        if dedup.accept(product):
+            page_products.append(product)
+            yield product
+            if dedup.full:
+                break
+
+    metrics.ENGINE_USAGE.inc(engine=info['engine'])
+    total_pages = min(discover_page_count(info['html']), max_pages or 1)
+    info['pages_total'] = total_pages
+    if on_page is not None:
+        on_page(1, total_pages, page_products)
+    if dedup.full:
+        logger.info(f"🛑 Limite de {max_products} produtos atingido na página 1")
+        return
+    if total_pages <= 1:
+        return
+
+    logger.info(f"📚 Buscando páginas 2..{total_pages} em paralelo")
+    page_engine = info['page_engine']
+
+    def fetch_and_parse(page):
+        url = build_search_url(search_term, page)
+        page_html, _ = page_engine.fetch_page(url, rate_limiter)
+        return list(_iter_page(page_html, url, capture))
+
+    executor = ThreadPoolExecutor(max_workers=rate_limiter.max_concurrency, thread_name_prefix='page-fetch')
+    try:
+        # Cada página roda com uma cópia do contexto para que os spans contem na requisição
+        futures = [executor.submit(contextvars.copy_context().run, fetch_and_parse, page)
+                   for page in range(2, total_pages + 1)]
+        # Entregar na ordem das páginas para manter a ordenação do site
+        for page, future in enumerate(futures, start=2):
+            try:
+                products = future.result()
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao buscar página {page}: {str(e)}")
+                info['failed_pages'].append(page)
+                continue
+            page_products = []
+            for product in products:
+                if dedup.accept(product):
+                    page_products.append(product)
+                    yield product
+                    if dedup.full:
+                        break
+            if on_page is not None:
+                on_page(page, total_pages, page_products)
+            if dedup.full:
+                logger.info(f"🛑 Limite de {max_products} produtos atingido na página {page}")
+                break
+    finally:
+        # Também executado se quem consome o gerador parar antes do fim
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    logger.info(f"📚 {dedup.count} produtos únicos em até {total_pages} páginas")
+
+
+def scrape_search(search_term, http_engine=None, selenium_engine=None, engine='auto',
+                  max_pages=1, max_products=None, rate_limiter=None, on_page=None, capture=None, info=None):
+    """Versão em lista de ``iter_search``; retorna ``(produtos, nome_do_engine)``.
+
+    ``info`` recebe os mesmos dados de ``iter_search`` (ex: ``failed_pages``).
+    """
+    info = {} if info is None else info
+    products = list(iter_search(
+        search_term, http_engine, selenium_engine, engine=engine, max_pages=max_pages,
+        max_products=max_products, rate_limiter=rate_limiter, on_page=on_page, info=info, capture=capture
+    ))
+    return products, info['engine']
+
+
+async def async_scrape_search(search_term, http_engine=None, selenium_engine=None, engine='auto',
+                              max_pages=1, max_products=None, rate_limiter=None, capture=None, executor=None,
+                              info=None):
+    """Versão asyncio de ``scrape_search`` para o modo ASGI; retorna ``(produtos, nome_do_engine)``.
+
+    ``http_engine`` é um ``AsyncHttpEngine``. As páginas são parseadas em
+    threads e o Selenium, quando necessário, roda no ``executor`` (limitado
+    ao tamanho do pool de navegadores) para não bloquear o loop de eventos.
+    A escolha do engine, a paginação e o ``info`` seguem ``iter_search``.
+    """
+    info = {} if info is None else info
+    info['failed_pages'] = []
+    loop = asyncio.get_running_loop()
+    rate_limiter = rate_limiter or default_limiter()
+    search_url = build_search_url(search_term)
+    logger.info(f"🌐 Iniciando scraping assíncrono para termo: '{search_term}' (engine: {engine})")
+
+    async def parse(html, url):
+        return await asyncio.to_thread(lambda: list(_iter_page(html, url, capture)))
+
+    async def fetch_http(url):
+        return await rate_limiter.acall(url, http_engine.fetch, url)
+
+    async def fetch_selenium(url):
+        # Cópia do contexto para que os spans contem na requisição
+        html, _ = await loop.run_in_executor(
+            executor, contextvars.copy_context().run, selenium_engine.fetch_page, url, rate_limiter
+        )
+        return html
+
+    html = products = used_engine = fetch_page = None
+    if engine in ('auto', 'http') and http_engine is not None:
+        started = time.time()
+        try:
+            html = await fetch_http(search_url)
+        except httpx.HTTPError as e:
+            if engine == 'http' or selenium_engine is None:
+                raise
+            logger.warning(f"⚠️ Falha no engine HTTP ({str(e)}), escalando para o Selenium...")
+
+        if html is not None:
+            products = await parse(html, search_url)
+            logger.info(f"⚡ HTTP: {len(products)} produtos em {time.time() - started:.2f}s")
+            if products or engine == 'http' or selenium_engine is None:
+                used_engine, fetch_page = http_engine.name, fetch_http
+            else:
+                logger.info("🔼 HTML estático sem produtos, escalando para o Selenium...")
+
+    if used_engine is None:
+        if selenium_engine is None:
+            raise ValueError(f"Engine de busca indisponível: {engine}")
+        html, used_engine = await loop.run_in_executor(
+            executor, contextvars.copy_context().run, selenium_engine.fetch_page, search_url, rate_limiter
+        )
+        products = await parse(html, search_url)
+        fetch_page = fetch_selenium
+
+    metrics.ENGINE_USAGE.inc(engine=used_engine)
+    info['engine'] = used_engine
+    dedup = _Deduplicator(max_products)
+    results = []
+
+    def accept_all(page_products):
+        for product in page_products:
+            if dedup.accept(product):
+                results.append(product)
+                if dedup.full:
+                    return
+
+    accept_all(products)
+    total_pages = min(discover_page_count(html), max_pages or 1)
+    info['pages_total'] = total_pages
+    if total_pages > 1 and not dedup.full:
+        logger.info(f"📚 Buscando páginas 2..{total_pages} em paralelo")
+
+        async def fetch_and_parse(page):
+            url = build_search_url(search_term, page)
+            return await parse(await fetch_page(url), url)
+
+        pages = await asyncio.gather(*(fetch_and_parse(page) for page in range(2, total_pages + 1)),
+                                     return_exceptions=True)
+        # Na ordem das páginas para manter a ordenação do site
+        for page, page_products in enumerate(pages, start=2):
+            if isinstance(page_products, Exception):
+                logger.warning(f"⚠️ Erro ao buscar página {page}: {str(page_products)}")
+                info['failed_pages'].append(page)
+                continue
+            accept_all(page_products)
+            if dedup.full:
+                logger.info(f"🛑 Limite de {max_products} produtos atingido na página {page}")
+                break
+
+    logger.info(f"📚 {dedup.count} produtos únicos em até {total_pages} páginas")
+    return results, used_engine
@@ -0,0 +1,353 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    from selenium.common.exceptions import WebDriverException
+except ImportError:
+    WebDriverException = None
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+OUTBOUND_RETRIES = metrics.REGISTRY.counter(
+    'scraper_outbound_retries_total', 'Novas tentativas de requisições ao site, por host e motivo')
+OUTBOUND_REJECTED = metrics.REGISTRY.counter(
+    'scraper_outbound_rejected_total', 'Requisições recusadas na hora com o circuito aberto, por host')
+CIRCUIT_TRANSITIONS = metrics.REGISTRY.counter(
+    'scraper_circuit_transitions_total', 'Mudanças de estado do circuito por host (open, half_open, closed)')
+
+
+class LocalFailure(Exception):
+    """Falha do próprio servidor (ex: navegador local que não inicia), não do site.
+
+    Não é repetida e não conta para o circuito do host.
+    """
+
+
+class CircuitOpenError(Exception):
+    """O site falhou seguidamente e as requisições estão suspensas por um tempo"""
+
+    def __init__(self, host, retry_in):
+        super().__init__(f"Site {host} indisponível; nova tentativa em {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+def classify_error(error):
+    """Motivo para repetir a requisição: 'throttled' (429), 'server' (5xx),
+    'transient' (conexão, timeout, navegador) ou ``None`` (não repetir)"""
+    if isinstance(error, LocalFailure):
+        return None
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status == 429:
+        return 'throttled'
+    if status is not None:
+        return 'server' if status >= 500 else None
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return 'transient'
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return 'transient'
+    if WebDriverException is not None and isinstance(error, WebDriverException):
+        return 'transient'
+    return None
+
+
+def retry_after(error):
+    """Segundos pedidos pelo site no cabeçalho Retry-After, se houver"""
+    response = getattr(error, 'response', None)
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _HostState:
+    def __init__(self, burst):
+        self.tokens = float(burst)
+        self.updated = time.time()
+        self.slowdown = 1.0
+        self.blocked_until = 0.0
+        self.failures = 0
+        self.circuit = 'closed'
+        self.opened_at = 0.0
+        self.probing = False
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0, 'throttled': 0, 'rejected': 0}
+
+
+class HostRateLimiter:
+    """Governa as requisições ao site, por host.
+
+    - Concorrência limitada (``max_concurrency``) e balde de tokens com uma
+      requisição a cada ``min_interval`` segundos e rajadas de até ``burst``.
+    - Erros de conexão, timeouts, falhas do navegador, 429 e 5xx são
+      repetidos até ``max_retries`` vezes, com espera exponencial com jitter
+      (respeitando o Retry-After).
+    - 429 e 5xx multiplicam o intervalo do host por 2 (até ``max_slowdown``);
+      cada sucesso reduz a desaceleração aos poucos.
+    - Após ``failure_threshold`` falhas seguidas o circuito abre: durante
+      ``recovery_time`` segundos as chamadas falham na hora com
+      ``CircuitOpenError``; depois uma única requisição de teste decide se
+      ele fecha ou abre de novo.
+    """
+
+    def __init__(self, max_concurrency=3, min_interval=0.5, burst=1, max_retries=2, backoff_base=0.5,
+                 backoff_max=8.0, failure_threshold=5, recovery_time=30.0, max_slowdown=8.0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_interval = min_interval
+        self.burst = max(1, burst)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_time = recovery_time
+        self.max_slowdown = max(1.0, max_slowdown)
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        # Semáforos do asyncio por loop de eventos (um semáforo só vale no loop em que foi usado)
+        self._async_semaphores = weakref.WeakKeyDictionary()
+        self._hosts = {}
+
+    def _state(self, host):
+        # Chamado com o lock
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.burst)
+        return state
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_concurrency)
+            return self._semaphores[host]
+
+    # ------------------------------------------------------------------
+    # Balde de tokens
+    # ------------------------------------------------------------------
+    def _reserve(self, host):
+        """Consome um token do host; retorna quanto esperar por ele"""
+        with self._lock:
+            state = self._state(host)
+            now = time.time()
+            interval = self.min_interval * state.slowdown
+            wait = max(0.0, state.blocked_until - now)
+            if interval <= 0:
+                return wait
+            rate = 1.0 / interval
+            state.tokens = min(float(self.burst), state.tokens + (now - state.updated) * rate)
+            state.updated = now
+            # Token negativo = horário reservado no futuro para esta chamada
+            state.tokens -= 1
+            if state.tokens < 0:
+                wait = max(wait, -state.tokens / rate)
+            return wait
+
+    def _wait_turn(self, host):
+        delay = self._reserve(host)
+        if delay > 0:
+            time.sleep(delay)
+            metrics.record('rate_limit_wait', delay, host=host)
+
+    # ------------------------------------------------------------------
+    # Circuito
+    # ------------------------------------------------------------------
+    def _transition(self, host, state, circuit):
+        state.circuit = circuit
+        CIRCUIT_TRANSITIONS.inc(host=host, state=circuit)
+        if circuit == 'open':
+            logger.warning(f"🔌 Circuito de {host} aberto após {state.failures} falhas seguidas; "
+                           f"requisições suspensas por {self.recovery_time:.0f}s")
+        elif circuit == 'closed':
+            logger.info(f"🔌 Circuito de {host} fechado: site respondendo de novo")
+
+    def _admit(self, host):
+        """Levanta CircuitOpenError se o host estiver suspenso"""
+        with self._lock:
+            state = self._state(host)
+            state.stats['requests'] += 1
+            if state.circuit == 'closed':
+                return
+            retry_in = state.opened_at + self.recovery_time - time.time()
+            if state.circuit == 'open' and retry_in <= 0:
+                self._transition(host, state, 'half_open')
+            if state.circuit == 'half_open' and not state.probing:
+                # Só esta chamada testa o site; as demais continuam falhando na hora
+                state.probing = True
+                return
+            state.stats['rejected'] += 1
+        OUTBOUND_REJECTED.inc(host=host)
+        raise CircuitOpenError(host, max(retry_in, 0.0))
+
+    def _succeeded(self, host):
+        with self._lock:
+            state = self._state(host)
+            state.failures = 0
+            state.probing = False
+            state.slowdown = max(1.0, state.slowdown * 0.8)
+            if state.circuit != 'closed':
+                self._transition(host, state, 'closed')
+
+    def _failed(self, host, reason, error):
+        """Registra a falha; retorna a espera antes da próxima tentativa"""
+        with self._lock:
+            state = self._state(host)
+            if reason is None:
+                # Erro que não indica problema no site (ex: 404): só libera o teste do circuito
+                state.probing = False
+                return 0.0
+            state.failures += 1
+            state.stats['failures'] += 1
+            pause = retry_after(error) if reason in ('throttled', 'server') else None
+            if reason in ('throttled', 'server'):
+                state.slowdown = min(self.max_slowdown, state.slowdown * 2)
+                if reason == 'throttled':
+                    state.stats['throttled'] += 1
+                if pause:
+                    state.blocked_until = max(state.blocked_until, time.time() + pause)
+            if state.circuit == 'half_open' or (state.circuit == 'closed' and state.failures >= self.failure_threshold):
+                state.opened_at = time.time()
+                state.probing = False
+                self._transition(host, state, 'open')
+            return pause or 0.0
+
+    def _backoff(self, attempt, pause):
+        # Jitter completo: espera aleatória até base * 2^tentativa
+        return max(pause, random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+
+    def _should_retry(self, host, attempt, reason, error):
+        if reason is None or attempt >= self.max_retries:
+            return False
+        with self._lock:
+            state = self._state(host)
+            if state.circuit != 'closed':
+                return False
+            state.stats['retries'] += 1
+        OUTBOUND_RETRIES.inc(host=host, reason=reason)
+        logger.warning(f"🔁 {host}: {type(error).__name__} ({reason}), tentativa {attempt + 2} de {self.max_retries + 1}")
+        return True
+
+    # ------------------------------------------------------------------
+    # Chamadas
+    # ------------------------------------------------------------------
+    def call(self, url, func, *args, **kwargs):
+        host = urlparse(url).netloc
+        attempt = 0
+        while True:
+            self._admit(host)
+            with self._semaphore(host):
+                self._wait_turn(host)
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    reason = classify_error(e)
+                    pause = self._failed(host, reason, e)
+                    if not self._should_retry(host, attempt, reason, e):
+                        raise
+                else:
+                    self._succeeded(host)
+                    return result
+            delay = self._backoff(attempt, pause)
+            time.sleep(delay)
+            metrics.record('retry_backoff', delay, host=host)
+            attempt += 1
+
+    async def acall(self, url, func, *args, **kwargs):
+        """Versão asyncio de ``call`` para corrotinas.
+
+        A concorrência é contada à parte (semáforo do asyncio), mas o balde
+        de tokens, as desacelerações e o circuito são os mesmos das threads.
+        """
+        host = urlparse(url).netloc
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphores = self._async_semaphores.setdefault(loop, {})
+            if host not in semaphores:
+                semaphores[host] = asyncio.Semaphore(self.max_concurrency)
+            semaphore = semaphores[host]
+        attempt = 0
+        while True:
+            self._admit(host)
+            async with semaphore:
+                delay = self._reserve(host)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    metrics.record('rate_limit_wait', delay, host=host)
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    reason = classify_error(e)
+                    pause = self._failed(host, reason, e)
+                    if not self._should_retry(host, attempt, reason, e):
+                        raise
+                else:
+                    self._succeeded(host)
+                    return result
+            delay = self._backoff(attempt, pause)
+            await asyncio.sleep(delay)
+            metrics.record('retry_backoff', delay, host=host)
+            attempt += 1
+
+    def host_status(self):
+        """Estado de cada host: circuito, falhas seguidas, desaceleração e contadores"""
+        now = time.time()
+        with self._lock:
+            return {
+                host: dict(
+                    state.stats,
+                    circuit=state.circuit,
+                    consecutive_failures=state.failures,
+                    slowdown=round(state.slowdown, 3),
+                    interval=round(self.min_interval * state.slowdown, 3),
+                    retry_in=round(max(0.0, state.opened_at + self.recovery_time - now), 1)
+                    if state.circuit == 'open' else 0.0,
+                )
+                for host, state in self._hosts.items()
+            }
+
+    def stats(self):
+        """Totais de todos os hosts (para o /metrics)"""
+        hosts = self.host_status()
+        totals = {key: sum(host[key] for host in hosts.values())
+                  for key in ('requests', 'retries', 'failures', 'throttled', 'rejected')}
+        return dict(
+            totals,
+            hosts=len(hosts),
+            open_circuits=sum(1 for host in hosts.values() if host['circuit'] != 'closed'),
+            max_slowdown=max((host['slowdown'] for host in hosts.values()), default=1.0),
+        )
+
+
+# Governador compartilhado pelas chamadas que não recebem um (CLI, scripts,
+# scrape_search direto): todas contam no mesmo balde e no mesmo circuito
+_default_limiter = HostRateLimiter()
+
+
+def default_limiter():
+    return _default_limiter
+
+
+def set_default_limiter(limiter):
+    """Troca o governador compartilhado (o app instala o configurado pelas variáveis de ambiente)"""
+    global _default_limiter
+    _default_limiter = limiter
@@ -0,0 +1,212 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _url_key(url):
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+class DiskResponseCache:
+    """Cache em disco das respostas HTTP, endereçado pelo conteúdo.
+
+    O corpo de cada resposta é gravado (com gzip) em ``bodies/`` com o nome
+    igual ao SHA-256 do conteúdo, então páginas idênticas ocupam espaço uma
+    única vez; ``meta/`` guarda, por URL, o hash do corpo, o ETag e o
+    Last-Modified. Respostas com idade < ``ttl`` são servidas sem acessar a
+    rede; as mais antigas são revalidadas com If-None-Match/If-Modified-Since.
+    Quando o total passa de ``max_bytes``, as URLs menos usadas recentemente
+    são removidas junto com os corpos que ficarem sem referência.
+    """
+
+    def __init__(self, directory='http_cache', ttl=60, max_bytes=200 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._meta_dir = os.path.join(directory, 'meta')
+        self._body_dir = os.path.join(directory, 'bodies')
+        os.makedirs(self._meta_dir, exist_ok=True)
+        os.makedirs(self._body_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index = {}
+        self._body_sizes = {}
+        self._bytes = 0
+        self._stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'errors': 0}
+        self._load_index()
+
+    def _load_index(self):
+        for name in os.listdir(self._meta_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self._meta_dir, name), 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            self._index[name[:-len('.json')]] = meta
+        referenced = {meta['body'] for meta in self._index.values()}
+        for name in os.listdir(self._body_dir):
+            path = os.path.join(self._body_dir, name)
+            if name not in referenced:
+                # Corpo órfão (ou arquivo temporário de uma gravação interrompida)
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            self._body_sizes[name] = os.path.getsize(path)
+        self._bytes = sum(self._body_sizes.values())
+        if self._index:
+            logger.info(f"💽 Cache HTTP: {len(self._index)} respostas, {self._bytes / 1024 / 1024:.1f} MB em disco")
+
+    def _write_atomic(self, path, data):
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def lookup(self, url):
+        """Retorna ``(metadados, fresco)`` da URL ou ``(None, False)``"""
+        with self._lock:
+            meta = self._index.get(_url_key(url))
+            if meta is None or meta['body'] not in self._body_sizes:
+                return None, False
+            meta['accessed_at'] = time.time()
+            return dict(meta), time.time() - meta['stored_at'] < self.ttl
+
+    def conditional_headers(self, meta):
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def read_body(self, meta):
+        with open(os.path.join(self._body_dir, meta['body']), 'rb') as f:
+            return gzip.decompress(f.read()).decode(meta.get('encoding') or 'utf-8', errors='replace')
+
+    def record(self, outcome):
+        """Contabiliza hit, revalidated ou miss"""
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def revalidated(self, url):
+        """A resposta 304 confirma o corpo em cache: renovar a validade"""
+        key = _url_key(url)
+        with self._lock:
+            meta = self._index.get(key)
+            if meta is None:
+                return
+            meta['stored_at'] = time.time()
+            data = json.dumps(meta).encode('utf-8')
+        self._write_atomic(os.path.join(self._meta_dir, f'{key}.json'), data)
+
+    def store(self, url, text, encoding='utf-8', etag=None, last_modified=None):
+        raw = text.encode(encoding or 'utf-8', errors='replace')
+        body_hash = hashlib.sha256(raw).hexdigest()
+        key = _url_key(url)
+        try:
+            body_path = os.path.join(self._body_dir, body_hash)
+            with self._lock:
+                known = body_hash in self._body_sizes
+            if not known:
+                compressed = gzip.compress(raw, compresslevel=5)
+                if len(compressed) > self.max_bytes:
+                    return
+                self._write_atomic(body_path, compressed)
+            meta = {
+                'url': url,
+                'body': body_hash,
+                'encoding': encoding or 'utf-8',
+                'etag': etag,
+                'last_modified': last_modified,
+                'stored_at': time.time(),
+                'accessed_at': time.time(),
+            }
+            self._write_atomic(os.path.join(self._meta_dir, f'{key}.json'), json.dumps(meta).encode('utf-8'))
+        except OSError as e:
+            with self._lock:
+                self._stats['errors'] += 1
+            logger.warning(f"⚠️ Erro ao gravar no cache HTTP: {str(e)}")
+            return
+
+        with self._lock:
+            # Conferir de novo: outra gravação do mesmo corpo pode ter terminado
+            # antes desta, e o tamanho só pode ser contado uma vez
+            if body_hash not in self._body_sizes:
+                try:
+                    self._body_sizes[body_hash] = os.path.getsize(body_path)
+                    self._bytes += self._body_sizes[body_hash]
+                except OSError:
+                    # Corpo removido pelo LRU depois da primeira conferência
+                    self._stats['errors'] += 1
+            if body_hash in self._body_sizes:
+                old = self._index.get(key)
+                self._index[key] = meta
+                self._stats['stores'] += 1
+                removed = self._evict_locked()
+            else:
+                # Sem o corpo a URL não é indexada (e o metadado gravado é apagado)
+                old = self._index.pop(key, None)
+                removed = [os.path.join(self._meta_dir, f'{key}.json')]
+            # Conteúdo da URL mudou: apagar o corpo antigo se nenhuma outra URL o usa
+            if old is not None and old['body'] != body_hash and old['body'] in self._body_sizes \
+                    and not any(m['body'] == old['body'] for m in self._index.values()):
+                self._bytes -= self._body_sizes.pop(old['body'])
+                removed.append(os.path.join(self._body_dir, old['body']))
+        for path in removed:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict_locked(self):
+        """Remove as URLs menos usadas até caber em ``max_bytes``; retorna os arquivos a apagar"""
+        if self._bytes <= self.max_bytes:
+            return []
+        removed = []
+        referenced = {}
+        for meta in self._index.values():
+            referenced[meta['body']] = referenced.get(meta['body'], 0) + 1
+        for key, meta in sorted(self._index.items(), key=lambda item: item[1]['accessed_at']):
+            if self._bytes <= self.max_bytes:
+                break
+            del self._index[key]
+            removed.append(os.path.join(self._meta_dir, f'{key}.json'))
+            self._stats['evictions'] += 1
+            referenced[meta['body']] -= 1
+            if referenced[meta['body']] == 0 and meta['body'] in self._body_sizes:
+                self._bytes -= self._body_sizes.pop(meta['body'])
+                removed.append(os.path.join(self._body_dir, meta['body']))
+        return removed
+
+    def clear(self):
+        with self._lock:
+            paths = [os.path.join(self._meta_dir, f'{key}.json') for key in self._index]
+            paths += [os.path.join(self._body_dir, body) for body in self._body_sizes]
+            self._index.clear()
+            self._body_sizes.clear()
+            self._bytes = 0
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                entries=len(self._index),
+                bodies=len(self._body_sizes),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                ttl=self.ttl,
+            )
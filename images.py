@@ -0,0 +1,398 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from governor import HostRateLimiter
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Extensão dos originais servidos sem miniatura (Pillow ausente)
+_EXTENSIONS = {'image/webp': 'webp', 'image/jpeg': 'jpg', 'image/png': 'png', 'image/gif': 'gif', 'image/avif': 'avif'}
+_MIMETYPES = {ext: mimetype for mimetype, ext in _EXTENSIONS.items()}
+# Redirecionamentos seguidos por download (cada destino é validado de novo)
+MAX_REDIRECTS = 3
+
+
+def _url_key(url):
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def _file_hash(name):
+    # '<hash>_150.webp' ou '<hash>_orig.jpg'
+    return name.split('_', 1)[0]
+
+
+def host_allowed(url, hosts):
+    """URL http(s) de um dos ``hosts`` (um host iniciado por '.' vale para os subdomínios)"""
+    parsed = urlparse(url or '')
+    host = (parsed.hostname or '').lower()
+    if parsed.scheme not in ('http', 'https') or not host:
+        return False
+    return any(host == allowed or (allowed.startswith('.') and host.endswith(allowed)) for allowed in hosts)
+
+
+def make_thumbnails(data, sizes, quality=80, max_pixels=25_000_000):
+    """Miniaturas WebP de ``data`` que cabem em ``tamanho x tamanho`` (sem ampliar); retorna {tamanho: bytes}
+
+    Imagens com mais de ``max_pixels`` pixels são recusadas antes de serem
+    decodificadas (o cabeçalho já informa as dimensões).
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            width, height = source.size
+            if width * height > max_pixels:
+                raise ValueError(f'{width}x{height} pixels (máximo {max_pixels})')
+            # Em JPEG, decodifica direto numa escala menor
+            source.draft('RGB', (max(sizes), max(sizes)))
+            has_alpha = source.mode in ('RGBA', 'LA', 'PA') or 'transparency' in source.info
+            image = source.convert('RGBA' if has_alpha else 'RGB')
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ValueError(f'Imagem inválida: {str(e)}')
+    thumbnails = {}
+    for size in sorted(sizes, reverse=True):
+        # Cada tamanho parte do anterior, já reduzido
+        image.thumbnail((size, size), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, 'WEBP', quality=quality, method=4)
+        thumbnails[size] = output.getvalue()
+    return thumbnails
+
+
+class ImageProxy:
+    """Proxy das imagens dos produtos com miniaturas em cache no disco.
+
+    Cada imagem é baixada uma vez (buscas simultâneas da mesma URL
+    compartilham o download) e reduzida para os tamanhos de ``sizes`` em
+    WebP. Os arquivos são nomeados pelo SHA-256 da imagem original, então
+    URLs diferentes com a mesma imagem ocupam espaço uma vez só; ``urls/``
+    guarda, por URL, o hash da imagem. Quando o total passa de ``max_bytes``
+    as miniaturas menos usadas recentemente são apagadas, e com a última
+    miniatura de uma imagem vão também as entradas de ``urls/`` que apontam
+    para ela. Sem Pillow, a imagem original é guardada e servida no lugar das
+    miniaturas.
+
+    ``prefetch(urls)`` baixa as imagens em segundo plano (até ``workers`` ao
+    mesmo tempo); com mais de ``max_queue`` pendentes as novas são ignoradas.
+    Só imagens de ``allowed_hosts`` são buscadas (veja ``host_allowed``),
+    inclusive em cada redirecionamento; originais maiores que
+    ``max_source_bytes`` são recusados antes de chegarem ao Pillow.
+    """
+
+    def __init__(self, directory='image_cache', sizes=(150, 300), max_bytes=100 * 1024 * 1024, quality=80,
+                 allowed_hosts=(), max_source_bytes=5 * 1024 * 1024, timeout=10, workers=4, max_queue=500,
+                 rate_limiter=None, user_agent=None):
+        self.directory = directory
+        self.sizes = tuple(sorted(set(sizes)))
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self.allowed_hosts = tuple(host.lower() for host in allowed_hosts)
+        self.max_source_bytes = max_source_bytes
+        self.timeout = timeout
+        self.max_queue = max_queue
+        self.rate_limiter = rate_limiter or HostRateLimiter(max_concurrency=workers, min_interval=0)
+        self._thumb_dir = os.path.join(directory, 'thumbs')
+        self._url_dir = os.path.join(directory, 'urls')
+        os.makedirs(self._thumb_dir, exist_ok=True)
+        os.makedirs(self._url_dir, exist_ok=True)
+        self.session = requests.Session()
+        if user_agent:
+            self.session.headers['User-Agent'] = user_agent
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-prefetch')
+        self._lock = threading.Lock()
+        self._urls = {}
+        self._hash_urls = {}
+        self._hash_files = {}
+        self._files = OrderedDict()
+        self._bytes = 0
+        self._flights = {}
+        self._pending = 0
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'fetched': 0, 'prefetched': 0,
+                       'prefetch_dropped': 0, 'evictions': 0, 'errors': 0}
+        self._load_index()
+
+    def _load_index(self):
+        for name in os.listdir(self._url_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self._url_dir, name), 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            self._add_url_locked(name[:-len('.json')], meta)
+        files = []
+        for name in os.listdir(self._thumb_dir):
+            path = os.path.join(self._thumb_dir, name)
+            if name.endswith('.tmp'):
+                # Gravação interrompida
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            files.append((os.path.getmtime(path), name, os.path.getsize(path)))
+        for _, name, size in sorted(files):
+            self._add_file_locked(name, size)
+        # URLs cujas miniaturas já não existem (cache anterior à limpeza dos metadados)
+        orphans = [content_hash for content_hash in self._hash_urls if content_hash not in self._hash_files]
+        for content_hash in orphans:
+            self._remove_paths(self._drop_hash_locked(content_hash))
+        if self._files:
+            logger.info(f"🖼️ Cache de imagens: {len(self._urls)} URLs, {self._bytes / 1024 / 1024:.1f} MB em disco")
+
+    def allowed(self, url):
+        return host_allowed(url, self.allowed_hosts)
+
+    def _add_url_locked(self, key, meta):
+        old = self._urls.get(key)
+        if old is not None:
+            self._hash_urls.get(old['hash'], set()).discard(key)
+        self._urls[key] = meta
+        self._hash_urls.setdefault(meta['hash'], set()).add(key)
+
+    def _add_file_locked(self, name, size):
+        old = self._files.get(name)
+        if old is None:
+            content_hash = _file_hash(name)
+            self._hash_files[content_hash] = self._hash_files.get(content_hash, 0) + 1
+        else:
+            self._bytes -= old
+        self._files[name] = size
+        self._bytes += size
+
+    def _drop_hash_locked(self, content_hash):
+        """Esquece as URLs de uma imagem sem miniaturas; retorna os arquivos de ``urls/`` a apagar"""
+        keys = self._hash_urls.pop(content_hash, set())
+        for key in keys:
+            self._urls.pop(key, None)
+        return [os.path.join(self._url_dir, f'{key}.json') for key in keys]
+
+    def pick_size(self, width):
+        """Menor tamanho disponível que cobre ``width`` (ou o maior)"""
+        for size in self.sizes:
+            if size >= width:
+                return size
+        return self.sizes[-1]
+
+    def _file_name(self, meta, size):
+        if meta.get('original'):
+            return f"{meta['hash']}_orig.{meta['ext']}"
+        return f"{meta['hash']}_{size}.webp"
+
+    def _cached_locked(self, url, size):
+        meta = self._urls.get(_url_key(url))
+        if meta is None:
+            return None
+        name = self._file_name(meta, size)
+        if name not in self._files:
+            return None
+        self._files.move_to_end(name)
+        return name, meta
+
+    def get(self, url, width=150):
+        """Retorna ``(caminho, mimetype, etag)`` da miniatura, baixando a imagem se preciso.
+
+        Levanta ValueError para URLs não permitidas ou imagens inválidas e
+        as exceções do download (requests, CircuitOpenError) se ele falhar.
+        """
+        if not self.allowed(url):
+            raise ValueError('URL de imagem não permitida')
+        size = self.pick_size(width)
+        with self._lock:
+            cached = self._cached_locked(url, size)
+            if cached is not None:
+                self._stats['hits'] += 1
+        if cached is None:
+            self._fetch(url, prefetch=False)
+            with self._lock:
+                cached = self._cached_locked(url, size)
+            if cached is None:
+                # Removida pela rotação logo após o download (cache pequeno demais)
+                raise ValueError('Imagem grande demais para o cache')
+        name, meta = cached
+        mimetype = _MIMETYPES.get(meta['ext'], 'application/octet-stream') if meta.get('original') else 'image/webp'
+        return os.path.abspath(os.path.join(self._thumb_dir, name)), mimetype, name.rsplit('.', 1)[0]
+
+    def _fetch(self, url, prefetch):
+        """Baixa a imagem e grava as miniaturas; chamadas simultâneas da mesma URL esperam a primeira"""
+        with self._lock:
+            flight = self._flights.get(url)
+            leader = flight is None
+            if leader:
+                flight = self._flights[url] = {'done': threading.Event(), 'error': None}
+                self._stats['prefetched' if prefetch else 'misses'] += 1
+            elif not prefetch:
+                self._stats['coalesced'] += 1
+        if not leader:
+            flight['done'].wait()
+            if flight['error'] is not None and not prefetch:
+                raise flight['error']
+            return
+        try:
+            data, mimetype = self.rate_limiter.call(url, self._download, url)
+            self._store(url, data, mimetype)
+        except Exception as e:
+            flight['error'] = e
+            with self._lock:
+                self._stats['errors'] += 1
+            logger.warning(f"⚠️ Erro ao buscar imagem {url}: {str(e)}")
+            if not prefetch:
+                raise
+        finally:
+            with self._lock:
+                self._flights.pop(url, None)
+            flight['done'].set()
+
+    def _download(self, url):
+        with metrics.span('image_fetch'):
+            for _ in range(MAX_REDIRECTS + 1):
+                # Redirecionamentos seguidos à mão: o destino também precisa ser de um host permitido
+                with self.session.get(url, timeout=self.timeout, stream=True, allow_redirects=False) as response:
+                    if response.is_redirect:
+                        url = urljoin(url, response.headers['Location'])
+                        if not self.allowed(url):
+                            raise ValueError('Redirecionamento para URL de imagem não permitida')
+                        continue
+                    response.raise_for_status()
+                    length = response.headers.get('Content-Length', '')
+                    if length.isdigit() and int(length) > self.max_source_bytes:
+                        raise ValueError(f'Imagem maior que {self.max_source_bytes} bytes')
+                    chunks, total = [], 0
+                    for chunk in response.iter_content(64 * 1024):
+                        total += len(chunk)
+                        if total > self.max_source_bytes:
+                            raise ValueError(f'Imagem maior que {self.max_source_bytes} bytes')
+                        chunks.append(chunk)
+                    mimetype = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                    return b''.join(chunks), mimetype
+        raise ValueError(f'Mais de {MAX_REDIRECTS} redirecionamentos')
+
+    def _store(self, url, data, mimetype):
+        content_hash = hashlib.sha256(data).hexdigest()
+        if Image is not None:
+            meta = {'url': url, 'hash': content_hash}
+        else:
+            if mimetype not in _EXTENSIONS:
+                raise ValueError(f'Tipo de imagem não suportado: {mimetype or "desconhecido"}')
+            meta = {'url': url, 'hash': content_hash, 'original': True, 'ext': _EXTENSIONS[mimetype]}
+
+        with self._lock:
+            missing = [size for size in self.sizes if self._file_name(meta, size) not in self._files]
+        files = {}
+        if missing:
+            # Mesma imagem já guardada por outra URL: nada a gerar
+            with metrics.span('thumbnail'):
+                if meta.get('original'):
+                    files[self._file_name(meta, None)] = data
+                else:
+                    files = {self._file_name(meta, size): thumb
+                             for size, thumb in make_thumbnails(data, missing, self.quality).items()}
+        for name, content in files.items():
+            self._write_atomic(os.path.join(self._thumb_dir, name), content)
+        self._write_atomic(os.path.join(self._url_dir, f'{_url_key(url)}.json'), json.dumps(meta).encode('utf-8'))
+
+        with self._lock:
+            for name, content in files.items():
+                self._add_file_locked(name, len(content))
+            self._add_url_locked(_url_key(url), meta)
+            self._stats['fetched'] += 1
+            removed = self._evict_locked()
+        self._remove_paths(removed)
+        logger.info(f"🖼️ Imagem {url} em cache ({len(data) / 1024:.0f} KB originais, "
+                    f"{sum(len(c) for c in files.values()) / 1024:.0f} KB em miniaturas)")
+
+    def _write_atomic(self, path, data):
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _evict_locked(self):
+        """Apaga as miniaturas menos usadas (e as URLs das imagens que ficam sem nenhuma); retorna os caminhos"""
+        removed = []
+        while self._bytes > self.max_bytes and self._files:
+            name, size = self._files.popitem(last=False)
+            self._bytes -= size
+            self._stats['evictions'] += 1
+            removed.append(os.path.join(self._thumb_dir, name))
+            content_hash = _file_hash(name)
+            self._hash_files[content_hash] -= 1
+            if not self._hash_files[content_hash]:
+                del self._hash_files[content_hash]
+                removed += self._drop_hash_locked(content_hash)
+        return removed
+
+    @staticmethod
+    def _remove_paths(paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def prefetch(self, urls):
+        """Agenda o download das imagens ainda fora do cache; retorna quantas foram agendadas"""
+        scheduled = 0
+        for url in dict.fromkeys(urls):
+            if not self.allowed(url):
+                continue
+            with self._lock:
+                if url in self._flights or self._cached_locked(url, self.sizes[0]) is not None:
+                    continue
+                if self._pending >= self.max_queue:
+                    self._stats['prefetch_dropped'] += 1
+                    continue
+                self._pending += 1
+            self._executor.submit(self._run_prefetch, url)
+            scheduled += 1
+        if scheduled:
+            logger.info(f"🖼️ {scheduled} imagens agendadas para o cache")
+        return scheduled
+
+    def _run_prefetch(self, url):
+        try:
+            self._fetch(url, prefetch=True)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def clear(self):
+        with self._lock:
+            paths = [os.path.join(self._thumb_dir, name) for name in self._files]
+            paths += [os.path.join(self._url_dir, f'{key}.json') for key in self._urls]
+            self._files.clear()
+            self._urls.clear()
+            self._hash_urls.clear()
+            self._hash_files.clear()
+            self._bytes = 0
+        self._remove_paths(paths)
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                urls=len(self._urls),
+                files=len(self._files),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                pending=self._pending,
+                thumbnails=Image is not None,
+            )
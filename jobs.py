@@ -0,0 +1,201 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """A fila de jobs atingiu o limite de profundidade"""
+
+
+class JobCancelled(Exception):
+    """O job foi cancelado durante a execução"""
+
+
+class Job:
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    FINISHED = (DONE, FAILED, CANCELLED)
+
+    def __init__(self, func, params):
+        self.id = uuid.uuid4().hex
+        self.func = func
+        self.params = params
+        self.status = Job.QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.error_type = None
+        self.partial = []
+        self.progress = {}
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def add_partial(self, items, **progress):
+        """Registra resultados parciais e o progresso (chamado pelo worker).
+
+        Nunca levanta exceção: pode ser chamado de dentro de um cálculo
+        compartilhado no cache, e o cancelamento de um job não pode
+        interromper os demais que esperam o mesmo resultado. Quem executa o
+        job verifica o cancelamento com ``raise_if_cancelled()``.
+        """
+        with self._lock:
+            if self.status != Job.RUNNING or self.cancel_event.is_set():
+                # Job já finalizado (ex: atualização do cache em segundo plano) ou cancelado
+                return
+            self.partial.extend(items)
+            self.progress.update(progress)
+
+    def raise_if_cancelled(self):
+        """Levanta ``JobCancelled`` se o cancelamento do job foi pedido"""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def _finish(self, status, result=None, error=None):
+        with self._lock:
+            self.status = status
+            self.result = result
+            if error is not None:
+                self.error = str(error)
+                self.error_type = type(error).__name__
+            self.finished_at = time.time()
+        self._done.set()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'status': self.status,
+                'params': self.params,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'progress': dict(self.progress),
+                'partial': list(self.partial),
+                'result': self.result,
+                'error': self.error,
+                'error_type': self.error_type,
+            }
+
+
+class JobManager:
+    """Executa jobs em um pool limitado de threads com fila de tamanho máximo.
+
+    ``submit()`` levanta ``JobQueueFull`` quando a fila está cheia
+    (backpressure). Jobs finalizados ficam disponíveis por ``retention``
+    segundos e depois são removidos.
+    """
+
+    def __init__(self, workers=2, max_queue=20, retention=3600):
+        self.workers = max(1, workers)
+        self.retention = retention
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._running = 0
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'job-worker-{i + 1}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"👷 {self.workers} worker(s) de jobs iniciados")
+
+    def submit(self, func, params):
+        """Enfileira ``func(job)``; retorna o Job criado"""
+        self._purge_expired()
+        job = Job(func, params)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            raise JobQueueFull(f"Fila de jobs cheia ({self._queue.maxsize} aguardando)")
+        logger.info(f"📥 Job {job.id} enfileirado")
+        return job
+
+    def get(self, job_id):
+        self._purge_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_event.set()
+        with job._lock:
+            if job.status == Job.QUEUED:
+                # Ainda na fila: o worker vai ignorá-lo ao retirá-lo
+                job.status = Job.CANCELLED
+                job.finished_at = time.time()
+                job._done.set()
+        logger.info(f"🛑 Cancelamento solicitado para o job {job.id}")
+        return job
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                with job._lock:
+                    if job.status in Job.FINISHED:
+                        continue
+                    job.status = Job.RUNNING
+                    job.started_at = time.time()
+                with self._lock:
+                    self._running += 1
+                try:
+                    result = job.func(job)
+                    job.raise_if_cancelled()
+                    job._finish(Job.DONE, result=result)
+                    logger.info(f"✅ Job {job.id} concluído")
+                except JobCancelled:
+                    job._finish(Job.CANCELLED)
+                    logger.info(f"🛑 Job {job.id} cancelado")
+                except Exception as e:
+                    job._finish(Job.FAILED, error=e)
+                    logger.error(f"❌ Job {job.id} falhou: {str(e)}")
+                finally:
+                    with self._lock:
+                        self._running -= 1
+            finally:
+                self._queue.task_done()
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if expired:
+            logger.debug(f"🗑️ {len(expired)} job(s) expirados removidos")
+
+    def stats(self):
+        with self._lock:
+            by_status = {}
+            for job in self._jobs.values():
+                by_status[job.status] = by_status.get(job.status, 0) + 1
+            return {
+                'workers': self.workers,
+                'running': self._running,
+                'queued': self._queue.qsize(),
+                'max_queue': self._queue.maxsize,
+                'retention': self.retention,
+                'jobs': by_status,
+            }
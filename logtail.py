@@ -0,0 +1,138 @@
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+# Limite de bytes lidos por chamada quando os filtros descartam quase tudo
+MAX_SCAN_BYTES = 8 * 1024 * 1024
+
+LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+
+def _line_level(line):
+    # Formato do log: "%(asctime)s - %(levelname)s - %(message)s"
+    for level in LEVELS:
+        if f' - {level} - ' in line:
+            return level
+    return None
+
+
+def make_filter(level=None, keyword=None):
+    """Retorna uma função que diz se a linha passa no nível mínimo e na palavra-chave"""
+    if level is not None and level.upper() not in LEVELS:
+        raise ValueError(f"Nível inválido: {level}. Use um de {', '.join(LEVELS)}")
+    min_index = LEVELS.index(level.upper()) if level else 0
+    keyword = keyword.lower() if keyword else None
+
+    def accept(line):
+        if min_index:
+            line_level = _line_level(line)
+            # Linhas de continuação (ex: traceback) não têm nível e ficam de fora
+            if line_level is None or LEVELS.index(line_level) < min_index:
+                return False
+        if keyword and keyword not in line.lower():
+            return False
+        return True
+    return accept
+
+
+def _iter_lines_backward(f, end, chunk_size):
+    """Gera ``(offset, linha)`` do fim para o começo, lendo blocos a partir de ``end``"""
+    position = end
+    pending = b''
+    while position > 0:
+        read_size = min(chunk_size, position)
+        position -= read_size
+        f.seek(position)
+        data = f.read(read_size) + pending
+        parts = data.split(b'\n')
+        # A primeira parte pode ser o fim de uma linha que começa no bloco anterior
+        pending = parts[0]
+        line_end = position + len(data)
+        for part in reversed(parts[1:]):
+            start = line_end - len(part)
+            if part:
+                yield start, part
+            line_end = start - 1
+    if pending:
+        yield 0, pending
+
+
+def _decode(line):
+    return line.decode('utf-8', errors='replace') + '\n'
+
+
+def read_tail(path, limit=100, before=None, level=None, keyword=None,
+              chunk_size=CHUNK_SIZE, max_scan_bytes=MAX_SCAN_BYTES):
+    """Lê as últimas ``limit`` linhas que passam nos filtros sem carregar o arquivo todo.
+
+    ``before`` é o cursor devolvido por uma chamada anterior (offset em
+    bytes) e pagina para linhas mais antigas. Retorna as linhas em ordem
+    cronológica, o ``cursor`` para a próxima página, ``has_more`` e
+    ``next``, o offset do fim do arquivo para usar com ``read_since``.
+    """
+    accept = make_filter(level, keyword)
+    if not os.path.exists(path):
+        return {'lines': [], 'cursor': 0, 'has_more': False, 'next': 0, 'file_size': 0}
+
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        end = size if before is None else max(0, min(int(before), size))
+        # Só linhas completas: uma linha sendo escrita agora fica para o follow
+        if before is None and end:
+            f.seek(end - 1)
+            if f.read(1) != b'\n':
+                f.seek(max(0, end - chunk_size))
+                block = f.read(end - max(0, end - chunk_size))
+                last_newline = block.rfind(b'\n')
+                end = end - len(block) + last_newline + 1 if last_newline != -1 else end
+        next_offset = end if before is None else size
+
+        lines = []
+        cursor = end
+        for offset, raw in _iter_lines_backward(f, end, chunk_size):
+            cursor = offset
+            line = _decode(raw)
+            if accept(line):
+                lines.append(line)
+                if len(lines) >= limit:
+                    break
+            if end - offset > max_scan_bytes:
+                break
+
+    lines.reverse()
+    return {'lines': lines, 'cursor': cursor, 'has_more': cursor > 0, 'next': next_offset, 'file_size': size}
+
+
+def read_since(path, offset, limit=500, level=None, keyword=None, max_bytes=MAX_SCAN_BYTES):
+    """Lê as linhas completas escritas depois de ``offset`` (modo follow).
+
+    Se o arquivo ficou menor que ``offset`` (rotação ou limpeza), a leitura
+    recomeça do início e ``reset`` vem como True.
+    """
+    accept = make_filter(level, keyword)
+    if not os.path.exists(path):
+        return {'lines': [], 'next': 0, 'reset': offset > 0, 'file_size': 0}
+
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        offset = int(offset)
+        reset = offset > size
+        if reset:
+            offset = 0
+        f.seek(offset)
+        data = f.read(min(size - offset, max_bytes))
+
+    lines = []
+    position = offset
+    for raw in data.split(b'\n')[:-1]:
+        # A última parte (sem \n) é uma linha incompleta e fica para a próxima chamada
+        position += len(raw) + 1
+        if raw:
+            line = _decode(raw)
+            if accept(line):
+                lines.append(line)
+                if len(lines) >= limit:
+                    break
+    return {'lines': lines, 'next': position, 'reset': reset, 'file_size': size}
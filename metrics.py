@@ -0,0 +1,180 @@
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ''
+    pairs = []
+    for k, v in items:
+        v = str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{k}="{v}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series['counts']):
+                    lines.append(f'{self.name}_bucket{_format_labels(key, [("le", bound)])} {count}')
+                lines.append(f'{self.name}_bucket{_format_labels(key, [("le", "+Inf")])} {series["count"]}')
+                lines.append(f'{self.name}_sum{_format_labels(key)} {series["sum"]:.6f}')
+                lines.append(f'{self.name}_count{_format_labels(key)} {series["count"]}')
+        return lines
+
+
+class MetricsRegistry:
+    """Registro de métricas exportadas no formato texto do Prometheus"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text):
+        metric = Counter(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_gauges(self, prefix, help_text, func):
+        """Registra uma função que retorna {nome: valor} lida a cada exportação"""
+        self._collectors.append((prefix, help_text, func))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, help_text, func in self._collectors:
+            try:
+                values = func()
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao coletar métricas de {prefix}: {str(e)}")
+                continue
+            for name, value in sorted(values.items()):
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                metric_name = f'{prefix}_{name}'
+                lines.append(f'# HELP {metric_name} {help_text}')
+                lines.append(f'# TYPE {metric_name} gauge')
+                lines.append(f'{metric_name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+PHASE_SECONDS = REGISTRY.histogram('scraper_phase_seconds', 'Duração de cada fase do scraping em segundos')
+PRODUCTS_EXTRACTED = REGISTRY.counter('scraper_products_extracted_total', 'Produtos extraídos com sucesso')
+EXTRACTION_ERRORS = REGISTRY.counter('scraper_extraction_errors_total', 'Erros ao extrair produtos, por tipo de exceção')
+ENGINE_USAGE = REGISTRY.counter('scraper_engine_usage_total', 'Buscas resolvidas por engine (http, selenium, fallback)')
+DRIVER_LAUNCHES = REGISTRY.counter('scraper_driver_launch_attempts_total', 'Tentativas de iniciar o Chrome por estratégia e resultado')
+REQUESTS = REGISTRY.counter('scraper_http_requests_total', 'Requisições HTTP por endpoint e status')
+
+
+class Timings:
+    """Tempos por fase de uma única requisição"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spans = []
+
+    def add(self, phase, seconds, labels):
+        with self._lock:
+            self.spans.append((phase, seconds, labels))
+
+    def summary(self):
+        """Soma dos tempos por fase, em segundos"""
+        totals = {}
+        with self._lock:
+            for phase, seconds, _ in self.spans:
+                totals[phase] = totals.get(phase, 0.0) + seconds
+        return {phase: round(seconds, 4) for phase, seconds in totals.items()}
+
+
+_current_timings = contextvars.ContextVar('scraper_timings', default=None)
+
+
+@contextmanager
+def collect(timings=None):
+    """Coleta os spans executados dentro do bloco (inclusive em threads que copiem o contexto)"""
+    timings = timings or Timings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+def record(phase, seconds, **labels):
+    PHASE_SECONDS.observe(seconds, phase=phase, **labels)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(phase, seconds, labels)
+
+
+@contextmanager
+def span(phase, **labels):
+    """Mede a duração de uma fase e registra no histograma e na requisição atual"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - started, **labels)
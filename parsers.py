@@ -0,0 +1,207 @@
+import logging
+import os
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:
+    etree = None
+    lxml_html = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_BASE_URL = 'https://media-production-bucket.us-southeast-1.linodeobjects.com'
+
+# Expressões regulares compiladas uma única vez
+USD_PRICE_RE = re.compile(r'US\$\s*([\d\.,]+)')
+BRL_PRICE_RE = re.compile(r'R\$\s*([\d\.,]+)')
+DIGITS_RE = re.compile(r'\d+')
+
+PRODUCT_CARD_CLASS = 'promocao-produtos-item'
+
+
+def clean_price(price_str):
+    if not price_str: return 'N/A'
+    # Remove thousand separators ("." or ",") and replace decimal comma (",") with dot (".")
+    # Handles cases like '1.165,00' -> '1165.00' and '97,00' -> '97.00'
+    # First, remove all dots (thousand separator in some locales)
+    cleaned_price = price_str.replace('.', '')
+    # Then, replace comma with dot (decimal separator in some locales)
+    cleaned_price = cleaned_price.replace(',', '.')
+
+    # Check if the cleaned price matches a pattern like '12345' (integer without decimal)
+    # If so, and it's a dollar price, assume it should have two decimal places
+    # This is a heuristic based on the observation that some dollar prices are missing decimal
+    if DIGITS_RE.fullmatch(cleaned_price) and len(cleaned_price) > 2: # e.g., '9700' should be '97.00'
+        cleaned_price = cleaned_price[:-2] + '.' + cleaned_price[-2:]
+
+    # Ensure it's a valid number format
+    try:
+        return str(float(cleaned_price))
+    except ValueError:
+        return 'N/A'
+
+
+def build_product(name, href, usd_text, brl_text, image_url, base_url):
+    """Monta o dicionário do produto a partir dos textos crus de um card.
+
+    Compartilhado pelos backends para garantir saídas idênticas.
+    """
+    link = href if href is not None else 'N/A'
+    if link and not link.startswith('http'):
+        link = base_url + link
+
+    price_usd = 'N/A'
+    if usd_text is not None:
+        match_usd = USD_PRICE_RE.search(usd_text)
+        if match_usd:
+            price_usd = clean_price(match_usd.group(1))
+
+    price_brl = 'N/A'
+    if brl_text is not None:
+        match_brl = BRL_PRICE_RE.search(brl_text)
+        if match_brl:
+            price_brl = clean_price(match_brl.group(1))
+
+    if image_url is None:
+        image_url = 'N/A'
+    else:
+        # Corrigir URLs relativas ou incompletas
+        if image_url and not image_url.startswith('http') and not image_url.startswith('//'):
+            image_url = IMAGE_BASE_URL + image_url
+        elif image_url.startswith('//'):
+            image_url = 'https:' + image_url
+
+        # Se a URL da imagem ainda for 'N/A' ou vazia, garantir que não seja concatenada com o base_url
+        if not image_url or 'N/A' in image_url:
+            image_url = 'N/A'
+
+    return {
+        'Nome': name,
+        'Preço (US$)': price_usd,
+        'Preço (R$)': price_brl,
+        'Link': link,
+        'Imagem': image_url
+    }
+
+
+def _has_card_class(value):
+    # Durante o parse o atributo class pode chegar como string crua ("a b") ou lista
+    if not value:
+        return False
+    tokens = value.split() if isinstance(value, str) else value
+    return PRODUCT_CARD_CLASS in tokens
+
+
+class SoupParser:
+    """Backend BeautifulSoup (fallback), opcionalmente parseando só os cards"""
+
+    name = 'beautifulsoup'
+
+    def __init__(self, features='html.parser', use_strainer=True):
+        self.features = features
+        self.use_strainer = use_strainer
+
+    def find_cards(self, html):
+        strainer = SoupStrainer('div', class_=_has_card_class) if self.use_strainer else None
+        try:
+            soup = BeautifulSoup(html, self.features, parse_only=strainer)
+        except Exception as e:
+            if self.features == 'html.parser':
+                raise
+            logger.warning(f"⚠️ Erro ao parsear com {self.features} ({str(e)}), usando html.parser")
+            soup = BeautifulSoup(html, 'html.parser', parse_only=strainer)
+        return soup.find_all('div', class_=PRODUCT_CARD_CLASS)
+
+    def extract(self, item, base_url):
+        # Nome e link vêm do mesmo <a>, buscado uma única vez
+        name_tag = item.find('div', class_='promocao-item-nome')
+        anchor = name_tag.a if name_tag else None
+        name = anchor.text.strip() if anchor else 'N/A'
+        href = anchor['href'] if anchor and 'href' in anchor.attrs else None
+
+        price_usd_element = item.select_one('.price-model span') or item.select_one('.promocao-item-preco-oferta strong')
+        usd_text = price_usd_element.get_text(strip=True) if price_usd_element else None
+
+        price_brl_element = item.select_one('.promocao-item-preco-text')
+        brl_text = price_brl_element.get_text(strip=True) if price_brl_element else None
+
+        image_url = None
+        img_tag = item.select_one('.promocao-item-img img')
+        if img_tag:
+            image_url = img_tag.get('data-src', img_tag.get('src', 'N/A'))
+
+        return build_product(name, href, usd_text, brl_text, image_url, base_url)
+
+
+def _class_xpath(class_name, prefix='.//*'):
+    return f"{prefix}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]"
+
+
+if etree is not None:
+    # Seletores XPath pré-compilados (equivalentes aos seletores CSS do BeautifulSoup)
+    _CARDS_XPATH = etree.XPath(_class_xpath(PRODUCT_CARD_CLASS, '//div'))
+    _NAME_ANCHOR_XPATH = etree.XPath(_class_xpath('promocao-item-nome', './/div') + '//a')
+    _USD_XPATH = etree.XPath(_class_xpath('price-model') + '//span')
+    _USD_OFFER_XPATH = etree.XPath(_class_xpath('promocao-item-preco-oferta') + '//strong')
+    _BRL_XPATH = etree.XPath(_class_xpath('promocao-item-preco-text'))
+    _IMG_XPATH = etree.XPath(_class_xpath('promocao-item-img') + '//img')
+    _TEXT_XPATH = etree.XPath('.//text()')
+
+
+class LxmlParser:
+    """Backend lxml: parser em C e seletores XPath pré-compilados"""
+
+    name = 'lxml'
+
+    def find_cards(self, html):
+        if isinstance(html, str):
+            # lxml não aceita str com declaração de encoding
+            html = html.encode('utf-8')
+        parser = lxml_html.HTMLParser(encoding='utf-8')
+        document = lxml_html.document_fromstring(html, parser=parser)
+        return _CARDS_XPATH(document)
+
+    @staticmethod
+    def _text(element, strip=False):
+        parts = _TEXT_XPATH(element)
+        if strip:
+            # Mesmo comportamento de get_text(strip=True) do BeautifulSoup
+            return ''.join(part.strip() for part in parts if part.strip())
+        return ''.join(parts)
+
+    def extract(self, item, base_url):
+        anchors = _NAME_ANCHOR_XPATH(item)
+        anchor = anchors[0] if anchors else None
+        name = self._text(anchor).strip() if anchor is not None else 'N/A'
+        href = anchor.get('href') if anchor is not None else None
+
+        usd_elements = _USD_XPATH(item) or _USD_OFFER_XPATH(item)
+        usd_text = self._text(usd_elements[0], strip=True) if usd_elements else None
+
+        brl_elements = _BRL_XPATH(item)
+        brl_text = self._text(brl_elements[0], strip=True) if brl_elements else None
+
+        image_url = None
+        images = _IMG_XPATH(item)
+        if images:
+            img = images[0]
+            image_url = img.get('data-src', img.get('src', 'N/A'))
+
+        return build_product(name, href, usd_text, brl_text, image_url, base_url)
+
+
+def get_parser(backend=None):
+    """Retorna o backend de parsing: 'lxml' quando instalado, senão BeautifulSoup.
+
+    O backend pode ser forçado pela variável de ambiente PARSER_BACKEND
+    ('auto', 'lxml' ou 'beautifulsoup').
+    """
+    backend = backend or os.environ.get('PARSER_BACKEND', 'auto')
+    if backend in ('auto', 'lxml') and etree is not None:
+        return LxmlParser()
+    if backend == 'lxml':
+        logger.warning("⚠️ lxml não instalado, usando BeautifulSoup")
+    return SoupParser()
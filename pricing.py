@@ -0,0 +1,28 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def price_product(product, shipping_cost, index=0):
+    """Retorna uma cópia do produto com o 'Preço Final (R$)' calculado (preço BRL + frete)"""
+    product = dict(product)
+    try:
+        # Extrair preço BRL e calcular preço de venda final em reais
+        brl_price_str = product.get('Preço (R$)', '0')
+        if brl_price_str != 'N/A':
+            brl_price = float(brl_price_str)
+            final_price_brl = brl_price + shipping_cost
+            product['Preço Final (R$)'] = f"{final_price_brl:.2f}"
+            logger.debug(f"Produto {index+1}: R$ {brl_price:.2f} + R$ {shipping_cost:.2f} = R$ {final_price_brl:.2f}")
+        else:
+            product['Preço Final (R$)'] = 'N/A'
+            logger.debug(f"Produto {index+1}: Preço N/A")
+    except (ValueError, TypeError) as e:
+        product['Preço Final (R$)'] = 'N/A'
+        logger.warning(f"⚠️ Erro ao calcular preço do produto {index+1}: {str(e)}")
+    return product
+
+
+def apply_shipping(products, shipping_cost):
+    """Retorna cópias dos produtos com o 'Preço Final (R$)' calculado"""
+    return [price_product(product, shipping_cost, i) for i, product in enumerate(products)]
@@ -0,0 +1,326 @@
+import csv
+import io
+import json
+import logging
+import math
+import tempfile
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+logger = logging.getLogger(__name__)
+
+NAN = float('nan')
+PRICE_COLUMNS = ['Preço (US$)', 'Preço (R$)', 'Preço Final (R$)']
+CHUNK_ROWS = 500
+# Linhas por lote no Arrow e por row group no Parquet
+ARROW_BATCH_ROWS = 10000
+FILE_CHUNK_BYTES = 64 * 1024
+
+
+def _to_float(value):
+    """Preço do produto ('9562.6', 'N/A', None ou número) como float; NaN quando ausente"""
+    if value is None or value == 'N/A':
+        return NAN
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+def _format_price(value):
+    # Mesmo formato de clean_price ('9562.6')
+    return 'N/A' if math.isnan(value) else str(value)
+
+
+def _format_final(value):
+    # Mesmo formato de price_product ('9612.60')
+    return 'N/A' if math.isnan(value) else f'{value:.2f}'
+
+
+def _price_column(values):
+    """Coluna de preços como ndarray float64 sobre o mesmo buffer (sem numpy, o próprio ``array('d')``)"""
+    if np is None or isinstance(values, np.ndarray):
+        return values
+    return np.frombuffer(values, dtype=np.float64) if len(values) else np.empty(0, dtype=np.float64)
+
+
+def _cell(value):
+    # Colunas extras com listas (ex: 'Termos' do lote) viram texto nas planilhas
+    return '; '.join(value) if isinstance(value, list) else value
+
+
+class ProductTable:
+    """Produtos de uma busca em colunas.
+
+    Textos (nome, link, imagem) ficam uma vez em listas e os preços em
+    arrays float64 (NaN quando o site não informa): ``ndarray`` do numpy
+    sobre o buffer do ``array('d')`` quando ele está instalado, então o
+    'Preço Final (R$)' e as conversões de moeda são operações vetorizadas
+    na coluna inteira (sem numpy, um laço sobre o ``array('d')``). As
+    exportações geram o arquivo em partes: CSV, JSON e NDJSON linha a linha,
+    Parquet/Arrow em lotes de uma tabela do pyarrow que usa os buffers das
+    colunas de preço sem cópia, e XLSX com openpyxl (num arquivo temporário,
+    porque o formato é um zip).
+    """
+
+    TEXT_COLUMNS = ('Nome', 'Link', 'Imagem')
+
+    def __init__(self, names, links, images, usd, brl, extra=None):
+        self.names = names
+        self.links = links
+        self.images = images
+        self.usd = _price_column(usd)
+        self.brl = _price_column(brl)
+        self.extra = extra or {}
+
+    @classmethod
+    def from_products(cls, products, extra_columns=()):
+        names, links, images, extra = [], [], [], {column: [] for column in extra_columns}
+        usd, brl = array('d'), array('d')
+        for product in products:
+            names.append(product.get('Nome', 'N/A'))
+            links.append(product.get('Link', 'N/A'))
+            images.append(product.get('Imagem', 'N/A'))
+            usd.append(_to_float(product.get('Preço (US$)')))
+            brl.append(_to_float(product.get('Preço (R$)')))
+            for column, values in extra.items():
+                values.append(product.get(column))
+        return cls(names, links, images, usd, brl, extra)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def columns(self):
+        return ['Nome', *PRICE_COLUMNS, *self.extra, 'Link', 'Imagem']
+
+    @staticmethod
+    def _scale(values, factor):
+        if np is not None:
+            return values * factor
+        return array('d', [value * factor for value in values])
+
+    def final_prices(self, shipping_cost):
+        """'Preço Final (R$)' de todos os produtos (NaN continua NaN)"""
+        if np is not None:
+            return self.brl + shipping_cost
+        return array('d', [price + shipping_cost for price in self.brl])
+
+    def usd_in_brl(self, rate):
+        """'Preço (US$)' convertido em reais pela cotação ``rate`` (R$ por US$)"""
+        return self._scale(self.usd, rate)
+
+    def brl_in_usd(self, rate):
+        """'Preço (R$)' convertido em dólares pela cotação ``rate`` (R$ por US$)"""
+        if rate <= 0:
+            raise ValueError('A cotação deve ser maior que zero')
+        return self._scale(self.brl, 1.0 / rate)
+
+    def implied_rates(self):
+        """Cotação usada pela loja em cada oferta (R$ / US$); NaN se faltar um dos preços"""
+        if np is not None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rates = self.brl / self.usd
+            rates[~np.isfinite(rates)] = NAN
+            return rates
+        return array('d', [brl / usd if usd else NAN for usd, brl in zip(self.usd, self.brl)])
+
+    def iter_rows(self, shipping_cost):
+        """Linhas no formato dos produtos da API (preços como texto)"""
+        # tolist() devolve floats do Python, formatados como no clean_price
+        usd, brl, final = self.usd.tolist(), self.brl.tolist(), self.final_prices(shipping_cost).tolist()
+        extra = list(self.extra.items())
+        for i in range(len(self)):
+            row = {
+                'Nome': self.names[i],
+                'Preço (US$)': _format_price(usd[i]),
+                'Preço (R$)': _format_price(brl[i]),
+                'Preço Final (R$)': _format_final(final[i]),
+            }
+            for column, values in extra:
+                row[column] = values[i]
+            row['Link'] = self.links[i]
+            row['Imagem'] = self.images[i]
+            yield row
+
+    # ------------------------------------------------------------------
+    # Exportações em partes
+    # ------------------------------------------------------------------
+    def iter_csv(self, shipping_cost):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.columns)
+        for i, row in enumerate(self.iter_rows(shipping_cost), start=1):
+            writer.writerow([_cell(value) for value in row.values()])
+            if i % CHUNK_ROWS == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    def iter_json(self, shipping_cost):
+        yield '['
+        for i, row in enumerate(self.iter_rows(shipping_cost)):
+            yield (',\n' if i else '\n') + json.dumps(row, ensure_ascii=False)
+        yield '\n]\n'
+
+    def iter_ndjson(self, shipping_cost):
+        for row in self.iter_rows(shipping_cost):
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+
+    # ------------------------------------------------------------------
+    # Exportações a partir das colunas (dependências opcionais)
+    # ------------------------------------------------------------------
+    def to_arrow(self, shipping_cost):
+        if pa is None:
+            raise RuntimeError('pyarrow não instalado')
+        columns = {
+            'Nome': pa.array(self.names, pa.string()),
+            'Preço (US$)': _arrow_prices(self.usd),
+            'Preço (R$)': _arrow_prices(self.brl),
+            'Preço Final (R$)': _arrow_prices(self.final_prices(shipping_cost)),
+        }
+        for column, values in self.extra.items():
+            columns[column] = pa.array(values)
+        columns['Link'] = pa.array(self.links, pa.string())
+        columns['Imagem'] = pa.array(self.images, pa.string())
+        return pa.table(columns)
+
+    def iter_parquet(self, shipping_cost):
+        table = self.to_arrow(shipping_cost)
+        return _iter_batches(table, lambda sink: pq.ParquetWriter(sink, table.schema, compression='zstd'))
+
+    def iter_arrow(self, shipping_cost):
+        table = self.to_arrow(shipping_cost)
+        return _iter_batches(table, lambda sink: pa.ipc.new_file(sink, table.schema))
+
+    def write_xlsx(self, fileobj, shipping_cost, include_final=True):
+        """Planilha dos produtos; ``include_final=False`` omite o 'Preço Final (R$)' (planilha da CLI)"""
+        if Workbook is None:
+            raise RuntimeError('openpyxl não instalado')
+        # write_only grava as linhas direto no arquivo, sem montar a planilha em memória
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Produtos')
+        columns = self.columns if include_final else [c for c in self.columns if c != 'Preço Final (R$)']
+        sheet.append(columns)
+        prices = [self.usd.tolist(), self.brl.tolist()]
+        if include_final:
+            prices.append(self.final_prices(shipping_cost).tolist())
+        extra = list(self.extra.values())
+        for i in range(len(self)):
+            cells = [None if math.isnan(values[i]) else values[i] for values in prices]
+            sheet.append([self.names[i], *cells, *(_cell(values[i]) for values in extra), self.links[i], self.images[i]])
+        workbook.save(fileobj)
+
+
+def _arrow_prices(values):
+    """Coluna do Arrow sobre o buffer da coluna de preços (só a máscara de nulos é alocada)"""
+    values = _price_column(values)
+    return pa.array(values, pa.float64(), mask=np.isnan(values))
+
+
+class _ChunkSink(io.RawIOBase):
+    """Arquivo só de escrita que acumula o que foi escrito até ser esvaziado com ``drain()``"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _iter_batches(table, open_writer):
+    """Gera o arquivo Arrow/Parquet lote a lote: cada lote é escrito e enviado antes do próximo"""
+    sink = _ChunkSink()
+    writer = open_writer(sink)
+    try:
+        for batch in table.to_batches(max_chunksize=ARROW_BATCH_ROWS):
+            writer.write_batch(batch)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def _iter_file(write):
+    """Gera em partes o arquivo produzido por ``write(arquivo)`` num temporário em disco"""
+    with tempfile.TemporaryFile() as f:
+        write(f)
+        f.seek(0)
+        while True:
+            chunk = f.read(FILE_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+
+
+# formato -> (mimetype, extensão, disponível)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv', True),
+    'json': ('application/json', 'json', True),
+    'ndjson': ('application/x-ndjson', 'ndjson', True),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx', Workbook is not None),
+    'parquet': ('application/vnd.apache.parquet', 'parquet', pa is not None),
+    'arrow': ('application/vnd.apache.arrow.file', 'arrow', pa is not None),
+}
+
+
+def available_formats():
+    return [name for name, (_, _, available) in EXPORT_FORMATS.items() if available]
+
+
+def export(table, fmt, shipping_cost=0.0):
+    """Retorna ``(partes, mimetype, extensão)`` do formato pedido"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato inválido: {fmt}. Use um de {', '.join(EXPORT_FORMATS)}")
+    mimetype, extension, available = EXPORT_FORMATS[fmt]
+    if not available:
+        dependency = 'openpyxl' if fmt == 'xlsx' else 'pyarrow'
+        raise RuntimeError(f'Formato {fmt} indisponível: instale o pacote {dependency}')
+    if fmt == 'csv':
+        chunks = table.iter_csv(shipping_cost)
+    elif fmt == 'json':
+        chunks = table.iter_json(shipping_cost)
+    elif fmt == 'ndjson':
+        chunks = table.iter_ndjson(shipping_cost)
+    elif fmt == 'xlsx':
+        chunks = _iter_file(lambda f: table.write_xlsx(f, shipping_cost))
+    elif fmt == 'parquet':
+        chunks = table.iter_parquet(shipping_cost)
+    else:
+        chunks = table.iter_arrow(shipping_cost)
+    return chunks, mimetype, extension
@@ -0,0 +1,155 @@
+import logging
+import random
+import threading
+import time
+
+from cache import normalize_term
+
+logger = logging.getLogger(__name__)
+
+
+class WatchScheduler:
+    """Atualiza periodicamente os termos acompanhados.
+
+    Cada termo roda a cada ``interval`` segundos com jitter de ±``jitter``
+    (fração do intervalo) para não sincronizar as buscas. No máximo
+    ``max_concurrency`` atualizações rodam ao mesmo tempo e duas atualizações
+    nunca começam com menos de ``min_gap`` segundos de diferença, somando-se
+    ao limite por host dos engines. ``refresh(termo, intervalo)`` faz a busca
+    e retorna um resumo que fica disponível em ``stats()``.
+    """
+
+    def __init__(self, refresh, default_interval=1800, jitter=0.1, max_concurrency=1, min_gap=10):
+        self.refresh = refresh
+        self.default_interval = default_interval
+        self.jitter = jitter
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_gap = min_gap
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._terms = {}
+        self._next_start = 0.0
+        self._thread = None
+        self._stopped = False
+        self._stats = {'runs': 0, 'failures': 0}
+
+    def _jittered(self, interval):
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def add(self, search_term, interval=None):
+        term = normalize_term(search_term)
+        interval = interval or self.default_interval
+        with self._lock:
+            state = self._terms.get(term)
+            if state is None:
+                # Primeira execução espalhada para não disparar todos os termos juntos
+                self._terms[term] = {
+                    'interval': interval,
+                    'next_run': time.time() + random.uniform(0, min(interval * self.jitter, 60)),
+                    'running': False,
+                    'last_run': None,
+                    'last_duration': None,
+                    'last_status': None,
+                    'last_error': None,
+                    'last_result': None,
+                }
+            else:
+                # Intervalo menor: antecipar a próxima execução
+                state['interval'] = interval
+                state['next_run'] = min(state['next_run'], (state['last_run'] or time.time()) + interval)
+        self._wakeup.set()
+        return term
+
+    def remove(self, search_term):
+        with self._lock:
+            return self._terms.pop(normalize_term(search_term), None) is not None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name='watch-scheduler', daemon=True)
+        self._thread.start()
+        logger.info(f"⏰ Agendador iniciado com {len(self._terms)} termo(s) acompanhado(s)")
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+
+    def _due_term(self):
+        """Retorna ``(termo, espera)``: o termo vencido mais atrasado ou quanto esperar"""
+        now = time.time()
+        with self._lock:
+            waiting = [(state['next_run'], term) for term, state in self._terms.items() if not state['running']]
+        if not waiting:
+            return None, 60
+        next_run, term = min(waiting)
+        if next_run > now:
+            return None, next_run - now
+        return term, 0
+
+    def _loop(self):
+        while not self._stopped:
+            # Limpar antes de consultar os termos: um set() que chegue depois disso
+            # (termo novo, atualização concluída) acorda a próxima espera
+            self._wakeup.clear()
+            term, wait = self._due_term()
+            if term is None:
+                self._wakeup.wait(min(wait, 60))
+                continue
+
+            # Orçamento global: vagas de concorrência e intervalo mínimo entre inícios
+            if not self._slots.acquire(timeout=1):
+                continue
+            gap = self._next_start - time.time()
+            if gap > 0:
+                self._slots.release()
+                self._wakeup.wait(gap)
+                continue
+
+            with self._lock:
+                state = self._terms.get(term)
+                if state is None or state['running']:
+                    self._slots.release()
+                    continue
+                state['running'] = True
+                self._next_start = time.time() + self.min_gap
+            threading.Thread(target=self._run, args=(term, state['interval']), name='watch-refresh', daemon=True).start()
+
+    def _run(self, term, interval):
+        started = time.time()
+        logger.info(f"⏰ Atualizando termo acompanhado '{term}'")
+        status, error, result = 'ok', None, None
+        try:
+            result = self.refresh(term, interval)
+        except Exception as e:
+            status, error = 'error', str(e)
+            logger.warning(f"⚠️ Falha ao atualizar '{term}': {str(e)}")
+        finally:
+            with self._lock:
+                self._stats['runs'] += 1
+                if status != 'ok':
+                    self._stats['failures'] += 1
+                state = self._terms.get(term)
+                if state is not None:
+                    state.update(
+                        running=False,
+                        last_run=started,
+                        last_duration=round(time.time() - started, 3),
+                        last_status=status,
+                        last_error=error,
+                        last_result=result,
+                        next_run=time.time() + self._jittered(state['interval']),
+                    )
+            self._slots.release()
+            self._wakeup.set()
+
+    def stats(self):
+        with self._lock:
+            terms = {term: dict(state) for term, state in self._terms.items()}
+            return dict(
+                self._stats,
+                watched=len(terms),
+                running=sum(1 for state in terms.values() if state['running']),
+                max_concurrency=self.max_concurrency,
+                min_gap=self.min_gap,
+                terms=terms,
+            )
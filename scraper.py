@@ -6,6 +6,8 @@ import json
 import time
 import re
 import os
+import threading
+from urllib.parse import urlencode
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
@@ -14,6 +16,11 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException, NoSuchElementException
 
+from parsers import get_parser, SoupParser
+from results import ProductTable, available_formats
+from governor import default_limiter
+import metrics
+
 try:
     from webdriver_manager.chrome import ChromeDriverManager
 except ImportError as e:
@@ -24,7 +31,91 @@ except ImportError as e:
 # Configurar logging para o scraper
 logger = logging.getLogger(__name__)
 
-def setup_driver():
+CHROME_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# Esperas do Selenium: 'events' espera por condições do DOM e da rede; 'fixed' usa os sleeps antigos
+SELENIUM_WAIT_MODE = os.environ.get('SELENIUM_WAIT_MODE', 'events')
+SELENIUM_BLOCK_RESOURCES = os.environ.get('SELENIUM_BLOCK_RESOURCES', '1') != '0'
+COOKIE_WAIT_TIMEOUT = float(os.environ.get('COOKIE_WAIT_TIMEOUT', 3))
+SCROLL_WAIT_TIMEOUT = float(os.environ.get('SCROLL_WAIT_TIMEOUT', 3))
+NETWORK_IDLE_SECONDS = float(os.environ.get('NETWORK_IDLE_SECONDS', 0.5))
+COOKIE_CONSENT_FILE = os.environ.get('COOKIE_CONSENT_FILE', 'cookie_consent.json')
+# Fallback via requests: (conexão, leitura) em segundos
+FALLBACK_TIMEOUT = (float(os.environ.get('FALLBACK_CONNECT_TIMEOUT', 5)), float(os.environ.get('FALLBACK_READ_TIMEOUT', 30)))
+
+COOKIE_BUTTON_XPATH = "//button[contains(text(), 'ENTENDI')] | //button[contains(text(), 'Estou de Acordo')] | //*[@id='btn-cookie-allow']"
+
+# Recursos que não influenciam a lista de produtos (as URLs das imagens continuam no HTML)
+BLOCKED_URL_PATTERNS = [
+    '*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*facebook.net*', '*hotjar.com*', '*clarity.ms*',
+]
+
+# Conta as requisições fetch/XHR em andamento para detectar a rede ociosa
+PENDING_REQUESTS_JS = """
+(function () {
+    window.__scraperPending = 0;
+    var done = function () { window.__scraperPending = Math.max(0, window.__scraperPending - 1); };
+    if (window.fetch) {
+        var originalFetch = window.fetch;
+        window.fetch = function () {
+            window.__scraperPending++;
+            return originalFetch.apply(this, arguments).finally(done);
+        };
+    }
+    var originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        window.__scraperPending++;
+        this.addEventListener('loadend', done);
+        return originalSend.apply(this, arguments);
+    };
+})();
+"""
+
+PAGE_STATE_JS = """
+return [
+    document.getElementsByClassName('promocao-produtos-item').length,
+    performance.getEntriesByType('resource').length,
+    window.__scraperPending || 0,
+    document.readyState,
+    document.body.scrollHeight
+];
+"""
+
+class MockDriver:
+    """Driver de fallback que usa requests em vez de Selenium"""
+
+    def __init__(self):
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': CHROME_USER_AGENT
+        })
+        logger.info("✅ Fallback configurado: usando requests em vez de Selenium")
+
+    def get(self, url):
+        logger.info(f"🌐 Fallback: Fazendo requisição HTTP para {url}")
+        # Conexão falha rápido; a leitura da página pode demorar. As novas
+        # tentativas ficam com o HostRateLimiter de quem chama
+        response = self.session.get(url, timeout=FALLBACK_TIMEOUT)
+        response.raise_for_status()
+        self.page_source = response.text
+        logger.info("✅ Fallback: Página carregada com sucesso")
+
+    def quit(self):
+        logger.info("🔒 Fallback: Fechando sessão requests")
+        self.session.close()
+
+    def find_element(self, by, value):
+        # Método dummy para compatibilidade
+        raise NoSuchElementException(f"Fallback mode: elemento {value} não encontrado")
+
+    def find_elements(self, by, value):
+        # Método dummy para compatibilidade
+        return []
+
+def build_chrome_options():
     logger.info("🔧 Configurando opções do Chrome...")
     chrome_options = Options()
     chrome_options.add_argument("--headless")
@@ -34,118 +125,166 @@ def setup_driver():
     chrome_options.add_argument("--window-size=1920,1080")
     chrome_options.add_argument("--disable-extensions")
     chrome_options.add_argument("--disable-plugins")
-    chrome_options.add_argument("--disable-images")
+    # --disable-images é ignorado pelo Chrome atual; a preferência de conteúdo ainda vale
+    chrome_options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
     chrome_options.add_argument("--disable-javascript")
-    chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
-    
-    # Tentar múltiplas estratégias para configurar o driver
-    driver = None
-    
-    # Estratégia 1: webdriver-manager (se disponível)
-    if ChromeDriverManager is not None:
-        logger.info("📥 Tentativa 1: Instalando/configurando ChromeDriver via webdriver-manager...")
-        try:
-            service = Service(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=chrome_options)
-            logger.info("✅ ChromeDriver configurado via webdriver-manager")
-            return driver
-        except Exception as e:
-            logger.warning(f"⚠️ Falha na tentativa 1: {str(e)}")
-    else:
-        logger.info("⏭️ Pulando tentativa 1: webdriver-manager não disponível")
-    
-    # Estratégia 2: Caminho padrão do Render
-    logger.info("🔄 Tentativa 2: Usando caminho padrão do Render...")
-    try:
-        service = Service("/usr/bin/chromedriver")
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        logger.info("✅ ChromeDriver configurado no caminho do Render")
-        return driver
-    except Exception as e:
-        logger.warning(f"⚠️ Falha na tentativa 2: {str(e)}")
-    
-    # Estratégia 3: Caminho local (para desenvolvimento)
-    logger.info("🔄 Tentativa 3: Usando caminho local...")
+    chrome_options.add_argument(f"--user-agent={CHROME_USER_AGENT}")
+    return chrome_options
+
+def _strategy_webdriver_manager(chrome_options):
+    if ChromeDriverManager is None:
+        raise RuntimeError("webdriver-manager não disponível")
+    service = Service(ChromeDriverManager().install())
+    return webdriver.Chrome(service=service, options=chrome_options)
+
+def _strategy_render_path(chrome_options):
+    service = Service("/usr/bin/chromedriver")
+    return webdriver.Chrome(service=service, options=chrome_options)
+
+def _strategy_local_path(chrome_options):
+    service = Service("/opt/homebrew/bin/chromedriver")
+    return webdriver.Chrome(service=service, options=chrome_options)
+
+def _strategy_default(chrome_options):
+    return webdriver.Chrome(options=chrome_options)
+
+# Estratégias em ordem de tentativa: (nome, descrição, função)
+DRIVER_STRATEGIES = [
+    ('webdriver-manager', 'Instalando/configurando ChromeDriver via webdriver-manager', _strategy_webdriver_manager),
+    ('render', 'Usando caminho padrão do Render', _strategy_render_path),
+    ('local', 'Usando caminho local', _strategy_local_path),
+    ('default', 'Usando driver sem service específico', _strategy_default),
+]
+
+# Lembrar qual estratégia funcionou para que os próximos lançamentos pulem as que falham
+_strategy_lock = threading.Lock()
+_working_strategy = None
+
+def get_working_strategy():
+    with _strategy_lock:
+        return _working_strategy
+
+def _remember_strategy(name):
+    global _working_strategy
+    with _strategy_lock:
+        _working_strategy = name
+
+def enable_resource_blocking(driver):
+    """Bloqueia imagens, fontes e rastreadores via CDP e instala o contador de requisições"""
     try:
-        service = Service("/opt/homebrew/bin/chromedriver")
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        logger.info("✅ ChromeDriver configurado no caminho local")
-        return driver
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': PENDING_REQUESTS_JS})
+        logger.info(f"🚫 Bloqueando {len(BLOCKED_URL_PATTERNS)} padrões de recursos via CDP")
     except Exception as e:
-        logger.warning(f"⚠️ Falha na tentativa 3: {str(e)}")
-    
-    # Estratégia 4: Sem service específico
-    logger.info("🔄 Tentativa 4: Usando driver sem service específico...")
+        logger.warning(f"⚠️ Não foi possível bloquear recursos via CDP: {str(e)}")
+
+# Cookies gravados ao aceitar o banner; reaplicados antes de cada navegação
+_consent_lock = threading.Lock()
+_consent_cookies = None
+
+def get_consent_cookies():
+    global _consent_cookies
+    with _consent_lock:
+        if _consent_cookies is None:
+            _consent_cookies = []
+            if COOKIE_CONSENT_FILE and os.path.exists(COOKIE_CONSENT_FILE):
+                try:
+                    with open(COOKIE_CONSENT_FILE, 'r', encoding='utf-8') as f:
+                        _consent_cookies = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"⚠️ Erro ao ler {COOKIE_CONSENT_FILE}: {str(e)}")
+        return list(_consent_cookies)
+
+def remember_consent_cookies(cookies):
+    global _consent_cookies
+    with _consent_lock:
+        _consent_cookies = list(cookies)
+        if COOKIE_CONSENT_FILE:
+            try:
+                with open(COOKIE_CONSENT_FILE, 'w', encoding='utf-8') as f:
+                    json.dump(_consent_cookies, f)
+            except OSError as e:
+                logger.warning(f"⚠️ Erro ao gravar {COOKIE_CONSENT_FILE}: {str(e)}")
+    logger.info(f"🍪 Consentimento de cookies memorizado ({len(cookies)} cookie(s))")
+
+def apply_consent_cookies(driver):
+    """Define os cookies de consentimento antes de navegar; retorna se havia algum"""
+    cookies = get_consent_cookies()
+    if not cookies:
+        return False
+    params = []
+    for cookie in cookies:
+        param = {key: cookie[key] for key in ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'sameSite') if key in cookie}
+        if 'expiry' in cookie:
+            param['expires'] = cookie['expiry']
+        params.append(param)
     try:
-        driver = webdriver.Chrome(options=chrome_options)
-        logger.info("✅ ChromeDriver configurado sem service específico")
-        return driver
+        driver.execute_cdp_cmd('Network.setCookies', {'cookies': params})
+        return True
     except Exception as e:
-        logger.warning(f"⚠️ Falha na tentativa 4: {str(e)}")
-    
+        logger.warning(f"⚠️ Não foi possível aplicar os cookies de consentimento: {str(e)}")
+        return False
+
+def setup_driver():
+    chrome_options = build_chrome_options()
+
+    # Tentar primeiro a estratégia que já funcionou; as demais só se ela falhar
+    remembered = get_working_strategy()
+    strategies = sorted(DRIVER_STRATEGIES, key=lambda s: s[0] != remembered)
+
+    for attempt, (name, description, launch) in enumerate(strategies, start=1):
+        if name == 'webdriver-manager' and ChromeDriverManager is None:
+            logger.info(f"⏭️ Pulando tentativa {attempt}: webdriver-manager não disponível")
+            continue
+        logger.info(f"🔄 Tentativa {attempt} ({name}): {description}...")
+        started = time.perf_counter()
+        try:
+            driver = launch(chrome_options)
+            if SELENIUM_BLOCK_RESOURCES:
+                enable_resource_blocking(driver)
+            metrics.record('driver_setup', time.perf_counter() - started, strategy=name, outcome='ok')
+            metrics.DRIVER_LAUNCHES.inc(strategy=name, outcome='ok')
+            _remember_strategy(name)
+            logger.info(f"✅ ChromeDriver configurado via estratégia '{name}'")
+            return driver
+        except Exception as e:
+            metrics.record('driver_setup', time.perf_counter() - started, strategy=name, outcome='error')
+            metrics.DRIVER_LAUNCHES.inc(strategy=name, outcome='error')
+            logger.warning(f"⚠️ Falha na tentativa {attempt} ({name}): {str(e)}")
+            if name == remembered:
+                _remember_strategy(None)
+
     # Se todas as tentativas falharam, implementar fallback sem Selenium
     logger.error("❌ Todas as tentativas de configurar o ChromeDriver falharam")
     logger.info("🔄 Implementando fallback: scraping sem Selenium usando requests")
-    
+    metrics.DRIVER_LAUNCHES.inc(strategy='requests-fallback', outcome='ok')
+
     # Retornar um objeto mock que simula o driver para o fallback
-    class MockDriver:
-        def __init__(self):
-            self.session = requests.Session()
-            self.session.headers.update({
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            })
-            logger.info("✅ Fallback configurado: usando requests em vez de Selenium")
-        
-        def get(self, url):
-            logger.info(f"🌐 Fallback: Fazendo requisição HTTP para {url}")
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            self.page_source = response.text
-            logger.info("✅ Fallback: Página carregada com sucesso")
-        
-        def quit(self):
-            logger.info("🔒 Fallback: Fechando sessão requests")
-            self.session.close()
-        
-        def find_element(self, by, value):
-            # Método dummy para compatibilidade
-            raise NoSuchElementException(f"Fallback mode: elemento {value} não encontrado")
-        
-        def find_elements(self, by, value):
-            # Método dummy para compatibilidade
-            return []
-    
     return MockDriver()
 
-def clean_price(price_str):
-    if not price_str: return 'N/A'
-    # Remove thousand separators ("." or ",") and replace decimal comma (",") with dot (".")
-    # Handles cases like '1.165,00' -> '1165.00' and '97,00' -> '97.00'
-    # First, remove all dots (thousand separator in some locales)
-    cleaned_price = price_str.replace('.', '')
-    # Then, replace comma with dot (decimal separator in some locales)
-    cleaned_price = cleaned_price.replace(',', '.')
-    
-    # Check if the cleaned price matches a pattern like '12345' (integer without decimal)
-    # If so, and it's a dollar price, assume it should have two decimal places
-    # This is a heuristic based on the observation that some dollar prices are missing decimal
-    if re.fullmatch(r'\d+', cleaned_price) and len(cleaned_price) > 2: # e.g., '9700' should be '97.00'
-        cleaned_price = cleaned_price[:-2] + '.' + cleaned_price[-2:]
+BASE_URL = "https://comprasparaguai.com.br"
 
-    # Ensure it's a valid number format
-    try:
-        return str(float(cleaned_price))
-    except ValueError:
-        return 'N/A'
+# Links de paginação da busca, ex: href="?page=2&amp;q=iphone"
+PAGE_LINK_RE = re.compile(r'href="\?[^"]*?\bpage=(\d+)')
 
-def scrape_products(driver, search_term):
-    logger.info(f"🌐 Iniciando scraping para termo: '{search_term}'")
-    base_url = "https://comprasparaguai.com.br"
-    search_url = f"{base_url}/busca/?q={search_term}"
-    
+def build_search_url(search_term, page=1):
+    # Termo codificado: '&' ou '#' no termo não podem quebrar o q nem o page
+    params = {'q': search_term, 'page': page} if page > 1 else {'q': search_term}
+    return f"{BASE_URL}/busca/?{urlencode(params)}"
+
+def discover_page_count(html):
+    """Descobre o número total de páginas a partir dos links de paginação"""
+    pages = [int(n) for n in PAGE_LINK_RE.findall(html)]
+    return max(pages) if pages else 1
+
+def load_search_page(driver, search_url):
+    """Carrega a página de busca no driver (cookies e scroll no Selenium real)"""
     logger.info(f"📍 Navegando para: {search_url}")
+    consent_applied = not hasattr(driver, 'session') and apply_consent_cookies(driver)
     try:
-        driver.get(search_url)
+        with metrics.span('page_load', engine='requests-fallback' if hasattr(driver, 'session') else 'selenium'):
+            driver.get(search_url)
         logger.info("✅ Página carregada com sucesso")
     except TimeoutException as e:
         logger.error(f"⏰ Timeout ao carregar página: {str(e)}")
@@ -160,86 +299,179 @@ def scrape_products(driver, search_term):
         logger.error(f"Tipo do erro: {type(e).__name__}")
         raise
 
-    # Aceitar cookies, se presente (apenas para Selenium real)
+    if hasattr(driver, 'session'):
+        # MockDriver (fallback) não executa JavaScript
+        logger.info("⏭️ Fallback mode: pulando cookies e scroll (usando HTML estático)")
+        return
+
+    cookie_started = time.perf_counter()
+    if SELENIUM_WAIT_MODE == 'fixed':
+        _accept_cookies_fixed(driver)
+    else:
+        accept_cookie_banner(driver, consent_applied)
+    metrics.record('cookie_wait', time.perf_counter() - cookie_started)
+
+    scroll_started = time.perf_counter()
+    if SELENIUM_WAIT_MODE == 'fixed':
+        _scroll_fixed(driver)
+    else:
+        scroll_until_settled(driver)
+    metrics.record('scroll', time.perf_counter() - scroll_started)
+
+def _accept_cookies_fixed(driver):
+    """Modo antigo: espera até 10s pelo banner e mais 2s para ele sumir"""
     logger.info("🍪 Verificando banner de cookies...")
     try:
-        # Verificar se é o MockDriver (fallback)
-        if hasattr(driver, 'session'):
-            logger.info("⏭️ Fallback mode: pulando verificação de cookies")
-        else:
-            cookie_button = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'ENTENDI')] | //button[contains(text(), 'Estou de Acordo')] | //*[@id='btn-cookie-allow']"))
-            )
-            cookie_button.click()
-            logger.info("✅ Banner de cookies aceito")
+        cookie_button = WebDriverWait(driver, 10).until(
+            EC.element_to_be_clickable((By.XPATH, COOKIE_BUTTON_XPATH))
+        )
+        cookie_button.click()
+        logger.info("✅ Banner de cookies aceito")
         time.sleep(2) # Dar um tempo para o banner de cookies sumir
     except Exception as e:
         logger.info("ℹ️ Banner de cookies não encontrado ou já aceito")
 
-    products_data = []
-    
-    # Rolar a página para carregar mais produtos (apenas para Selenium real)
+def _scroll_fixed(driver):
+    """Modo antigo: rola a página esperando 3s a cada tentativa"""
     logger.info("📜 Iniciando scroll para carregar produtos...")
-    if hasattr(driver, 'session'):
-        logger.info("⏭️ Fallback mode: pulando scroll (usando HTML estático)")
-    else:
-        last_height = driver.execute_script("return document.body.scrollHeight")
-        scroll_attempts = 0
-        max_scroll_attempts = 5 # Ajustar conforme necessário
-        
-        while scroll_attempts < max_scroll_attempts:
-            logger.debug(f"📜 Scroll tentativa {scroll_attempts + 1}/{max_scroll_attempts}")
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(3)  # Esperar o conteúdo carregar
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
-                logger.info("📜 Fim da página atingido")
-                break
-            last_height = new_height
-            scroll_attempts += 1
-        
-        logger.info(f"📜 Scroll concluído após {scroll_attempts} tentativas")
+    last_height = driver.execute_script("return document.body.scrollHeight")
+    scroll_attempts = 0
+    max_scroll_attempts = 5 # Ajustar conforme necessário
+
+    while scroll_attempts < max_scroll_attempts:
+        logger.debug(f"📜 Scroll tentativa {scroll_attempts + 1}/{max_scroll_attempts}")
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        time.sleep(3)  # Esperar o conteúdo carregar
+        new_height = driver.execute_script("return document.body.scrollHeight")
+        if new_height == last_height:
+            logger.info("📜 Fim da página atingido")
+            break
+        last_height = new_height
+        scroll_attempts += 1
+
+    logger.info(f"📜 Scroll concluído após {scroll_attempts} tentativas")
+
+def accept_cookie_banner(driver, consent_applied=False):
+    """Aceita o banner de cookies esperando só enquanto ele pode aparecer.
+
+    Com o consentimento já aplicado o banner é apenas conferido, sem espera.
+    Ao aceitar, os cookies novos são memorizados para as próximas navegações.
+    """
+    try:
+        if consent_applied:
+            buttons = [b for b in driver.find_elements(By.XPATH, COOKIE_BUTTON_XPATH) if b.is_displayed()]
+            if not buttons:
+                logger.info("🍪 Consentimento de cookies reaproveitado, banner ausente")
+                return
+            cookie_button = buttons[0]
+        else:
+            logger.info("🍪 Verificando banner de cookies...")
+            cookie_button = WebDriverWait(driver, COOKIE_WAIT_TIMEOUT, poll_frequency=0.2).until(
+                EC.element_to_be_clickable((By.XPATH, COOKIE_BUTTON_XPATH))
+            )
+        before = {cookie['name'] for cookie in driver.get_cookies()}
+        cookie_button.click()
+        logger.info("✅ Banner de cookies aceito")
+        try:
+            WebDriverWait(driver, 2, poll_frequency=0.1).until(EC.invisibility_of_element(cookie_button))
+        except TimeoutException:
+            logger.debug("Banner de cookies ainda visível após o clique")
+        consent = [cookie for cookie in driver.get_cookies() if cookie['name'] not in before]
+        if consent:
+            remember_consent_cookies(consent)
+    except TimeoutException:
+        logger.info("ℹ️ Banner de cookies não encontrado ou já aceito")
+    except WebDriverException as e:
+        logger.info(f"ℹ️ Não foi possível aceitar o banner de cookies: {str(e)}")
+
+def _page_state(driver):
+    cards, resources, pending, ready_state, height = driver.execute_script(PAGE_STATE_JS)
+    return {'cards': cards, 'resources': resources, 'pending': pending, 'ready': ready_state == 'complete', 'height': height}
+
+def wait_for_products(driver, previous_cards, timeout=None):
+    """Espera até surgirem mais cards de produto ou a rede ficar ociosa.
 
+    A rede é considerada ociosa quando não há fetch/XHR em andamento e nenhum
+    recurso novo foi carregado por ``NETWORK_IDLE_SECONDS``. Retorna o estado
+    final da página.
+    """
+    timeout = SCROLL_WAIT_TIMEOUT if timeout is None else timeout
+    tracker = {'resources': None, 'since': time.monotonic(), 'state': None}
+
+    def settled(d):
+        state = tracker['state'] = _page_state(d)
+        if state['cards'] > previous_cards:
+            return True
+        if state['pending'] or not state['ready'] or state['resources'] != tracker['resources']:
+            tracker.update(resources=state['resources'], since=time.monotonic())
+            return False
+        return time.monotonic() - tracker['since'] >= NETWORK_IDLE_SECONDS
+
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(settled)
+    except TimeoutException:
+        logger.debug(f"📜 Página não estabilizou em {timeout}s")
+    return tracker['state'] or _page_state(driver)
+
+def scroll_until_settled(driver, max_scroll_attempts=5):
+    """Rola a página até que um scroll não traga mais produtos"""
+    logger.info("📜 Iniciando scroll para carregar produtos...")
+    state = _page_state(driver)
+    scroll_attempts = 0
+
+    while scroll_attempts < max_scroll_attempts:
+        logger.debug(f"📜 Scroll tentativa {scroll_attempts + 1}/{max_scroll_attempts}")
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        new_state = wait_for_products(driver, state['cards'])
+        if new_state['cards'] <= state['cards'] and new_state['height'] == state['height']:
+            logger.info("📜 Fim da página atingido")
+            break
+        state = new_state
+        scroll_attempts += 1
+
+    logger.info(f"📜 Scroll concluído após {scroll_attempts} tentativas ({state['cards']} cards)")
+
+def save_debug_html(html):
     # Salvar o HTML da página para depuração
     logger.info("💾 Salvando HTML da página para debug...")
     try:
-        with open("debug_page.html", "w", encoding="utf-8") as f:
-            f.write(driver.page_source)
+        with metrics.span('debug_dump'), open("debug_page.html", "w", encoding="utf-8") as f:
+            f.write(html)
         logger.info("✅ HTML salvo em debug_page.html")
     except Exception as e:
         logger.warning(f"⚠️ Erro ao salvar HTML de debug: {str(e)}")
 
-    # Usar BeautifulSoup para parsear o HTML após o carregamento dinâmico
-    logger.info("🍲 Parseando HTML com BeautifulSoup...")
+def iter_products(html, base_url=BASE_URL, parser=None, stats=None):
+    """Gera os produtos do HTML de uma página de busca à medida que são extraídos.
+
+    Se ``stats`` for um dict, recebe ``cards``, ``extracted`` e ``errors`` ao final.
+    """
+    parser = parser or get_parser()
+    extracted = 0
+    failed = 0
+
+    # Parsear apenas os cards de produto com o backend disponível (lxml ou BeautifulSoup)
+    logger.info(f"🍲 Parseando HTML com {parser.name}...")
     try:
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
+        with metrics.span('parse', parser=parser.name):
+            product_items = parser.find_cards(html)
         logger.info("✅ HTML parseado com sucesso")
     except Exception as e:
-        logger.error(f"❌ Erro ao parsear HTML com BeautifulSoup: {str(e)}")
-        logger.error("Possível problema com o conteúdo HTML ou parser")
-        # Tentar com parser alternativo
-        try:
-            logger.info("🔄 Tentando parser alternativo...")
-            soup = BeautifulSoup(driver.page_source, 'lxml')
-            logger.info("✅ HTML parseado com parser lxml")
-        except Exception as e2:
-            logger.error(f"❌ Erro também com parser lxml: {str(e2)}")
-            try:
-                logger.info("🔄 Tentando parser html.parser básico...")
-                soup = BeautifulSoup(driver.page_source, 'html.parser')
-                logger.info("✅ HTML parseado com parser básico")
-            except Exception as e3:
-                logger.error(f"❌ Falha total no parsing: {str(e3)}")
-                raise Exception("Não foi possível parsear o HTML com nenhum parser disponível")
+        logger.error(f"❌ Erro ao parsear HTML com {parser.name}: {str(e)}")
+        if isinstance(parser, SoupParser):
+            raise Exception("Não foi possível parsear o HTML com nenhum parser disponível")
+        logger.info("🔄 Tentando parser alternativo (BeautifulSoup)...")
+        parser = SoupParser()
+        with metrics.span('parse', parser=parser.name):
+            product_items = parser.find_cards(html)
 
     # Extrair dados dos produtos
-    logger.info("🔍 Procurando produtos na página...")
-    product_items = soup.find_all('div', class_='promocao-produtos-item')
     logger.info(f"📊 Encontrados {len(product_items)} itens de produto")
 
     if len(product_items) == 0:
         logger.warning("⚠️ Nenhum produto encontrado! Verificando estrutura da página...")
-        # Tentar encontrar outros seletores possíveis
+        # Tentar encontrar outros seletores possíveis (só neste caso a página inteira é parseada)
+        soup = BeautifulSoup(html, 'html.parser')
         alternative_selectors = [
             'div.produto-item',
             'div.product-item', 
@@ -258,101 +490,72 @@ def scrape_products(driver, search_term):
             except Exception as e:
                 logger.debug(f"Seletor {selector} falhou: {str(e)}")
 
-    for i, item in enumerate(product_items):
-        logger.debug(f"🔍 Processando produto {i+1}/{len(product_items)}")
-        try:
-            name_tag = item.find('div', class_='promocao-item-nome')
-            name = name_tag.a.text.strip() if name_tag and name_tag.a else 'N/A'
-            logger.debug(f"📝 Nome: {name}")
-
-            link_tag = item.find('div', class_='promocao-item-nome')
-            link = link_tag.a['href'] if link_tag and link_tag.a and 'href' in link_tag.a.attrs else 'N/A'
-            if link and not link.startswith('http'):
-                link = base_url + link
-            logger.debug(f"🔗 Link: {link}")
-
-            price_usd = 'N/A'
-            price_brl = 'N/A'
-
-            # Extração do preço em dólar
-            price_usd_element = item.select_one('.price-model span') or item.select_one('.promocao-item-preco-oferta strong')
-            if price_usd_element:
-                price_usd_text = price_usd_element.get_text(strip=True)
-                match_usd = re.search(r'US\$\s*([\d\.,]+)', price_usd_text)
-                if match_usd:
-                    price_usd = clean_price(match_usd.group(1))
-                    logger.debug(f"💵 Preço USD: {price_usd}")
-
-            # Extração do preço em real
-            price_brl_element = item.select_one('.promocao-item-preco-text')
-            if price_brl_element:
-                price_brl_text = price_brl_element.get_text(strip=True)
-                match_brl = re.search(r'R\$\s*([\d\.,]+)', price_brl_text)
-                if match_brl:
-                    price_brl = clean_price(match_brl.group(1))
-                    logger.debug(f"💰 Preço BRL: {price_brl}")
-
-            # Extração da URL da imagem
-            image_url = 'N/A'
-            img_tag = item.select_one('.promocao-item-img img')
-            if img_tag:
-                if 'data-src' in img_tag.attrs:
-                    image_url = img_tag['data-src']
-                elif 'src' in img_tag.attrs:
-                    image_url = img_tag['src']
-                
-                # Corrigir URLs relativas ou incompletas
-                if image_url and not image_url.startswith('http') and not image_url.startswith('//'):
-                    image_url = 'https://media-production-bucket.us-southeast-1.linodeobjects.com' + image_url
-                elif image_url.startswith('//'):
-                    image_url = 'https:' + image_url
-                
-                # Se a URL da imagem ainda for 'N/A' ou vazia, garantir que não seja concatenada com o base_url
-                if not image_url or 'N/A' in image_url:
-                    image_url = 'N/A'
-                    
-                logger.debug(f"🖼️ Imagem: {image_url}")
-
-            product_data = {
-                'Nome': name,
-                'Preço (US$)': price_usd,
-                'Preço (R$)': price_brl,
-                'Link': link,
-                'Imagem': image_url
-            }
-            
-            products_data.append(product_data)
-            logger.debug(f"✅ Produto {i+1} processado com sucesso")
-            
-        except AttributeError as e:
-            logger.error(f"❌ Erro de atributo ao extrair produto {i+1}: {str(e)}")
-            logger.error("Possível mudança na estrutura HTML da página")
-            continue
-        except KeyError as e:
-            logger.error(f"❌ Chave não encontrada ao extrair produto {i+1}: {str(e)}")
-            logger.error("Elemento HTML esperado não possui o atributo necessário")
-            continue
-        except TypeError as e:
-            logger.error(f"❌ Erro de tipo ao extrair produto {i+1}: {str(e)}")
-            logger.error("Tipo de dados inesperado durante a extração")
-            continue
-        except Exception as e:
-            logger.error(f"❌ Erro inesperado ao extrair produto {i+1}: {str(e)}")
-            logger.error(f"Tipo do erro: {type(e).__name__}")
-            continue
+    # Só o tempo de extração é medido (não o de quem consome o gerador)
+    extract_seconds = 0.0
+    try:
+        for i, item in enumerate(product_items):
+            started = time.perf_counter()
+            try:
+                product_data = parser.extract(item, base_url)
+            except AttributeError as e:
+                logger.error(f"❌ Erro de atributo ao extrair produto {i+1}: {str(e)}")
+                logger.error("Possível mudança na estrutura HTML da página")
+                metrics.EXTRACTION_ERRORS.inc(error_type=type(e).__name__)
+                failed += 1
+                continue
+            except KeyError as e:
+                logger.error(f"❌ Chave não encontrada ao extrair produto {i+1}: {str(e)}")
+                logger.error("Elemento HTML esperado não possui o atributo necessário")
+                metrics.EXTRACTION_ERRORS.inc(error_type=type(e).__name__)
+                failed += 1
+                continue
+            except TypeError as e:
+                logger.error(f"❌ Erro de tipo ao extrair produto {i+1}: {str(e)}")
+                logger.error("Tipo de dados inesperado durante a extração")
+                metrics.EXTRACTION_ERRORS.inc(error_type=type(e).__name__)
+                failed += 1
+                continue
+            except Exception as e:
+                logger.error(f"❌ Erro inesperado ao extrair produto {i+1}: {str(e)}")
+                logger.error(f"Tipo do erro: {type(e).__name__}")
+                metrics.EXTRACTION_ERRORS.inc(error_type=type(e).__name__)
+                failed += 1
+                continue
+            finally:
+                extract_seconds += time.perf_counter() - started
+
+            # Entregar fora do try para não capturar erros de quem consome o gerador
+            extracted += 1
+            yield product_data
+    finally:
+        metrics.record('extract', extract_seconds, parser=parser.name)
+        metrics.PRODUCTS_EXTRACTED.inc(extracted)
+        if stats is not None:
+            stats.update(cards=len(product_items), extracted=extracted, errors=failed)
     
-    logger.info(f"🎯 Scraping finalizado. Total de {len(products_data)} produtos extraídos")
-    return products_data
+    logger.info(f"🎯 Scraping finalizado. Total de {extracted} produtos extraídos")
+
+def parse_products(html, base_url=BASE_URL, parser=None, stats=None):
+    """Extrai a lista de produtos do HTML de uma página de busca"""
+    return list(iter_products(html, base_url, parser, stats))
+
+def scrape_products(driver, search_term, rate_limiter=None):
+    logger.info(f"🌐 Iniciando scraping para termo: '{search_term}'")
+    # Timeouts e falhas do navegador são repetidos com espera exponencial
+    search_url = build_search_url(search_term)
+    (rate_limiter or default_limiter()).call(search_url, load_search_page, driver, search_url)
+    html = driver.page_source
+    save_debug_html(html)
+    return parse_products(html)
 
 def save_to_excel(data, filename='produtos.xlsx'):
-    try:
-        import pandas as pd
-        df = pd.DataFrame(data)
-        df.to_excel(filename, index=False)
-        print(f"Dados salvos em {filename}")
-    except ImportError:
-        print("Pandas não disponível. Salvando apenas em JSON.")
+    if 'xlsx' not in available_formats():
+        print("openpyxl não disponível. Salvando apenas em JSON.")
         save_to_json(data, filename.replace('.xlsx', '.json'))
+        return
+    with open(filename, 'wb') as f:
+        ProductTable.from_products(data).write_xlsx(f, shipping_cost=0.0, include_final=False)
+    print(f"Dados salvos em {filename}")
 
 def save_to_json(data, filename='produtos.json'):
     with open(filename, 'w', encoding='utf-8') as f:
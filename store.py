@@ -0,0 +1,700 @@
+"""Histórico de produtos e preços em SQLite.
+
+Cada produto é identificado pelo ID numérico do modelo no final do Link
+(``..._64042/``). Uma busca é gravada em uma única transação: o produto é
+atualizado (upsert) e uma observação de preço só é adicionada quando o preço
+mudou. Uso pela linha de comando:
+
+    python store.py import                 # importa os produtos_*.json existentes
+    python store.py import arquivo.json    # importa arquivos específicos
+    python store.py compact --days 90      # aplica a retenção e compacta o banco (VACUUM)
+
+As consultas (séries, agregados, mais baratos e quedas de preço) usam os
+índices e a tabela ``price_daily``, com min/soma/contagem por produto e dia
+mantidos a cada busca, sem varrer o histórico.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from cache import normalize_term
+
+logger = logging.getLogger(__name__)
+
+# ID do modelo no final do link, ex: .../celular-apple-iphone-17-pro-max-512gb_64042/
+PRODUCT_ID_RE = re.compile(r'_(\d+)/?(?:[?#].*)?$')
+# Arquivos gerados pelo /scrape antigo: produtos_<termo>_<AAAAMMDD_HHMMSS>.json
+EXPORT_FILE_RE = re.compile(r'^produtos_(.+)_(\d{8}_\d{6})\.json$')
+
+# SQLite limita a quantidade de parâmetros por consulta
+_IN_BATCH = 500
+
+# Colunas adicionadas depois da primeira versão do banco
+_MIGRATIONS = {
+    'products': [('prev_price_usd', 'REAL'), ('prev_price_brl', 'REAL'), ('price_changed_at', 'REAL')],
+    'watched_terms': [('snapshot_scrape_id', 'INTEGER')],
+}
+
+# Preço do produto mudou em relação ao registrado (comparação que aceita NULL)
+_PRICE_CHANGED = '(products.price_usd IS NOT excluded.price_usd OR products.price_brl IS NOT excluded.price_brl)'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    link TEXT NOT NULL,
+    image TEXT,
+    price_usd REAL,
+    price_brl REAL,
+    prev_price_usd REAL,
+    prev_price_brl REAL,
+    price_changed_at REAL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_products_last_seen ON products(last_seen);
+
+CREATE TABLE IF NOT EXISTS scrapes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    term TEXT NOT NULL,
+    scraped_at REAL NOT NULL,
+    engine TEXT,
+    product_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scrapes_term_time ON scrapes(term, scraped_at);
+
+CREATE TABLE IF NOT EXISTS term_products (
+    term TEXT NOT NULL,
+    product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    last_scrape_id INTEGER NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (term, product_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_term_products_product ON term_products(product_id);
+
+CREATE TABLE IF NOT EXISTS price_observations (
+    product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    observed_at REAL NOT NULL,
+    price_usd REAL,
+    price_brl REAL,
+    scrape_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_observations_product_time ON price_observations(product_id, observed_at);
+CREATE INDEX IF NOT EXISTS idx_observations_time ON price_observations(observed_at);
+
+-- Agregados diários por produto (dia = dias desde 1970-01-01 em UTC)
+CREATE TABLE IF NOT EXISTS price_daily (
+    product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    day INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    min_usd REAL,
+    max_usd REAL,
+    sum_usd REAL NOT NULL,
+    count_usd INTEGER NOT NULL,
+    min_brl REAL,
+    max_brl REAL,
+    sum_brl REAL NOT NULL,
+    count_brl INTEGER NOT NULL,
+    PRIMARY KEY (product_id, day)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_price_daily_day ON price_daily(day);
+
+-- Termos acompanhados pelo agendador; as buscas dele registram as mudanças
+CREATE TABLE IF NOT EXISTS watched_terms (
+    term TEXT PRIMARY KEY,
+    interval REAL NOT NULL,
+    added_at REAL NOT NULL,
+    snapshot_scrape_id INTEGER
+);
+
+-- Produtos e preços da última atualização do agendador de cada termo (base da comparação)
+CREATE TABLE IF NOT EXISTS watch_snapshots (
+    term TEXT NOT NULL,
+    product_id INTEGER NOT NULL,
+    price_usd REAL,
+    price_brl REAL,
+    PRIMARY KEY (term, product_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS watch_changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    term TEXT NOT NULL,
+    scrape_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    change TEXT NOT NULL,
+    old_price_usd REAL,
+    old_price_brl REAL,
+    new_price_usd REAL,
+    new_price_brl REAL,
+    detected_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_watch_changes_term_time ON watch_changes(term, detected_at);
+CREATE INDEX IF NOT EXISTS idx_watch_changes_time ON watch_changes(detected_at);
+
+CREATE TABLE IF NOT EXISTS imported_files (
+    filename TEXT PRIMARY KEY,
+    imported_at REAL NOT NULL
+);
+"""
+
+
+def product_id(link):
+    """Extrai o ID numérico do produto do Link; None se o link não tiver ID"""
+    if not link or link == 'N/A':
+        return None
+    match = PRODUCT_ID_RE.search(link)
+    return int(match.group(1)) if match else None
+
+
+def _price(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _format_price(value):
+    # Mesmo formato de clean_price ('9562.6'), para reaproveitar o cálculo do preço final
+    return 'N/A' if value is None else str(float(value))
+
+
+def _day(timestamp):
+    return int(timestamp // 86400)
+
+
+def row_to_product(row):
+    """Converte uma linha de products no mesmo formato de produto do scraping"""
+    return {
+        'ID': row['id'],
+        'Nome': row['name'],
+        'Preço (US$)': _format_price(row['price_usd']),
+        'Preço (R$)': _format_price(row['price_brl']),
+        'Link': row['link'],
+        'Imagem': row['image'],
+    }
+
+
+class PriceStore:
+    """Banco SQLite (modo WAL) com produtos, buscas e observações de preço.
+
+    Cada thread usa sua própria conexão; as escritas são serializadas por
+    um lock para evitar disputas pelo lock de escrita do SQLite. Observações
+    mais antigas que ``retention_days`` são removidas por ``compact()``,
+    executado a cada ``compact_interval`` segundos numa thread própria depois
+    de ``start_compaction()`` (fora das requisições). As contagens de
+    ``stats()`` são guardadas por ``stats_ttl`` segundos.
+    """
+
+    def __init__(self, path='produtos.db', retention_days=180, compact_interval=86400, stats_ttl=300):
+        self.path = path
+        self.retention_days = retention_days
+        self.compact_interval = compact_interval
+        self.stats_ttl = stats_ttl
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._counts = None
+        self._counts_at = 0.0
+        with self._write_lock:
+            conn = self._connect()
+            self._migrate(conn)
+            conn.executescript(SCHEMA)
+
+    def _migrate(self, conn):
+        tables = {row['name'] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        backfill_daily = 'price_observations' in tables and 'price_daily' not in tables
+        for table, columns in _MIGRATIONS.items():
+            existing = {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+            if not existing:
+                continue
+            for column, column_type in columns:
+                if column not in existing:
+                    logger.info(f"🔧 Banco: adicionando coluna {table}.{column}")
+                    conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+        if backfill_daily:
+            # Banco anterior aos agregados: reconstruir a partir das observações existentes
+            conn.executescript(SCHEMA)
+            conn.execute(
+                '''INSERT INTO price_daily
+                   SELECT product_id, CAST(observed_at / 86400 AS INTEGER), COUNT(*),
+                          MIN(price_usd), MAX(price_usd), COALESCE(SUM(price_usd), 0), COUNT(price_usd),
+                          MIN(price_brl), MAX(price_brl), COALESCE(SUM(price_brl), 0), COUNT(price_brl)
+                   FROM price_observations GROUP BY 1, 2'''
+            )
+            logger.info("🔧 Banco: agregados diários reconstruídos a partir do histórico")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, func, *args):
+        conn = self._connect()
+        with self._write_lock:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = func(conn, *args)
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+        return result
+
+    def record_scrape(self, search_term, products, engine=None, scraped_at=None, watch=False):
+        """Grava o resultado de uma busca em uma única transação.
+
+        Retorna ``{'scrape_id', 'stored', 'skipped', 'price_changes', 'changes'}``;
+        produtos sem ID no link são ignorados (``skipped``). Com ``watch``
+        (atualizações do agendador, sempre com os mesmos parâmetros) a busca
+        de um termo acompanhado é comparada com a atualização anterior dele e
+        as mudanças são registradas; buscas interativas não entram na comparação.
+        """
+        scraped_at = scraped_at or time.time()
+        term = normalize_term(search_term)
+
+        rows = {}
+        skipped = 0
+        for product in products:
+            pid = product_id(product.get('Link'))
+            if pid is None:
+                skipped += 1
+                continue
+            # Produto repetido na mesma busca: vale a primeira ocorrência (ordem do site)
+            rows.setdefault(pid, (
+                pid, product.get('Nome') or 'N/A', product.get('Link'), product.get('Imagem'),
+                _price(product.get('Preço (US$)')), _price(product.get('Preço (R$)')),
+            ))
+
+        result = self._transaction(self._write_scrape, term, engine, scraped_at, list(rows.values()), watch)
+        result['skipped'] = skipped
+        logger.info(f"🗄️ Busca '{term}' gravada: {result['stored']} produtos, "
+                    f"{result['price_changes']} preços alterados, {skipped} sem ID")
+        return result
+
+    def _write_scrape(self, conn, term, engine, scraped_at, rows, watch=False):
+        # Produtos e preços da atualização anterior do agendador (só para termos acompanhados)
+        watched = watch and conn.execute(
+            'SELECT snapshot_scrape_id FROM watched_terms WHERE term = ?', (term,)
+        ).fetchone()
+        previous = None
+        if watched and watched[0] is not None:
+            previous = {row[0]: (row[1], row[2]) for row in conn.execute(
+                'SELECT product_id, price_usd, price_brl FROM watch_snapshots WHERE term = ?', (term,)
+            )}
+
+        cursor = conn.execute(
+            'INSERT INTO scrapes (term, scraped_at, engine, product_count) VALUES (?, ?, ?, ?)',
+            (term, scraped_at, engine, len(rows))
+        )
+        scrape_id = cursor.lastrowid
+
+        # Preços atuais dos produtos já conhecidos, em lotes
+        current = {}
+        ids = [row[0] for row in rows]
+        for i in range(0, len(ids), _IN_BATCH):
+            batch = ids[i:i + _IN_BATCH]
+            placeholders = ','.join('?' * len(batch))
+            for row in conn.execute(f'SELECT id, price_usd, price_brl FROM products WHERE id IN ({placeholders})', batch):
+                current[row['id']] = (row['price_usd'], row['price_brl'])
+
+        observations = [
+            (pid, scraped_at, usd, brl, scrape_id)
+            for pid, _, _, _, usd, brl in rows
+            if current.get(pid) != (usd, brl)
+        ]
+
+        changes = []
+        if previous is not None:
+            changes = self._diff_snapshot(term, scrape_id, scraped_at, rows, previous)
+        if watched:
+            conn.execute('DELETE FROM watch_snapshots WHERE term = ?', (term,))
+            conn.executemany(
+                'INSERT INTO watch_snapshots (term, product_id, price_usd, price_brl) VALUES (?, ?, ?, ?)',
+                [(term, pid, usd, brl) for pid, _, _, _, usd, brl in rows]
+            )
+            conn.execute('UPDATE watched_terms SET snapshot_scrape_id = ? WHERE term = ?', (scrape_id, term))
+
+        conn.executemany(
+            f'''INSERT INTO products (id, name, link, image, price_usd, price_brl, first_seen, last_seen)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(id) DO UPDATE SET
+                   name = excluded.name, link = excluded.link, image = excluded.image,
+                   prev_price_usd = CASE WHEN {_PRICE_CHANGED} THEN products.price_usd ELSE products.prev_price_usd END,
+                   prev_price_brl = CASE WHEN {_PRICE_CHANGED} THEN products.price_brl ELSE products.prev_price_brl END,
+                   price_changed_at = CASE WHEN {_PRICE_CHANGED} THEN excluded.last_seen ELSE products.price_changed_at END,
+                   price_usd = excluded.price_usd, price_brl = excluded.price_brl,
+                   last_seen = MAX(products.last_seen, excluded.last_seen)''',
+            [row + (scraped_at, scraped_at) for row in rows]
+        )
+        conn.executemany(
+            '''INSERT INTO price_daily (product_id, day, samples, min_usd, max_usd, sum_usd, count_usd,
+                                      min_brl, max_brl, sum_brl, count_brl)
+               VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(product_id, day) DO UPDATE SET
+                   samples = samples + 1,
+                   min_usd = COALESCE(MIN(min_usd, excluded.min_usd), min_usd, excluded.min_usd),
+                   max_usd = COALESCE(MAX(max_usd, excluded.max_usd), max_usd, excluded.max_usd),
+                   sum_usd = sum_usd + excluded.sum_usd, count_usd = count_usd + excluded.count_usd,
+                   min_brl = COALESCE(MIN(min_brl, excluded.min_brl), min_brl, excluded.min_brl),
+                   max_brl = COALESCE(MAX(max_brl, excluded.max_brl), max_brl, excluded.max_brl),
+                   sum_brl = sum_brl + excluded.sum_brl, count_brl = count_brl + excluded.count_brl''',
+            [(pid, _day(scraped_at), usd, usd, usd or 0.0, int(usd is not None),
+              brl, brl, brl or 0.0, int(brl is not None))
+             for pid, _, _, _, usd, brl in rows]
+        )
+        conn.executemany(
+            '''INSERT INTO term_products (term, product_id, last_scrape_id, last_seen) VALUES (?, ?, ?, ?)
+               ON CONFLICT(term, product_id) DO UPDATE SET
+                   last_scrape_id = excluded.last_scrape_id, last_seen = excluded.last_seen''',
+            [(term, row[0], scrape_id, scraped_at) for row in rows]
+        )
+        conn.executemany(
+            'INSERT INTO price_observations (product_id, observed_at, price_usd, price_brl, scrape_id) VALUES (?, ?, ?, ?, ?)',
+            observations
+        )
+        conn.executemany(
+            '''INSERT INTO watch_changes (term, scrape_id, product_id, change, old_price_usd, old_price_brl,
+                                        new_price_usd, new_price_brl, detected_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            changes
+        )
+        return {'scrape_id': scrape_id, 'stored': len(rows), 'price_changes': len(observations),
+                'changes': self._count_changes(changes) if previous is not None else None}
+
+    @staticmethod
+    def _diff_snapshot(term, scrape_id, scraped_at, rows, previous):
+        """Compara a busca com a atualização anterior do termo: adicionados, removidos e preços alterados.
+
+        ``previous`` tem os preços observados naquela atualização, e não os
+        preços atuais de ``products`` (que a busca de outro termo pode ter mudado).
+        """
+        changes = []
+        new_ids = set()
+        for pid, _, _, _, usd, brl in rows:
+            new_ids.add(pid)
+            if pid not in previous:
+                changes.append((term, scrape_id, pid, 'added', None, None, usd, brl, scraped_at))
+            elif previous[pid] != (usd, brl):
+                old_usd, old_brl = previous[pid]
+                changes.append((term, scrape_id, pid, 'price_changed', old_usd, old_brl, usd, brl, scraped_at))
+        for pid in previous.keys() - new_ids:
+            old_usd, old_brl = previous[pid]
+            changes.append((term, scrape_id, pid, 'removed', old_usd, old_brl, None, None, scraped_at))
+        return changes
+
+    @staticmethod
+    def _count_changes(changes):
+        counts = {'added': 0, 'removed': 0, 'price_changed': 0}
+        for change in changes:
+            counts[change[3]] += 1
+        return counts
+
+    def start_compaction(self):
+        """Executa ``compact()`` a cada ``compact_interval`` segundos numa thread em segundo plano"""
+        thread = threading.Thread(target=self._compact_loop, name='store-compact', daemon=True)
+        thread.start()
+        return thread
+
+    def _compact_loop(self):
+        while not self._stopped.wait(self.compact_interval):
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"❌ Erro ao compactar o banco: {str(e)}")
+
+    def compact(self, retention_days=None, vacuum=False):
+        """Remove dados mais antigos que a retenção.
+
+        A última observação de cada produto é mantida para que o histórico
+        continue tendo um ponto de partida. ``vacuum`` devolve o espaço ao
+        disco, mas reescreve o banco inteiro bloqueando as escritas: só a
+        linha de comando (``python store.py compact``) o usa.
+        """
+        days = self.retention_days if retention_days is None else retention_days
+        cutoff = time.time() - days * 86400
+
+        def delete_old(conn):
+            removed = {}
+            removed['observations'] = conn.execute(
+                '''DELETE FROM price_observations
+                   WHERE observed_at < ?
+                     AND observed_at < (SELECT MAX(o.observed_at) FROM price_observations o
+                                        WHERE o.product_id = price_observations.product_id)''',
+                (cutoff,)
+            ).rowcount
+            removed['watch_changes'] = conn.execute('DELETE FROM watch_changes WHERE detected_at < ?', (cutoff,)).rowcount
+            removed['daily'] = conn.execute('DELETE FROM price_daily WHERE day < ?', (_day(cutoff),)).rowcount
+            removed['scrapes'] = conn.execute('DELETE FROM scrapes WHERE scraped_at < ?', (cutoff,)).rowcount
+            removed['term_products'] = conn.execute('DELETE FROM term_products WHERE last_seen < ?', (cutoff,)).rowcount
+            # Produtos que não aparecem em nenhuma busca dentro da retenção
+            removed['products'] = conn.execute('DELETE FROM products WHERE last_seen < ?', (cutoff,)).rowcount
+            return removed
+
+        removed = self._transaction(delete_old)
+        self._counts = None
+        with self._write_lock:
+            self._connect().execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            if vacuum and (removed['observations'] or removed['products']):
+                self._connect().execute('VACUUM')
+        logger.info(f"🧹 Banco compactado (retenção de {days} dias): {removed}")
+        return removed
+
+    def last_scrapes(self, search_term, limit=2):
+        """Últimas buscas gravadas do termo, da mais recente para a mais antiga"""
+        return [dict(row) for row in self._connect().execute(
+            'SELECT id, scraped_at, engine, product_count FROM scrapes WHERE term = ? ORDER BY scraped_at DESC LIMIT ?',
+            (normalize_term(search_term), limit)
+        )]
+
+    def recent_products(self, limit=50000):
+        """Produtos vistos mais recentemente (para semear o índice de produtos)"""
+        rows = self._connect().execute('SELECT * FROM products ORDER BY last_seen DESC LIMIT ?', (limit,)).fetchall()
+        return [row_to_product(row) for row in rows]
+
+    def get_product(self, pid):
+        row = self._connect().execute('SELECT * FROM products WHERE id = ?', (pid,)).fetchone()
+        return row_to_product(row) if row else None
+
+    def price_series(self, pid, since=None, limit=1000):
+        """Observações de preço do produto (só as mudanças), em ordem cronológica"""
+        rows = self._connect().execute(
+            '''SELECT observed_at, price_usd, price_brl FROM price_observations
+               WHERE product_id = ? AND observed_at >= ? ORDER BY observed_at DESC LIMIT ?''',
+            (pid, since or 0, limit)
+        ).fetchall()
+        return [
+            {'observed_at': row['observed_at'],
+             'Preço (US$)': _format_price(row['price_usd']),
+             'Preço (R$)': _format_price(row['price_brl'])}
+            for row in reversed(rows)
+        ]
+
+    def price_stats(self, pid=None, search_term=None, days=30):
+        """Mínimo, média e máximo de um produto ou de todos os produtos de um termo.
+
+        Calculado a partir dos agregados diários dos últimos ``days`` dias.
+        Retorna ``{'samples', 'min', 'avg', 'max'}``, com preços no formato
+        de produto ('Preço (US$)' e 'Preço (R$)').
+        """
+        query = '''SELECT SUM(d.samples) AS samples,
+                          MIN(d.min_usd) AS min_usd, MAX(d.max_usd) AS max_usd,
+                          SUM(d.sum_usd) AS sum_usd, SUM(d.count_usd) AS count_usd,
+                          MIN(d.min_brl) AS min_brl, MAX(d.max_brl) AS max_brl,
+                          SUM(d.sum_brl) AS sum_brl, SUM(d.count_brl) AS count_brl
+                   FROM price_daily d'''
+        since_day = _day(time.time()) - int(days) + 1
+        if pid is not None:
+            row = self._connect().execute(query + ' WHERE d.product_id = ? AND d.day >= ?', (pid, since_day)).fetchone()
+        else:
+            row = self._connect().execute(
+                query + ' JOIN term_products tp ON tp.product_id = d.product_id WHERE tp.term = ? AND d.day >= ?',
+                (normalize_term(search_term), since_day)
+            ).fetchone()
+        return self._stats_from_row(row)
+
+    @staticmethod
+    def _stats_from_row(row):
+        def point(usd, brl):
+            return {'Preço (US$)': _format_price(usd), 'Preço (R$)': _format_price(brl)}
+
+        avg_usd = round(row['sum_usd'] / row['count_usd'], 2) if row['count_usd'] else None
+        avg_brl = round(row['sum_brl'] / row['count_brl'], 2) if row['count_brl'] else None
+        return {
+            'samples': row['samples'] or 0,
+            'min': point(row['min_usd'], row['min_brl']),
+            'avg': point(avg_usd, avg_brl),
+            'max': point(row['max_usd'], row['max_brl']),
+        }
+
+    def term_product_stats(self, search_term, days=30, limit=100):
+        """Mínimo, média e máximo de cada produto do termo nos últimos ``days`` dias"""
+        since_day = _day(time.time()) - int(days) + 1
+        rows = self._connect().execute(
+            '''SELECT p.*, SUM(d.samples) AS samples,
+                      MIN(d.min_usd) AS min_usd, MAX(d.max_usd) AS max_usd,
+                      SUM(d.sum_usd) AS sum_usd, SUM(d.count_usd) AS count_usd,
+                      MIN(d.min_brl) AS min_brl, MAX(d.max_brl) AS max_brl,
+                      SUM(d.sum_brl) AS sum_brl, SUM(d.count_brl) AS count_brl
+               FROM term_products tp
+               JOIN products p ON p.id = tp.product_id
+               JOIN price_daily d ON d.product_id = tp.product_id AND d.day >= ?
+               WHERE tp.term = ?
+               GROUP BY p.id ORDER BY min_brl IS NULL, min_brl LIMIT ?''',
+            (since_day, normalize_term(search_term), limit)
+        ).fetchall()
+        return [dict(row_to_product(row), stats=self._stats_from_row(row)) for row in rows]
+
+    def cheapest(self, search_term, limit=10):
+        """Os ``limit`` produtos mais baratos (R$) vistos na última busca do termo (todos com ``None``)"""
+        term = normalize_term(search_term)
+        rows = self._connect().execute(
+            '''SELECT p.* FROM term_products tp JOIN products p ON p.id = tp.product_id
+               WHERE tp.term = ? AND tp.last_scrape_id = (SELECT MAX(id) FROM scrapes WHERE term = ?)
+               ORDER BY p.price_brl IS NULL, p.price_brl LIMIT ?''',
+            (term, term, -1 if limit is None else limit)
+        ).fetchall()
+        return [row_to_product(row) for row in rows]
+
+    def price_drops(self, search_term):
+        """Produtos da última busca do termo cujo preço (R$) caiu desde a busca anterior"""
+        scrapes = self.last_scrapes(search_term, 2)
+        if len(scrapes) < 2:
+            return []
+        latest, previous = scrapes
+        rows = self._connect().execute(
+            '''SELECT p.* FROM term_products tp JOIN products p ON p.id = tp.product_id
+               WHERE tp.term = ? AND tp.last_scrape_id = ?
+                 AND p.price_changed_at > ? AND p.price_brl < p.prev_price_brl
+               ORDER BY p.prev_price_brl - p.price_brl DESC''',
+            (normalize_term(search_term), latest['id'], previous['scraped_at'])
+        ).fetchall()
+        return [
+            dict(row_to_product(row), **{
+                'Preço Anterior (US$)': _format_price(row['prev_price_usd']),
+                'Preço Anterior (R$)': _format_price(row['prev_price_brl']),
+                'Queda (R$)': f"{row['prev_price_brl'] - row['price_brl']:.2f}",
+            })
+            for row in rows
+        ]
+
+    def add_watch(self, search_term, interval):
+        term = normalize_term(search_term)
+        self._transaction(lambda conn: conn.execute(
+            '''INSERT INTO watched_terms (term, interval, added_at) VALUES (?, ?, ?)
+               ON CONFLICT(term) DO UPDATE SET interval = excluded.interval''',
+            (term, interval, time.time())
+        ))
+        return term
+
+    def remove_watch(self, search_term):
+        term = normalize_term(search_term)
+
+        def delete(conn):
+            conn.execute('DELETE FROM watch_snapshots WHERE term = ?', (term,))
+            return conn.execute('DELETE FROM watched_terms WHERE term = ?', (term,)).rowcount
+
+        return self._transaction(delete) > 0
+
+    def list_watches(self):
+        return [dict(row) for row in self._connect().execute('SELECT * FROM watched_terms ORDER BY term')]
+
+    def watch_changes(self, search_term=None, since=None, limit=100):
+        """Mudanças registradas nas buscas de termos acompanhados, das mais recentes para as mais antigas"""
+        query = '''SELECT c.*, p.name, p.link, p.image FROM watch_changes c
+                   LEFT JOIN products p ON p.id = c.product_id
+                   WHERE c.detected_at >= ?'''
+        args = [since or 0]
+        if search_term:
+            query += ' AND c.term = ?'
+            args.append(normalize_term(search_term))
+        query += ' ORDER BY c.detected_at DESC, c.id LIMIT ?'
+        args.append(limit)
+        return [
+            {
+                'term': row['term'],
+                'change': row['change'],
+                'detected_at': row['detected_at'],
+                'ID': row['product_id'],
+                'Nome': row['name'],
+                'Link': row['link'],
+                'Imagem': row['image'],
+                'Preço Anterior (US$)': _format_price(row['old_price_usd']),
+                'Preço Anterior (R$)': _format_price(row['old_price_brl']),
+                'Preço (US$)': _format_price(row['new_price_usd']),
+                'Preço (R$)': _format_price(row['new_price_brl']),
+            }
+            for row in self._connect().execute(query, args)
+        ]
+
+    def import_json_files(self, paths):
+        """Importa arquivos produtos_<termo>_<AAAAMMDD_HHMMSS>.json em ordem cronológica.
+
+        Arquivos já importados são ignorados. Retorna a quantidade importada.
+        """
+        dated = []
+        for path in paths:
+            match = EXPORT_FILE_RE.match(os.path.basename(path))
+            if not match:
+                logger.warning(f"⚠️ Nome de arquivo fora do padrão, ignorando: {path}")
+                continue
+            scraped_at = datetime.strptime(match.group(2), '%Y%m%d_%H%M%S').timestamp()
+            dated.append((scraped_at, match.group(1), path))
+
+        conn = self._connect()
+        imported = 0
+        for scraped_at, term, path in sorted(dated):
+            filename = os.path.basename(path)
+            if conn.execute('SELECT 1 FROM imported_files WHERE filename = ?', (filename,)).fetchone():
+                logger.info(f"⏭️ {filename} já importado")
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    products = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ Erro ao ler {filename}: {str(e)}")
+                continue
+            self.record_scrape(term, products, engine='import', scraped_at=scraped_at)
+            with self._write_lock:
+                conn.execute('INSERT INTO imported_files (filename, imported_at) VALUES (?, ?)', (filename, time.time()))
+            imported += 1
+        return imported
+
+    def stats(self):
+        # COUNT(*) varre as tabelas inteiras: recontar no máximo a cada stats_ttl segundos
+        if self._counts is None or time.time() - self._counts_at > self.stats_ttl:
+            conn = self._connect()
+            self._counts = {
+                table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                for table in ('products', 'scrapes', 'price_observations')
+            }
+            self._counts_at = time.time()
+        counts = dict(self._counts)
+        counts['bytes'] = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        counts['retention_days'] = self.retention_days
+        return counts
+
+    def close(self):
+        self._stopped.set()
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Histórico de preços em SQLite')
+    arg_parser.add_argument('--db', default=os.environ.get('STORE_PATH', 'produtos.db'), help='arquivo do banco')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    import_cmd = commands.add_parser('import', help='importa arquivos produtos_*.json')
+    import_cmd.add_argument('files', nargs='*', help='arquivos (padrão: produtos_*.json no diretório atual)')
+    compact_cmd = commands.add_parser('compact', help='aplica a retenção e compacta o banco')
+    compact_cmd.add_argument('--days', type=float, default=float(os.environ.get('STORE_RETENTION_DAYS', 180)))
+    args = arg_parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    store = PriceStore(args.db)
+    if args.command == 'import':
+        files = args.files or sorted(glob.glob('produtos_*.json'))
+        print(f"📥 {store.import_json_files(files)} arquivo(s) importado(s) para {args.db}")
+    else:
+        print(f"🧹 Removidos: {store.compact(args.days, vacuum=True)}")
+    print(f"📊 {store.stats()}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
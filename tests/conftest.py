@@ -0,0 +1,39 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# Os módulos ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def web(tmp_path_factory):
+    """Módulo ``app`` importado sem navegador, agendador nem caches em disco.
+
+    O import acontece num diretório temporário para o app.log e o banco de
+    preços não irem para o repositório.
+    """
+    directory = tmp_path_factory.mktemp('app')
+    env = {
+        'DRIVER_POOL_WARMUP': '0',
+        'WATCH_ENABLED': '0',
+        'HTTP_CACHE_MAX_MB': '0',
+        'IMAGE_CACHE_MAX_MB': '0',
+        'STORE_PATH': str(directory / 'produtos.db'),
+    }
+    previous = {key: os.environ.get(key) for key in env}
+    cwd = os.getcwd()
+    os.environ.update(env)
+    os.chdir(directory)
+    try:
+        module = importlib.import_module('app')
+    finally:
+        os.chdir(cwd)
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    return module
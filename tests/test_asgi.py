@@ -0,0 +1,75 @@
+import pytest
+
+pytest.importorskip('starlette')
+pytest.importorskip('a2wsgi')
+
+from starlette.testclient import TestClient
+
+
+PRODUCTS = [
+    {'Nome': 'Caro', 'Preço (US$)': '300.0', 'Preço (R$)': '1500.0', 'Link': 'https://site/caro_1/', 'Imagem': 'N/A'},
+    {'Nome': 'Barato', 'Preço (US$)': '100.0', 'Preço (R$)': '500.0', 'Link': 'https://site/barato_7/', 'Imagem': 'N/A'},
+]
+
+
+@pytest.fixture
+def asgi(web):
+    import asgi
+    return asgi
+
+
+@pytest.fixture
+def client(asgi):
+    with TestClient(asgi.app) as client:
+        yield client
+
+
+def test_scrape_runs_on_the_event_loop(asgi, client, web, monkeypatch):
+    calls = []
+
+    async def fake_async_scrape_search(search_term, info=None, **kwargs):
+        calls.append(search_term)
+        info['failed_pages'] = []
+        return PRODUCTS, 'http'
+
+    monkeypatch.setattr(asgi, 'async_scrape_search', fake_async_scrape_search)
+    monkeypatch.setattr(web, 'save_scrape', lambda *args, **kwargs: None)
+    body = {'search_term': 'asgi scrape', 'shipping_cost': 50}
+
+    response = client.post('/scrape', json=body)
+    assert response.status_code == 200
+    data = response.json()
+    assert data['engine'] == 'http' and data['cache'] == 'miss'
+    assert [p['Nome'] for p in data['products']] == ['Caro', 'Barato']
+    assert [p['Preço Final (R$)'] for p in data['products']] == ['1550.00', '550.00']
+
+    # Mesmo cache do modo WSGI
+    assert client.post('/scrape', json=body).json()['cache'] == 'hit'
+    assert calls == ['asgi scrape']
+
+
+def test_scrape_validates_the_body(client):
+    assert client.post('/scrape', json={'shipping_cost': 50}).status_code == 400
+    assert client.post('/scrape', content=b'{', headers={'Content-Type': 'application/json'}).status_code == 400
+
+
+def test_other_routes_are_served_by_flask(client, web):
+    response = client.get('/cache/status')
+    assert response.status_code == 200
+    assert response.json() == web.app.test_client().get('/cache/status').get_json()
+    assert client.get('/jobs/nao-existe').status_code == 404
+
+
+def test_download_file_serves_files_from_the_app_directory(client):
+    response = client.get('/download/debug_page.html')
+    assert response.status_code == 200
+    assert 'attachment' in response.headers['Content-Disposition']
+    assert 'promocao-produtos-item' in response.text
+    assert client.get('/download/nao_existe.csv').status_code == 404
+
+
+@pytest.mark.parametrize('filename', ['..%2Fapp.py', '%2E%2E%2Fapp.py', '..%5Capp.py', '%2Fetc%2Fpasswd'])
+def test_download_file_does_not_leave_the_app_directory(client, filename):
+    response = client.get(f'/download/{filename}')
+    assert response.status_code == 404
+    assert 'import' not in response.text and 'root:' not in response.text
@@ -0,0 +1,93 @@
+import csv
+import io
+import threading
+import time
+
+import pytest
+
+from batch import merge_products, products_to_csv, run_batch, unique_terms
+
+
+def offer(pid, name=None, link=None):
+    return {'Nome': name or f'Produto {pid}', 'Preço (US$)': '10.0', 'Preço (R$)': '50.0',
+            'Link': link or f'https://site/produto_{pid}/', 'Imagem': 'N/A'}
+
+
+def test_unique_terms_keeps_the_first_spelling():
+    assert unique_terms(['iPhone 15', ' ', 'iphone  15', 'Capa', '', 'CAPA ']) == ['iPhone 15', 'Capa']
+
+
+def test_a_failed_term_does_not_stop_the_others():
+    def scrape_term(term):
+        if term == 'quebrado':
+            raise RuntimeError('site fora do ar')
+        return {'products': [offer(len(term))], 'engine': 'http', 'cache': 'miss'}
+
+    progress = []
+    results = run_batch(['capa', 'quebrado', 'fone'], scrape_term, workers=2,
+                        on_result=lambda entry, state: progress.append(state))
+    # Na ordem dos termos, não na de conclusão
+    assert [entry['search_term'] for entry in results] == ['capa', 'quebrado', 'fone']
+    assert [entry['status'] for entry in results] == ['done', 'failed', 'done']
+    failed = results[1]
+    assert failed['products'] == [] and failed['count'] == 0
+    assert failed['error'] == 'site fora do ar' and failed['error_type'] == 'RuntimeError'
+    assert results[0]['count'] == 1 and results[0]['engine'] == 'http' and results[0]['failed_pages'] == []
+    assert [state['terms_done'] for state in progress] == [1, 2, 3]
+    assert progress[-1] == {'terms_total': 3, 'terms_done': 3, 'terms_failed': 1}
+
+
+def test_raising_on_result_stops_queued_terms():
+    started = []
+    release = threading.Event()
+
+    def scrape_term(term):
+        started.append(term)
+        if term != 'a':
+            release.wait(5)
+        return {'products': []}
+
+    def on_result(entry, progress):
+        raise InterruptedError('cancelado')
+
+    with pytest.raises(InterruptedError):
+        run_batch(['a', 'b', 'c', 'd', 'e'], scrape_term, workers=2, on_result=on_result)
+    release.set()
+    time.sleep(0.2)
+    # 'a' terminou e interrompeu o lote com as duas threads ocupadas: 'd' e 'e' nunca começam
+    assert 'a' in started and 'd' not in started and 'e' not in started
+
+
+def test_merge_products_lists_the_terms_of_each_product():
+    entries = [
+        {'search_term': 'iphone', 'products': [offer(1), offer(2)]},
+        {'search_term': 'quebrado', 'status': 'failed', 'products': []},
+        {'search_term': 'apple', 'products': [offer(2, name='Outro nome'), offer(3), offer(2)]},
+    ]
+    merged = merge_products(entries)
+    assert [(p['Nome'], p['Termos']) for p in merged] == [
+        ('Produto 1', ['iphone']), ('Produto 2', ['iphone', 'apple']), ('Produto 3', ['apple'])]
+    # Sem ID no link, agrupa pelo link
+    no_id = merge_products([
+        {'search_term': 'a', 'products': [offer(None, link='https://loja/x')]},
+        {'search_term': 'b', 'products': [offer(None, link='https://loja/x')]},
+    ])
+    assert len(no_id) == 1 and no_id[0]['Termos'] == ['a', 'b']
+
+
+def test_merge_products_uses_the_index_keys():
+    class Index:
+        def lookup(self, product):
+            return product['Nome'].lower()
+
+    merged = merge_products([
+        {'search_term': 'a', 'products': [offer(1, name='Capa')]},
+        {'search_term': 'b', 'products': [offer(2, name='CAPA')]},
+    ], index=Index())
+    assert len(merged) == 1 and merged[0]['Termos'] == ['a', 'b']
+
+
+def test_products_to_csv_joins_the_terms():
+    rows = list(csv.DictReader(io.StringIO(products_to_csv([dict(offer(1), Termos=['a', 'b'])]))))
+    assert rows[0]['Termos'] == 'a; b'
+    assert rows[0]['Preço Final (R$)'] == ''
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from cache import ResultCache, normalize_term
+
+
+def test_normalize_term():
+    assert normalize_term('  iPhone  17 ') == 'iphone 17'
+
+
+def test_hit_after_miss_and_ttl_expiry():
+    cache = ResultCache(ttl=0.1, stale_ttl=0)
+    assert cache.get_or_compute('k', lambda: 1) == (1, 'miss')
+    assert cache.get_or_compute('k', lambda: 2) == (1, 'hit')
+    time.sleep(0.15)
+    assert cache.get_or_compute('k', lambda: 3) == (3, 'miss')
+
+
+def test_single_flight_shares_one_computation():
+    cache = ResultCache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        assert release.wait(5)
+        return {'products': [1]}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute)))
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute)))
+                 for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(status for _, status in results) == ['coalesced', 'coalesced', 'coalesced', 'miss']
+    assert cache.stats()['coalesced'] == 3
+
+
+def test_leader_error_reaches_followers_and_is_not_cached():
+    cache = ResultCache()
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('k', lambda: (_ for _ in ()).throw(RuntimeError('site fora')))
+    assert cache.lookup('k') == (None, None)
+    assert cache.get_or_compute('k', lambda: 'ok') == ('ok', 'miss')
+
+
+def test_stale_entry_is_served_and_refreshed_in_background():
+    cache = ResultCache(ttl=0.2, stale_ttl=10)
+    cache.set('k', 'old')
+    time.sleep(0.25)
+    refreshed = threading.Event()
+
+    def refresh():
+        refreshed.set()
+        return 'new'
+
+    assert cache.get_or_compute('k', refresh) == ('old', 'stale')
+    assert refreshed.wait(5)
+    time.sleep(0.02)
+    assert cache.lookup('k') == ('new', 'hit')
+
+
+def test_lru_eviction_by_size():
+    cache = ResultCache(max_bytes=30)
+    cache.set('a', 'x' * 10)
+    cache.set('b', 'y' * 10)
+    cache.lookup('a')
+    cache.set('c', 'z' * 10)
+    assert cache.lookup('b') == (None, None)
+    assert cache.lookup('a')[1] == 'hit'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_ttl_for_shortens_partial_results():
+    cache = ResultCache(ttl=60, stale_ttl=0, ttl_for=lambda value: 0.05 if value.get('failed_pages') else None)
+    cache.set('parcial', {'failed_pages': [2]})
+    cache.set('completo', {'failed_pages': []})
+    time.sleep(0.1)
+    assert cache.lookup('parcial') == (None, None)
+    assert cache.lookup('completo')[1] == 'hit'
+
+
+def test_result_cache_key_includes_engine(web):
+    auto = web.parse_scrape_params({'search_term': 'iPhone 17'})
+    selenium = web.parse_scrape_params({'search_term': 'iphone  17', 'engine': 'selenium'})
+    assert web.result_cache_key(auto) == web.result_cache_key(dict(auto, search_term=' IPHONE 17 '))
+    assert web.result_cache_key(auto) != web.result_cache_key(selenium)
@@ -0,0 +1,93 @@
+import gzip
+import os
+import threading
+
+import pytest
+
+import capture as capture_module
+from capture import DebugCapture
+
+URL = 'https://comprasparaguai.com.br/busca/?q=Capa+iPhone&page=2'
+
+
+def random_html():
+    # Conteúdo aleatório para o gzip não encolher os arquivos a quase nada
+    return '<html>' + os.urandom(3000).hex() + '</html>'
+
+
+@pytest.fixture
+def capture(tmp_path):
+    return DebugCapture(directory=str(tmp_path / 'captures'), max_bytes=10 * 1024 * 1024)
+
+
+def test_anomalies_are_always_captured_and_the_rest_sampled(capture, monkeypatch):
+    assert capture.reason_for(products=0, errors=0) == 'empty'
+    assert capture.reason_for(products=0, errors=3) == 'empty'
+    assert capture.reason_for(products=20, errors=1) == 'errors'
+    assert capture.reason_for(products=20, errors=0) is None
+
+    capture.sample_rate = 0.1
+    monkeypatch.setattr(capture_module.random, 'random', lambda: 0.05)
+    assert capture.reason_for(products=20, errors=0) == 'sample'
+    monkeypatch.setattr(capture_module.random, 'random', lambda: 0.5)
+    assert capture.reason_for(products=20, errors=0) is None
+
+
+def test_submit_writes_the_page_gzipped(capture):
+    assert capture.submit('<html>ok</html>', URL, products=20) is None
+    name = capture.submit('<html>vazia</html>', URL, products=0)
+    capture.flush()
+    assert '_empty_capa-iphone-p2_' in name
+    with gzip.open(capture.path_for(name), 'rt', encoding='utf-8') as f:
+        assert f.read() == '<html>vazia</html>'
+    assert capture.list_captures() == [{'name': name, 'bytes': os.path.getsize(capture.path_for(name)), 'reason': 'empty'}]
+    assert capture.stats()['captured'] == 1
+
+
+def test_oldest_captures_are_rotated_by_bytes(tmp_path):
+    directory = tmp_path / 'captures'
+    probe = DebugCapture(directory=str(tmp_path / 'probe'))
+    probe.submit(random_html(), URL, products=0)
+    probe.flush()
+    size = probe.stats()['bytes']
+
+    capture = DebugCapture(directory=str(directory), max_bytes=int(size * 2.5))
+    names = []
+    for _ in range(4):
+        names.append(capture.submit(random_html(), URL, products=0))
+        capture.flush()
+    assert sorted(os.listdir(directory)) == sorted(names[2:])
+    stats = capture.stats()
+    assert stats['rotated'] == 2 and stats['files'] == 2 and stats['bytes'] <= stats['max_bytes']
+    assert capture.path_for(names[0]) is None
+
+    # Ao reiniciar, os arquivos existentes continuam contando no limite
+    restarted = DebugCapture(directory=str(directory), max_bytes=int(size * 2.5))
+    assert restarted.stats()['files'] == 2 and restarted.stats()['bytes'] == stats['bytes']
+
+
+def test_path_for_only_serves_known_captures(capture):
+    name = capture.submit('<html></html>', URL, products=0)
+    capture.flush()
+    assert capture.path_for(name) is not None
+    assert capture.path_for('../' + name) is None
+    assert capture.path_for('outro_empty_x.html.gz') is None
+
+
+def test_full_queue_drops_without_blocking(tmp_path, monkeypatch):
+    release = threading.Event()
+    write = DebugCapture._write
+
+    def blocked_write(self, name, html):
+        release.wait(5)
+        write(self, name, html)
+
+    monkeypatch.setattr(DebugCapture, '_write', blocked_write)
+    capture = DebugCapture(directory=str(tmp_path / 'captures'), max_queue=1)
+    names = [capture.submit('<html></html>', URL, products=0) for _ in range(4)]
+    # Uma gravação em andamento e uma na fila; as demais são descartadas
+    assert names.count(None) >= 2
+    assert capture.stats()['dropped'] == names.count(None)
+    release.set()
+    capture.flush()
+    assert capture.stats()['captured'] == 4 - names.count(None)
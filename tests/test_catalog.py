@@ -0,0 +1,53 @@
+from catalog import ProductIndex, compact_products, normalize_name, product_key
+
+
+def offer(name, link, price='100.0', image='https://img/x.jpg'):
+    return {'Nome': name, 'Link': link, 'Imagem': image, 'Preço (US$)': price, 'Preço (R$)': price}
+
+
+def test_normalize_name_joins_units_and_strips_accents():
+    assert normalize_name('iPhone 17 Pro Máx, 512 GB') == 'iphone 17 pro max 512gb'
+    assert normalize_name('N/A') == ''
+
+
+def test_product_key_prefers_model_id():
+    assert product_key(offer('A', 'https://site/celular-a_64042/')) == '64042'
+    assert product_key(offer('A', 'https://site/sem-id')) == 'https://site/sem-id'
+
+
+def test_fuzzy_match_requires_same_numbers():
+    index = ProductIndex(threshold=0.8)
+    key = index.resolve(offer('Apple iPhone 17 Pro Max 512GB Azul Cosmico', 'https://site/iphone_64042/'))
+    assert index.resolve(offer('Apple iPhone 17 Pro Max 512 GB Azul Cósmico Novo', 'https://loja/a')) == key
+    assert index.resolve(offer('Apple iPhone 17 Pro Max 256GB Azul Cosmico', 'https://loja/b')) == 'https://loja/b'
+
+
+def test_lookup_does_not_change_index():
+    index = ProductIndex()
+    index.resolve(offer('Galaxy S25 Ultra 512GB', 'https://site/s25_100/'))
+    before = index.stats()
+    assert index.lookup(offer('Galaxy S25 Ultra 512GB', 'https://site/s25_100/')) == '100'
+    assert index.lookup(offer('Xiaomi 15 256GB', 'https://loja/x')) == 'https://loja/x'
+    assert index.stats() == before
+    assert len(index) == 1
+
+
+def test_compact_products_keeps_link_of_each_offer():
+    index = ProductIndex(threshold=0.8)
+    canonical = offer('Apple Watch Series 11 46mm Preto', 'https://site/watch_500/', price='400.0')
+    index.resolve(canonical)
+    other = offer('Apple Watch Series 11 46 mm Preto Novo', 'https://loja/watch', price='380.0')
+    payload = compact_products([canonical, other], index)
+
+    assert list(payload['catalog']) == ['500']
+    assert [row['ID'] for row in payload['products']] == ['500', '500']
+    assert [row['Link'] for row in payload['products']] == ['https://site/watch_500/', 'https://loja/watch']
+    assert [row['Preço (US$)'] for row in payload['products']] == ['400.0', '380.0']
+    assert 'Nome' not in payload['products'][1] and 'Imagem' not in payload['products'][1]
+
+
+def test_compact_products_skips_known_ids():
+    products = [offer('A', 'https://site/a_1/'), offer('B', 'https://site/b_2/')]
+    payload = compact_products(products, known_ids=['1'])
+    assert list(payload['catalog']) == ['2']
+    assert payload['images'] == ['https://img/x.jpg']
@@ -0,0 +1,52 @@
+import csv
+import io
+import json
+
+
+PRODUCTS = [
+    {'Nome': 'Caro', 'Preço (US$)': '300.0', 'Preço (R$)': '1500.0', 'Link': 'https://site/caro', 'Imagem': 'N/A'},
+    {'Nome': 'Barato', 'Preço (US$)': '100.0', 'Preço (R$)': '500.0', 'Link': 'https://site/barato_7/', 'Imagem': 'N/A'},
+]
+
+
+def test_post_download_exports_the_products_sent(web):
+    client = web.app.test_client()
+    response = client.post('/download', json={
+        'products': PRODUCTS, 'search_term': 'Apple Watch', 'shipping_cost': 50, 'format': 'csv',
+    })
+    assert response.status_code == 200
+    assert 'produtos_apple_watch.csv' in response.headers['Content-Disposition']
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    # Mesma ordem e mesmos produtos da tela, inclusive o sem ID no link
+    assert [row['Nome'] for row in rows] == ['Caro', 'Barato']
+    assert [row['Preço Final (R$)'] for row in rows] == ['1550.00', '550.00']
+
+
+def test_post_download_json(web):
+    response = web.app.test_client().post('/download', json={'products': PRODUCTS, 'format': 'json'})
+    assert response.status_code == 200
+    assert [row['Link'] for row in json.loads(response.get_data(as_text=True))] == [p['Link'] for p in PRODUCTS]
+
+
+def test_post_download_validates_body(web):
+    client = web.app.test_client()
+    assert client.post('/download', json={'format': 'csv'}).status_code == 400
+    assert client.post('/download', json={'products': PRODUCTS, 'format': 'doc'}).status_code == 400
+
+
+def test_history_export_is_labelled(web):
+    web.price_store.record_scrape('history export', PRODUCTS)
+    response = web.app.test_client().get('/download?search_term=history%20export')
+    assert response.status_code == 200
+    assert 'historico_history_export.csv' in response.headers['Content-Disposition']
+    assert [row['Nome'] for row in csv.DictReader(io.StringIO(response.get_data(as_text=True)))] == ['Barato']
+
+
+def test_asgi_post_download(web):
+    from starlette.testclient import TestClient
+    import asgi
+
+    with TestClient(asgi.app) as client:
+        response = client.post('/download', json={'products': PRODUCTS, 'format': 'ndjson'})
+    assert response.status_code == 200
+    assert [json.loads(line)['Nome'] for line in response.text.splitlines()] == ['Caro', 'Barato']
@@ -0,0 +1,139 @@
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+from engines import iter_search, scrape_search
+from governor import HostRateLimiter
+from scraper import build_search_url
+
+
+def card(pid):
+    return (f'<div class="promocao-produtos-item"><div class="promocao-item-nome">'
+            f'<a href="/produto_{pid}/">Produto {pid}</a></div><div class="price-model">'
+            f'<span>US$ 10,00</span><div class="promocao-item-preco-text">R$ 55,00</div></div></div>')
+
+
+def page(ids, total_pages=1):
+    links = ''.join(f'<a href="?page={n}&amp;q=termo">{n}</a>' for n in range(2, total_pages + 1))
+    return f'<html><body>{"".join(card(pid) for pid in ids)}{links}</body></html>'
+
+
+class FakeEngine:
+    """Engine que responde páginas fixas pelo número da página (erro = exceção levantada)"""
+
+    def __init__(self, name, pages):
+        self.name = name
+        self.pages = pages
+        self.urls = []
+
+    def fetch(self, url):
+        self.urls.append(url)
+        number = int(parse_qs(urlparse(url).query).get('page', ['1'])[0])
+        result = self.pages[number]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def fetch_page(self, url, rate_limiter=None):
+        html = rate_limiter.call(url, self.fetch, url) if rate_limiter is not None else self.fetch(url)
+        return html, self.name
+
+
+def limiter():
+    return HostRateLimiter(min_interval=0, max_retries=0)
+
+
+def test_build_search_url_encodes_the_term():
+    url = build_search_url('capa & película #2', 3)
+    query = parse_qs(urlparse(url).query)
+    assert query == {'q': ['capa & película #2'], 'page': ['3']}
+    assert '#' not in url and ' ' not in url
+
+
+def test_failed_pages_are_reported():
+    engine = FakeEngine('http', {
+        1: page([1, 2], total_pages=3),
+        2: requests.ConnectionError('falhou'),
+        3: page([3]),
+    })
+    info = {}
+    products = list(iter_search('termo', http_engine=engine, engine='http', max_pages=3,
+                                rate_limiter=limiter(), info=info))
+    assert [p['Nome'] for p in products] == ['Produto 1', 'Produto 2', 'Produto 3']
+    assert info['failed_pages'] == [2]
+    assert info['pages_total'] == 3
+
+
+def test_complete_search_has_no_failed_pages():
+    engine = FakeEngine('http', {1: page([1], total_pages=2), 2: page([2])})
+    info = {}
+    products, used_engine = scrape_search('termo', http_engine=engine, engine='http', max_pages=2,
+                                          rate_limiter=limiter(), info=info)
+    assert len(products) == 2 and used_engine == 'http'
+    assert info['failed_pages'] == []
+
+
+def test_partial_result_is_returned_and_cached_briefly(web, monkeypatch):
+    def fake_scrape_search(search_term, info=None, on_page=None, **kwargs):
+        info['failed_pages'] = [2]
+        return [{'Nome': 'Produto 1', 'Preço (US$)': '10.0', 'Preço (R$)': '55.0',
+                 'Link': 'https://site/produto_1/', 'Imagem': 'N/A'}], 'http'
+
+    monkeypatch.setattr(web, 'scrape_search', fake_scrape_search)
+    monkeypatch.setattr(web, 'PARTIAL_RESULT_TTL', 0)
+    params = web.parse_scrape_params({'search_term': 'resultado parcial', 'max_pages': 2})
+    result = web.run_scrape(params)
+    assert result['failed_pages'] == [2] and result['cache'] == 'miss'
+    body = web.scrape_response(params, result, queue_wait=0.0, started_at=0.0)
+    assert body['failed_pages'] == [2]
+    # TTL zero: a próxima busca não recebe o resultado incompleto como hit
+    assert web.run_scrape(params)['cache'] != 'hit'
+
+
+def test_empty_http_page_escalates_to_selenium():
+    http = FakeEngine('http', {1: '<html><body>carregando...</body></html>'})
+    selenium = FakeEngine('selenium', {1: page([1, 2], total_pages=2), 2: page([3])})
+    info = {}
+    products, used_engine = scrape_search('termo', http_engine=http, selenium_engine=selenium, max_pages=2,
+                                          rate_limiter=limiter(), info=info)
+    assert used_engine == 'selenium' and info['engine'] == 'selenium'
+    assert [p['Nome'] for p in products] == ['Produto 1', 'Produto 2', 'Produto 3']
+    # As páginas seguintes usam o engine que resolveu a primeira
+    assert len(http.urls) == 1 and len(selenium.urls) == 2
+
+
+def test_http_error_escalates_to_selenium():
+    http = FakeEngine('http', {1: requests.ConnectionError('recusada')})
+    selenium = FakeEngine('selenium', {1: page([1])})
+    info = {}
+    products, used_engine = scrape_search('termo', http_engine=http, selenium_engine=selenium,
+                                          rate_limiter=limiter(), info=info)
+    assert used_engine == 'selenium' and info['engine'] == 'selenium'
+    assert [p['Nome'] for p in products] == ['Produto 1']
+
+
+def test_http_page_with_products_does_not_start_the_browser():
+    http = FakeEngine('http', {1: page([1])})
+    selenium = FakeEngine('selenium', {1: page([9])})
+    info = {}
+    products, used_engine = scrape_search('termo', http_engine=http, selenium_engine=selenium,
+                                          rate_limiter=limiter(), info=info)
+    assert used_engine == 'http' and info['engine'] == 'http'
+    assert [p['Nome'] for p in products] == ['Produto 1']
+    assert selenium.urls == []
+
+
+def test_http_engine_never_escalates():
+    selenium = FakeEngine('selenium', {1: page([1])})
+    http = FakeEngine('http', {1: '<html><body></body></html>'})
+    info = {}
+    products, used_engine = scrape_search('termo', http_engine=http, selenium_engine=selenium, engine='http',
+                                          rate_limiter=limiter(), info=info)
+    assert products == [] and used_engine == 'http' and info['engine'] == 'http'
+
+    failing = FakeEngine('http', {1: requests.ConnectionError('recusada')})
+    with pytest.raises(requests.ConnectionError):
+        scrape_search('termo', http_engine=failing, selenium_engine=selenium, engine='http',
+                      rate_limiter=limiter())
+    assert selenium.urls == []
@@ -0,0 +1,164 @@
+import asyncio
+import contextlib
+import threading
+import time
+
+import pytest
+import requests
+
+from driver_pool import DriverLaunchError
+import governor as governor_module
+from engines import SeleniumEngine, scrape_search
+from governor import CircuitOpenError, HostRateLimiter, classify_error
+
+URL = 'https://site.example.com/busca'
+
+
+def limiter(**kwargs):
+    options = dict(min_interval=0, max_retries=0, failure_threshold=2, recovery_time=0.2, backoff_base=0)
+    options.update(kwargs)
+    return HostRateLimiter(**options)
+
+
+def failing(error):
+    def func():
+        raise error
+    return func
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(response=response)
+
+
+def test_classify_error():
+    assert classify_error(http_error(429)) == 'throttled'
+    assert classify_error(http_error(503)) == 'server'
+    assert classify_error(http_error(404)) is None
+    assert classify_error(requests.ConnectionError()) == 'transient'
+    assert classify_error(DriverLaunchError('Chrome não iniciou')) is None
+
+
+def test_retries_transient_errors():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise requests.ConnectionError()
+        return 'ok'
+
+    governor = limiter(max_retries=2, failure_threshold=5)
+    assert governor.call(URL, flaky) == 'ok'
+    assert len(calls) == 3
+    assert governor.host_status()['site.example.com']['retries'] == 2
+
+
+def test_circuit_opens_rejects_and_recovers():
+    governor = limiter()
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            governor.call(URL, failing(requests.ConnectionError()))
+    assert governor.host_status()['site.example.com']['circuit'] == 'open'
+
+    with pytest.raises(CircuitOpenError):
+        governor.call(URL, lambda: 'não chamado')
+
+    time.sleep(0.25)
+    # Depois do recovery_time uma chamada de teste fecha o circuito
+    assert governor.call(URL, lambda: 'ok') == 'ok'
+    assert governor.host_status()['site.example.com']['circuit'] == 'closed'
+
+
+def test_failed_probe_reopens_circuit():
+    governor = limiter()
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            governor.call(URL, failing(requests.ConnectionError()))
+    time.sleep(0.25)
+    with pytest.raises(requests.ConnectionError):
+        governor.call(URL, failing(requests.ConnectionError()))
+    assert governor.host_status()['site.example.com']['circuit'] == 'open'
+
+
+def test_local_launch_errors_do_not_open_circuit():
+    governor = limiter(max_retries=2)
+    for _ in range(5):
+        with pytest.raises(DriverLaunchError):
+            governor.call(URL, failing(DriverLaunchError('Não foi possível iniciar um driver para o pool')))
+    status = governor.host_status()['site.example.com']
+    assert status['circuit'] == 'closed'
+    assert status['failures'] == 0 and status['retries'] == 0
+
+
+def test_async_calls_work_across_event_loops():
+    governor = limiter(max_concurrency=1)
+
+    async def fetch():
+        return 'ok'
+
+    async def run():
+        return await asyncio.gather(*(governor.acall(URL, fetch) for _ in range(3)))
+
+    # Um semáforo criado no primeiro loop não pode ser reutilizado no segundo
+    assert asyncio.run(run()) == ['ok'] * 3
+    assert asyncio.run(run()) == ['ok'] * 3
+
+
+class FakeDriver:
+    """Driver sem JavaScript (como o MockDriver): só carrega o HTML"""
+
+    session = None
+
+    def get(self, url):
+        self.page_source = '<html></html>'
+
+
+class SlowPool:
+    """Pool com um navegador que só fica livre quando ``released`` é sinalizado"""
+
+    def __init__(self):
+        self.released = threading.Event()
+        self.waiting = threading.Event()
+
+    @contextlib.contextmanager
+    def lease(self):
+        self.waiting.set()
+        assert self.released.wait(5)
+        yield FakeDriver()
+
+
+def test_waiting_for_a_browser_does_not_hold_the_host_slot():
+    governor = limiter(max_concurrency=1)
+    pool = SlowPool()
+    engine = SeleniumEngine(pool)
+    thread = threading.Thread(target=engine.fetch_page, args=(URL, governor))
+    thread.start()
+    try:
+        assert pool.waiting.wait(5)
+        # Com o navegador ainda ocupado, uma requisição HTTP ao mesmo host segue normalmente
+        started = time.time()
+        assert governor.call(URL, lambda: 'ok') == 'ok'
+        assert time.time() - started < 1
+        # A espera pelo navegador não conta como requisição ao site
+        assert governor.host_status()['site.example.com']['requests'] == 1
+    finally:
+        pool.released.set()
+        thread.join(5)
+    assert governor.host_status()['site.example.com']['requests'] == 2
+
+
+def test_calls_without_a_limiter_share_the_default(monkeypatch):
+    shared = limiter()
+    monkeypatch.setattr(governor_module, '_default_limiter', shared)
+
+    class Engine:
+        name = 'http'
+
+        def fetch(self, url):
+            return '<html></html>'
+
+    for _ in range(2):
+        scrape_search('termo', http_engine=Engine(), engine='http')
+    assert shared.host_status()['comprasparaguai.com.br']['requests'] == 2
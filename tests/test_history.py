@@ -0,0 +1,79 @@
+import time
+
+
+def offer(pid, brl, name=None):
+    return {
+        'Nome': name or f'Produto {pid}',
+        'Link': f'https://site/produto_{pid}/',
+        'Imagem': 'N/A',
+        'Preço (US$)': str(brl / 5),
+        'Preço (R$)': str(brl),
+    }
+
+
+def record_history(web, term, scrapes):
+    now = time.time()
+    for i, products in enumerate(scrapes):
+        web.price_store.record_scrape(term, products, scraped_at=now - (len(scrapes) - i) * 60)
+
+
+def test_product_history_series_and_stats(web):
+    record_history(web, 'historico produto', [[offer(91001, 500)], [offer(91001, 400)], [offer(91001, 450)]])
+    response = web.app.test_client().get('/history/products/91001?shipping_cost=50')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['product']['Preço Final (R$)'] == '500.00'
+    assert [point['Preço Final (R$)'] for point in data['series']] == ['550.00', '450.00', '500.00']
+    stats = data['stats']
+    assert stats['samples'] == 3
+    assert [stats[key]['Preço Final (R$)'] for key in ('min', 'avg', 'max')] == ['450.00', '500.00', '550.00']
+    assert data['days'] == 30 and data['shipping_cost'] == 50.0
+
+
+def test_product_history_errors(web):
+    client = web.app.test_client()
+    assert client.get('/history/products/99999999').status_code == 404
+    assert client.get('/history/products/91001?days=0').status_code == 400
+    assert client.get('/history/products/91001?shipping_cost=abc').status_code == 400
+
+
+def test_term_stats(web):
+    record_history(web, 'Historico Termo', [[offer(91011, 100), offer(91012, 300)], [offer(91011, 200), offer(91012, 300)]])
+    data = web.app.test_client().get('/history/terms/historico%20termo/stats?shipping_cost=10').get_json()
+    assert data['search_term'] == 'historico termo'
+    assert data['stats']['min']['Preço Final (R$)'] == '110.00'
+    assert data['stats']['max']['Preço Final (R$)'] == '310.00'
+    by_id = {product['Link']: product for product in data['products']}
+    cheap = by_id['https://site/produto_91011/']
+    assert cheap['Preço Final (R$)'] == '210.00'
+    assert cheap['stats']['min']['Preço Final (R$)'] == '110.00'
+    assert cheap['stats']['max']['Preço Final (R$)'] == '210.00'
+
+
+def test_cheapest_uses_the_last_scrape(web):
+    record_history(web, 'historico barato', [
+        [offer(91021, 100), offer(91022, 900)],
+        [offer(91022, 300), offer(91023, 200), offer(91024, 800)],
+    ])
+    client = web.app.test_client()
+    data = client.get('/history/terms/historico%20barato/cheapest?n=2&shipping_cost=5').get_json()
+    # O produto que sumiu da última busca não entra, mesmo sendo o mais barato
+    assert [p['Nome'] for p in data['products']] == ['Produto 91023', 'Produto 91022']
+    assert [p['Preço Final (R$)'] for p in data['products']] == ['205.00', '305.00']
+    assert data['count'] == 2 and data['scraped_at'] is not None
+    assert client.get('/history/terms/historico%20barato/cheapest?n=0').status_code == 400
+    empty = client.get('/history/terms/nunca%20buscado/cheapest').get_json()
+    assert empty['products'] == [] and empty['scraped_at'] is None
+
+
+def test_drops_compare_the_last_two_scrapes(web):
+    record_history(web, 'historico queda', [
+        [offer(91031, 500), offer(91032, 500), offer(91033, 500)],
+        [offer(91031, 400), offer(91032, 600), offer(91033, 100)],
+    ])
+    data = web.app.test_client().get('/history/terms/historico%20queda/drops').get_json()
+    # Da maior queda para a menor
+    assert [p['Nome'] for p in data['products']] == ['Produto 91033', 'Produto 91031']
+    assert data['previous_scraped_at'] < data['scraped_at']
+    single = web.app.test_client().get('/history/terms/historico%20barato%20unico/drops').get_json()
+    assert single['products'] == [] and single['previous_scraped_at'] is None
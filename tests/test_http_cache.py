@@ -0,0 +1,133 @@
+import gzip
+import os
+import threading
+
+import pytest
+
+from engines import HttpEngine
+from http_cache import DiskResponseCache
+
+URL = 'https://comprasparaguai.com.br/busca/?q=iphone'
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DiskResponseCache(directory=str(tmp_path / 'http_cache'), ttl=60)
+
+
+def body_files(cache):
+    directory = os.path.join(cache.directory, 'bodies')
+    return [os.path.join(directory, name) for name in os.listdir(directory)]
+
+
+class FakeResponse:
+    def __init__(self, status_code, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.encoding = 'utf-8'
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise AssertionError(f'status {self.status_code}')
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, timeout=None, headers=None):
+        self.requests.append(headers or {})
+        return self.responses.pop(0)
+
+
+def engine_with(cache, responses):
+    engine = HttpEngine(cache=cache)
+    engine.session = FakeSession(responses)
+    return engine
+
+
+def test_body_is_stored_gzipped_and_shared_between_urls(cache):
+    html = '<html>' + 'produto ' * 1000 + '</html>'
+    cache.store(URL, html)
+    cache.store(URL + '&page=2', html)
+    files = body_files(cache)
+    assert len(files) == 1
+    with open(files[0], 'rb') as f:
+        data = f.read()
+    assert gzip.decompress(data).decode('utf-8') == html
+    assert len(data) < len(html)
+    meta, fresh = cache.lookup(URL)
+    assert fresh and cache.read_body(meta) == html
+    assert cache.stats()['bytes'] == len(data)
+
+
+def test_fresh_response_is_served_without_a_request(cache):
+    engine = engine_with(cache, [FakeResponse(200, '<html>1</html>')])
+    assert engine.fetch(URL) == '<html>1</html>'
+    assert engine.fetch(URL) == '<html>1</html>'
+    assert len(engine.session.requests) == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_stale_response_is_revalidated_and_304_reuses_the_body(tmp_path):
+    cache = DiskResponseCache(directory=str(tmp_path / 'http_cache'), ttl=0)
+    engine = engine_with(cache, [
+        FakeResponse(200, '<html>1</html>', {'ETag': '"v1"', 'Last-Modified': 'Wed, 01 Oct 2025 10:00:00 GMT'}),
+        FakeResponse(304),
+        FakeResponse(200, '<html>2</html>', {'ETag': '"v2"'}),
+    ])
+    assert engine.fetch(URL) == '<html>1</html>'
+    assert engine.fetch(URL) == '<html>1</html>'
+    assert engine.session.requests[1] == {
+        'If-None-Match': '"v1"', 'If-Modified-Since': 'Wed, 01 Oct 2025 10:00:00 GMT',
+    }
+    assert cache.stats()['revalidated'] == 1
+    # Conteúdo novo substitui o corpo antigo
+    assert engine.fetch(URL) == '<html>2</html>'
+    assert engine.session.requests[2] == {'If-None-Match': '"v1"', 'If-Modified-Since': 'Wed, 01 Oct 2025 10:00:00 GMT'}
+    assert len(body_files(cache)) == 1
+    meta, _ = cache.lookup(URL)
+    assert meta['etag'] == '"v2"'
+
+
+def test_least_recently_used_urls_are_evicted_by_bytes(tmp_path):
+    pages = [os.urandom(2000).hex() for _ in range(3)]
+    probe = DiskResponseCache(directory=str(tmp_path / 'probe'))
+    probe.store(URL, pages[0])
+    size = probe.stats()['bytes']
+
+    cache = DiskResponseCache(directory=str(tmp_path / 'http_cache'), max_bytes=int(size * 2.5))
+    cache.store(URL + '1', pages[0])
+    cache.store(URL + '2', pages[1])
+    cache.lookup(URL + '1')
+    cache.store(URL + '3', pages[2])
+    assert cache.lookup(URL + '2') == (None, False)
+    assert cache.lookup(URL + '1')[0] is not None and cache.lookup(URL + '3')[0] is not None
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['bytes'] <= stats['max_bytes']
+    assert len(body_files(cache)) == 2
+
+
+def test_concurrent_stores_of_a_new_body_count_its_size_once(cache, monkeypatch):
+    html = '<html>' + 'igual ' * 500 + '</html>'
+    both_checked = threading.Barrier(2)
+    write = cache._write_atomic
+
+    def slow_write(path, data):
+        # As duas gravações passam pela conferência do corpo antes de qualquer uma terminar
+        if os.sep + 'bodies' + os.sep in path:
+            both_checked.wait(5)
+        write(path, data)
+
+    monkeypatch.setattr(cache, '_write_atomic', slow_write)
+    threads = [threading.Thread(target=cache.store, args=(URL + str(i), html)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    files = body_files(cache)
+    assert len(files) == 1
+    assert cache.stats()['bytes'] == os.path.getsize(files[0])
+    assert cache.stats()['entries'] == 2
@@ -0,0 +1,88 @@
+import io
+import os
+
+import pytest
+import requests
+from PIL import Image
+
+from images import ImageProxy
+
+
+def png(color, size=(40, 40)):
+    output = io.BytesIO()
+    Image.new('RGB', size, color).save(output, 'PNG')
+    return output.getvalue()
+
+
+def response(status=200, body=b'', headers=None):
+    result = requests.Response()
+    result.status_code = status
+    result.headers.update(headers or {})
+    result.raw = io.BytesIO(body)
+    return result
+
+
+class FakeSession:
+    def __init__(self, routes):
+        self.routes = routes
+        self.requested = []
+        self.headers = {}
+
+    def get(self, url, **kwargs):
+        assert kwargs.get('allow_redirects') is False
+        self.requested.append(url)
+        return self.routes[url]()
+
+
+@pytest.fixture
+def proxy(tmp_path):
+    def make(routes, **kwargs):
+        proxy = ImageProxy(directory=str(tmp_path), sizes=(20,), allowed_hosts=['img.example.com'], **kwargs)
+        proxy.session = FakeSession(routes)
+        return proxy
+    return make
+
+
+def test_redirect_to_other_host_is_refused(proxy):
+    image_proxy = proxy({
+        'https://img.example.com/a.png': lambda: response(302, headers={'Location': 'http://169.254.169.254/latest'}),
+    })
+    with pytest.raises(ValueError, match='não permitida'):
+        image_proxy.get('https://img.example.com/a.png')
+    assert image_proxy.session.requested == ['https://img.example.com/a.png']
+
+
+def test_redirect_within_allowed_hosts_is_followed(proxy):
+    image_proxy = proxy({
+        'https://img.example.com/a.png': lambda: response(301, headers={'Location': '/b.png'}),
+        'https://img.example.com/b.png': lambda: response(body=png('red'), headers={'Content-Type': 'image/png'}),
+    })
+    path, mimetype, _ = image_proxy.get('https://img.example.com/a.png', 20)
+    assert mimetype == 'image/webp' and os.path.exists(path)
+
+
+def test_oversized_source_is_refused_before_decoding(proxy):
+    image_proxy = proxy({
+        'https://img.example.com/big.png': lambda: response(body=b'x', headers={'Content-Length': str(10 ** 9)}),
+    }, max_source_bytes=1024)
+    with pytest.raises(ValueError, match='maior que'):
+        image_proxy.get('https://img.example.com/big.png')
+
+
+def test_eviction_removes_url_metadata(proxy, tmp_path):
+    routes = {
+        f'https://img.example.com/{color}.png': (lambda color=color: response(body=png(color)))
+        for color in ('red', 'blue')
+    }
+    image_proxy = proxy(routes)
+    image_proxy.get('https://img.example.com/red.png', 20)
+    # Cabe só uma miniatura: a segunda imagem tira a primeira do cache
+    image_proxy.max_bytes = image_proxy.stats()['bytes']
+    image_proxy.get('https://img.example.com/blue.png', 20)
+
+    stats = image_proxy.stats()
+    assert stats['files'] == 1 and stats['urls'] == 1 and stats['evictions'] == 1
+    assert len(os.listdir(tmp_path / 'urls')) == 1
+    # Reabrir o cache do disco encontra só a imagem que ficou
+    reopened = ImageProxy(directory=str(tmp_path), sizes=(20,), allowed_hosts=['img.example.com'])
+    assert reopened.stats()['urls'] == 1
@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+
+from jobs import Job, JobCancelled, JobManager, JobQueueFull
+
+
+def wait_status(job, status, timeout=5):
+    deadline = time.time() + timeout
+    while job.status != status and time.time() < deadline:
+        time.sleep(0.01)
+    return job.status
+
+
+def test_job_runs_and_returns_result():
+    manager = JobManager(workers=1)
+    manager.start()
+    job = manager.submit(lambda job: {'products': [1, 2]}, {})
+    assert job.wait(5)
+    assert job.status == Job.DONE
+    assert job.result == {'products': [1, 2]}
+
+
+def test_failed_job_records_error_type():
+    def fail(job):
+        raise ValueError('boom')
+
+    manager = JobManager(workers=1)
+    manager.start()
+    job = manager.submit(fail, {})
+    assert job.wait(5)
+    assert job.status == Job.FAILED
+    assert job.error == 'boom'
+    assert job.error_type == 'ValueError'
+
+
+def test_queue_full_raises():
+    manager = JobManager(workers=1, max_queue=1)
+    manager.submit(lambda job: None, {})
+    with pytest.raises(JobQueueFull):
+        manager.submit(lambda job: None, {})
+    assert manager.stats()['queued'] == 1
+
+
+def test_cancel_queued_job_is_skipped():
+    manager = JobManager(workers=1)
+    ran = []
+    job = manager.submit(lambda job: ran.append(True), {})
+    manager.cancel(job.id)
+    manager.start()
+    assert job.wait(5)
+    assert job.status == Job.CANCELLED
+    manager._queue.join()
+    assert ran == []
+
+
+def test_add_partial_after_cancel_does_not_raise():
+    job = Job(lambda job: None, {})
+    job.status = Job.RUNNING
+    job.add_partial([1], pages_done=1)
+    job.cancel_event.set()
+    job.add_partial([2], pages_done=2)
+    assert job.partial == [1]
+    assert job.progress == {'pages_done': 1}
+    with pytest.raises(JobCancelled):
+        job.raise_if_cancelled()
+
+
+def test_cancelling_one_job_keeps_coalesced_job_running(web, monkeypatch):
+    """Dois jobs do mesmo termo compartilham o cálculo do cache; cancelar o
+    primeiro (o líder) não pode cancelar nem derrubar o segundo."""
+    release = threading.Event()
+    first_page = threading.Event()
+
+    def fake_scrape_search(search_term, on_page=None, **kwargs):
+        on_page(1, 2, [{'Nome': 'A', 'Link': 'https://x/a-1', 'Preço (US$)': '$ 1'}])
+        first_page.set()
+        assert release.wait(5)
+        # Página depois do cancelamento: o líder não pode levantar aqui
+        on_page(2, 2, [{'Nome': 'B', 'Link': 'https://x/b-2', 'Preço (US$)': '$ 2'}])
+        return [{'Nome': 'A'}, {'Nome': 'B'}], 'http'
+
+    monkeypatch.setattr(web, 'scrape_search', fake_scrape_search)
+    monkeypatch.setattr(web, 'save_scrape', lambda *args, **kwargs: None)
+    params = web.parse_scrape_params({'search_term': 'cancel coalesced'})
+    web.result_cache.invalidate()
+
+    manager = JobManager(workers=2)
+    manager.start()
+    leader = manager.submit(web.scrape_job, params)
+    assert first_page.wait(5)
+    follower = manager.submit(web.scrape_job, params)
+    assert wait_status(follower, Job.RUNNING) == Job.RUNNING
+    time.sleep(0.05)  # o segundo job entra no cálculo em andamento
+    manager.cancel(leader.id)
+    release.set()
+
+    assert leader.wait(5) and follower.wait(5)
+    assert leader.status == Job.CANCELLED
+    assert follower.status == Job.DONE
+    assert follower.result['cache'] == 'coalesced'
+    assert len(follower.result['products']) == 2
+    # O resultado do cálculo compartilhado fica no cache para as próximas buscas
+    cached, status = web.result_cache.lookup(web.result_cache_key(params))
+    assert status == 'hit' and len(cached['products']) == 2
@@ -0,0 +1,78 @@
+import pytest
+
+from logtail import read_since, read_tail
+
+
+def log_line(n, level='INFO'):
+    return f'2025-10-01 10:00:{n:02d},000 - {level} - mensagem {n}\n'
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    path = tmp_path / 'app.log'
+    path.write_text(''.join(log_line(n, 'ERROR' if n % 5 == 0 else 'INFO') for n in range(1, 31)))
+    return path
+
+
+def test_tail_pages_backward_with_the_cursor(log_path):
+    # Blocos pequenos para as linhas cruzarem a fronteira entre leituras
+    first = read_tail(str(log_path), limit=10, chunk_size=17)
+    assert first['lines'] == [log_line(n, 'ERROR' if n % 5 == 0 else 'INFO') for n in range(21, 31)]
+    assert first['has_more'] and first['next'] == log_path.stat().st_size
+
+    seen = list(first['lines'])
+    cursor = first['cursor']
+    while cursor:
+        page = read_tail(str(log_path), limit=10, before=cursor, chunk_size=17)
+        seen[:0] = page['lines']
+        cursor = page['cursor']
+    assert ''.join(seen) == log_path.read_text()
+    assert not page['has_more']
+
+
+def test_tail_filters_by_level_and_keyword(log_path):
+    errors = read_tail(str(log_path), limit=100, level='error')
+    assert [line.split()[-1] for line in errors['lines']] == ['5', '10', '15', '20', '25', '30']
+    assert read_tail(str(log_path), keyword='MENSAGEM 7')['lines'] == [log_line(7)]
+    with pytest.raises(ValueError):
+        read_tail(str(log_path), level='verbose')
+
+
+def test_tail_leaves_the_line_being_written_for_follow(log_path):
+    size = log_path.stat().st_size
+    with open(log_path, 'a') as f:
+        f.write('2025-10-01 10:01:00,000 - INFO - escrevendo')
+    tail = read_tail(str(log_path), limit=1)
+    assert tail['lines'] == [log_line(30, 'ERROR')] and tail['next'] == size
+
+    with open(log_path, 'a') as f:
+        f.write(' agora\n')
+    follow = read_since(str(log_path), tail['next'])
+    assert follow['lines'] == ['2025-10-01 10:01:00,000 - INFO - escrevendo agora\n']
+    assert follow['next'] == log_path.stat().st_size and not follow['reset']
+
+
+def test_since_continues_from_the_cursor(log_path):
+    start = log_path.stat().st_size
+    assert read_since(str(log_path), start) == {'lines': [], 'next': start, 'reset': False, 'file_size': start}
+    with open(log_path, 'a') as f:
+        f.write(log_line(31) + log_line(32, 'WARNING') + log_line(33))
+    result = read_since(str(log_path), start, level='warning')
+    assert result['lines'] == [log_line(32, 'WARNING')]
+    # O cursor avança sobre as linhas filtradas também
+    assert result['next'] == log_path.stat().st_size
+    limited = read_since(str(log_path), start, limit=1)
+    assert limited['lines'] == [log_line(31)] and limited['next'] == start + len(log_line(31))
+
+
+def test_since_restarts_after_rotation(log_path):
+    offset = log_path.stat().st_size
+    log_path.write_text(log_line(1) + log_line(2))
+    result = read_since(str(log_path), offset)
+    assert result['reset']
+    assert result['lines'] == [log_line(1), log_line(2)]
+    assert result['next'] == log_path.stat().st_size
+
+    log_path.unlink()
+    assert read_since(str(log_path), result['next'])['reset']
+    assert read_tail(str(log_path))['lines'] == []
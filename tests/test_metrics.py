@@ -0,0 +1,93 @@
+import threading
+from urllib.parse import parse_qs, urlparse
+
+import metrics
+from engines import scrape_search
+from governor import HostRateLimiter
+from metrics import MetricsRegistry
+
+
+def page(pid, total_pages):
+    links = ''.join(f'<a href="?page={n}&amp;q=termo">{n}</a>' for n in range(2, total_pages + 1))
+    return (f'<html><body><div class="promocao-produtos-item"><div class="promocao-item-nome">'
+            f'<a href="/produto_{pid}/">Produto {pid}</a></div><div class="price-model"><span>US$ 10,00</span>'
+            f'<div class="promocao-item-preco-text">R$ 55,00</div></div></div>{links}</body></html>')
+
+
+class TimedEngine:
+    """Engine falso que mede cada página com ``metrics.span`` e anota a thread usada"""
+
+    name = 'http'
+
+    def __init__(self, total_pages):
+        self.total_pages = total_pages
+        self.threads = []
+
+    def fetch(self, url):
+        with metrics.span('page_load', engine=self.name):
+            self.threads.append(threading.current_thread().name)
+            number = int(parse_qs(urlparse(url).query).get('page', ['1'])[0])
+            return page(number, self.total_pages)
+
+    def fetch_page(self, url, rate_limiter=None):
+        return rate_limiter.call(url, self.fetch, url), self.name
+
+
+def test_render_counters_histograms_and_gauges():
+    registry = MetricsRegistry()
+    requests_total = registry.counter('requests_total', 'Requisições')
+    requests_total.inc(endpoint='scrape', status=200)
+    requests_total.inc(2, endpoint='scrape', status=200)
+    requests_total.inc(endpoint='say "oi"\n')
+    seconds = registry.histogram('phase_seconds', 'Fases', buckets=(0.1, 1))
+    seconds.observe(0.05, phase='parse')
+    seconds.observe(0.5, phase='parse')
+    registry.register_gauges('pool', 'Pool', lambda: {'size': 2, 'warm': True, 'name': 'ignorado'})
+    registry.register_gauges('quebrado', 'Falha', lambda: 1 / 0)
+
+    lines = registry.render().splitlines()
+    assert '# TYPE requests_total counter' in lines
+    assert 'requests_total{endpoint="scrape",status="200"} 3' in lines
+    assert 'requests_total{endpoint="say \\"oi\\"\\n"} 1' in lines
+    assert '# TYPE phase_seconds histogram' in lines
+    assert 'phase_seconds_bucket{phase="parse",le="0.1"} 1' in lines
+    assert 'phase_seconds_bucket{phase="parse",le="1"} 2' in lines
+    assert 'phase_seconds_bucket{phase="parse",le="+Inf"} 2' in lines
+    assert 'phase_seconds_count{phase="parse"} 2' in lines
+    assert 'pool_size 2' in lines and 'pool_warm 1' in lines
+    # Valores não numéricos e coletores com erro ficam de fora
+    assert not any(line.startswith(('pool_name', 'quebrado')) for line in lines)
+
+
+def test_metrics_endpoint(web):
+    client = web.app.test_client()
+    client.get('/jobs/status')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert 'scraper_http_requests_total{endpoint="jobs_status",status="200"}' in text
+    # O próprio /metrics não é contado
+    assert 'endpoint="metrics_endpoint"' not in text
+    assert '# TYPE scraper_result_cache_entries gauge' in text
+
+
+def test_spans_in_page_threads_count_in_the_request():
+    engine = TimedEngine(total_pages=3)
+    limiter = HostRateLimiter(min_interval=0, max_retries=0)
+    with metrics.collect() as timings:
+        products, _ = scrape_search('termo', http_engine=engine, engine='http', max_pages=3, rate_limiter=limiter)
+    assert len(products) == 3
+    # Páginas 2..N rodam nas threads do executor e mesmo assim entram nos tempos da requisição
+    assert any(name.startswith('page-fetch') for name in engine.threads)
+    page_loads = [span for span in timings.spans if span[0] == 'page_load']
+    assert len(page_loads) == 3
+    assert 'page_load' in timings.summary()
+
+
+def test_spans_outside_a_request_only_feed_the_histogram():
+    with metrics.collect() as timings:
+        pass
+    with metrics.span('isolado'):
+        pass
+    assert timings.spans == []
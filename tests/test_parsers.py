@@ -0,0 +1,91 @@
+import json
+import os
+
+import pytest
+
+from parsers import LxmlParser, SoupParser, clean_price, etree
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+BASE_URL = 'https://comprasparaguai.com.br'
+
+# Extraídos pelo scrape_products original (BeautifulSoup, antes dos backends)
+with open(os.path.join(DATA_DIR, 'debug_page_products.json'), encoding='utf-8') as f:
+    DEBUG_PAGE_PRODUCTS = json.load(f)
+
+# Cards com preço só na oferta, preços sem decimais, sem preço, sem link,
+# sem nome, sem imagem e imagens relativas ou sem protocolo
+EDGE_CASES_HTML = """<html><body>
+<div class="promocao-produtos-item col-sm-12">
+  <div class="promocao-item-img"><a href="/capa_11/"><img data-src="//cdn.site/capa.webp" src="/static/loading.svg"></a></div>
+  <div class="promocao-item-nome"><a href="/capa-silicone_11/"> Capa de Silicone </a></div>
+  <div class="promocao-item-preco-oferta"><strong>US$ 9700</strong><div class="promocao-item-preco-text">R$ 1.165,00</div></div>
+</div>
+<div class="promocao-produtos-item col-sm-12">
+  <div class="promocao-item-img"><img src="/fotos/pelicula.jpg"></div>
+  <div class="promocao-item-nome"><a>Película sem link</a></div>
+  <div class="price-model"><span>Consulte</span></div>
+</div>
+<div class="promocao-produtos-item">
+  <div class="promocao-item-img"><img alt="sem imagem"></div>
+  <div class="price-model"><span>US$&nbsp;1.234,5</span><div class="promocao-item-preco-text">R$&nbsp;97,00</div></div>
+</div>
+<div class="promocao-produtos-item destaque">
+  <div class="promocao-item-nome"><a href="https://outro.site/fone_12/">Fone</a></div>
+  <div class="price-model"><span>US$ 12,00</span></div>
+</div>
+</body></html>"""
+EDGE_CASES_PRODUCTS = [
+    {'Nome': 'Capa de Silicone', 'Preço (US$)': '97.0', 'Preço (R$)': '1165.0',
+     'Link': 'https://comprasparaguai.com.br/capa-silicone_11/', 'Imagem': 'https://cdn.site/capa.webp'},
+    # O original concatena o 'N/A' do link ausente ao endereço do site
+    {'Nome': 'Película sem link', 'Preço (US$)': 'N/A', 'Preço (R$)': 'N/A',
+     'Link': 'https://comprasparaguai.com.brN/A',
+     'Imagem': 'https://media-production-bucket.us-southeast-1.linodeobjects.com/fotos/pelicula.jpg'},
+    {'Nome': 'N/A', 'Preço (US$)': '1234.5', 'Preço (R$)': '97.0',
+     'Link': 'https://comprasparaguai.com.brN/A', 'Imagem': 'N/A'},
+    {'Nome': 'Fone', 'Preço (US$)': '12.0', 'Preço (R$)': 'N/A',
+     'Link': 'https://outro.site/fone_12/', 'Imagem': 'N/A'},
+]
+
+BACKENDS = [
+    SoupParser,
+    pytest.param(LxmlParser, marks=pytest.mark.skipif(etree is None, reason='lxml não instalado')),
+]
+
+
+def load_fixture(name):
+    with open(os.path.join(ROOT_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def parse(parser_class, html):
+    parser = parser_class()
+    return [parser.extract(card, BASE_URL) for card in parser.find_cards(html)]
+
+
+@pytest.mark.parametrize('parser_class', BACKENDS)
+def test_debug_page_matches_original_extraction(parser_class):
+    assert parse(parser_class, load_fixture('debug_page.html')) == DEBUG_PAGE_PRODUCTS
+
+
+@pytest.mark.parametrize('parser_class', BACKENDS)
+def test_page_without_product_cards(parser_class):
+    assert parse(parser_class, load_fixture('compras_paraguai_structure.html')) == []
+
+
+@pytest.mark.parametrize('parser_class', BACKENDS)
+def test_edge_cases_match_original_extraction(parser_class):
+    assert parse(parser_class, EDGE_CASES_HTML) == EDGE_CASES_PRODUCTS
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ('1.745,00', '1745.0'),
+    ('9.562,60', '9562.6'),
+    ('9700', '97.0'),
+    ('97', '97.0'),
+    ('', 'N/A'),
+    ('1,2,3', 'N/A'),
+])
+def test_clean_price(raw, expected):
+    assert clean_price(raw) == expected
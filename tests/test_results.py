@@ -0,0 +1,77 @@
+import io
+import math
+
+import pytest
+
+from pricing import apply_shipping
+from results import ProductTable, export, np, pa, pq
+
+PRODUCTS = [
+    {'Nome': 'iPhone', 'Preço (US$)': '1000.0', 'Preço (R$)': '5400.0', 'Link': 'https://site/iphone_1/', 'Imagem': 'N/A'},
+    {'Nome': 'Sem preço', 'Preço (US$)': 'N/A', 'Preço (R$)': 'N/A', 'Link': 'https://site/sem_2/', 'Imagem': 'N/A'},
+    {'Nome': 'Capa', 'Preço (US$)': '9.7', 'Preço (R$)': '52.38', 'Link': 'https://site/capa_3/', 'Imagem': 'https://img/3.jpg'},
+]
+
+
+def test_rows_match_apply_shipping():
+    table = ProductTable.from_products(PRODUCTS)
+    expected = apply_shipping(PRODUCTS, 50.0)
+    assert [dict(row) for row in table.iter_rows(50.0)] == [
+        {column: product[column] for column in table.columns} for product in expected
+    ]
+
+
+def test_prices_are_numpy_columns_over_the_parsed_buffer():
+    if np is None:
+        pytest.skip('numpy não instalado')
+    table = ProductTable.from_products(PRODUCTS)
+    assert isinstance(table.brl, np.ndarray) and table.brl.dtype == np.float64
+    final = table.final_prices(50.0)
+    assert final[0] == 5450.0 and math.isnan(final[1])
+
+
+def test_currency_conversions():
+    table = ProductTable.from_products(PRODUCTS)
+    assert list(table.usd_in_brl(5.0))[0] == 5000.0
+    assert list(table.brl_in_usd(5.4))[0] == pytest.approx(1000.0)
+    rates = list(table.implied_rates())
+    assert rates[0] == pytest.approx(5.4) and math.isnan(rates[1])
+    with pytest.raises(ValueError):
+        table.brl_in_usd(0)
+
+
+@pytest.mark.skipif(pa is None, reason='pyarrow não instalado')
+def test_arrow_prices_share_the_column_buffer():
+    table = ProductTable.from_products(PRODUCTS)
+    column = table.to_arrow(0.0).column('Preço (R$)').chunk(0)
+    assert column.null_count == 1
+    assert column.buffers()[1].address == table.brl.ctypes.data
+
+
+@pytest.mark.skipif(pa is None, reason='pyarrow não instalado')
+@pytest.mark.parametrize('fmt', ['arrow', 'parquet'])
+def test_arrow_and_parquet_are_streamed_in_batches(fmt, monkeypatch):
+    monkeypatch.setattr('results.ARROW_BATCH_ROWS', 2)
+    table = ProductTable.from_products(PRODUCTS * 3)
+    chunks, _, _ = export(table, fmt, shipping_cost=50.0)
+    chunks = list(chunks)
+    assert len(chunks) > 2
+    data = io.BytesIO(b''.join(chunks))
+    if fmt == 'arrow':
+        result = pa.ipc.open_file(data).read_all()
+    else:
+        result = pq.read_table(data, use_threads=False)
+    assert result.num_rows == 9
+    assert result.column('Preço Final (R$)').to_pylist()[:2] == [5450.0, None]
+
+
+def test_cli_spreadsheet_keeps_the_scraped_columns(tmp_path):
+    openpyxl = pytest.importorskip('openpyxl')
+    from scraper import save_to_excel
+
+    path = tmp_path / 'produtos.xlsx'
+    save_to_excel(PRODUCTS, str(path))
+    rows = list(openpyxl.load_workbook(path).active.values)
+    assert list(rows[0]) == ['Nome', 'Preço (US$)', 'Preço (R$)', 'Link', 'Imagem']
+    assert list(rows[1])[:3] == ['iPhone', 1000.0, 5400.0]
+    assert list(rows[2])[1:3] == [None, None]
@@ -0,0 +1,20 @@
+import threading
+
+from scheduler import WatchScheduler
+
+
+def test_added_term_runs_without_waiting_for_the_idle_timeout():
+    ran = threading.Event()
+
+    def refresh(term, interval):
+        ran.set()
+        return {'count': 0}
+
+    scheduler = WatchScheduler(refresh, jitter=0, min_gap=0)
+    scheduler.start()
+    try:
+        # Sem termos o loop dorme até 60s; o add() precisa acordá-lo
+        scheduler.add('iphone', 1800)
+        assert ran.wait(5)
+    finally:
+        scheduler.stop()
@@ -0,0 +1,111 @@
+import time
+
+import pytest
+
+from store import PriceStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PriceStore(path=str(tmp_path / 'produtos.db'))
+    yield store
+    store.close()
+
+
+def offer(pid, price, name=None, link=None):
+    return {
+        'Nome': name or f'Produto {pid}',
+        'Link': link or f'https://site/produto_{pid}/',
+        'Imagem': f'https://img/{pid}.jpg',
+        'Preço (US$)': str(price),
+        'Preço (R$)': str(price * 5),
+    }
+
+
+def test_record_scrape_upserts_and_observes_only_price_changes(store):
+    first = store.record_scrape('iPhone', [offer(1, 100), offer(2, 200)], scraped_at=1000)
+    assert first['stored'] == 2 and first['price_changes'] == 2
+
+    second = store.record_scrape('iphone', [offer(1, 100), offer(2, 150, name='Produto 2 novo')], scraped_at=2000)
+    assert second['price_changes'] == 1
+    product = store.get_product(2)
+    assert product['Nome'] == 'Produto 2 novo'
+    assert product['Preço (US$)'] == '150.0'
+    assert [point['Preço (US$)'] for point in store.price_series(2)] == ['200.0', '150.0']
+    assert [point['Preço (US$)'] for point in store.price_series(1)] == ['100.0']
+    assert [p['ID'] for p in store.price_drops('iphone')] == [2]
+
+
+def test_rows_without_id_are_not_stored_under_another_product(store):
+    store.record_scrape('watch', [offer(500, 400, name='Apple Watch 46mm')], scraped_at=1000)
+    result = store.record_scrape('watch', [
+        offer(500, 400, name='Apple Watch 46mm'),
+        offer(None, 10, name='Apple Watch 46 mm', link='https://loja/sem-id'),
+    ], scraped_at=2000)
+    assert result['stored'] == 1 and result['skipped'] == 1
+    product = store.get_product(500)
+    assert product['Link'] == 'https://site/produto_500/'
+    assert product['Preço (US$)'] == '400.0'
+
+
+def changes_of(store, term):
+    return sorted((change['ID'], change['change']) for change in store.watch_changes(term))
+
+
+def test_watch_diff_ignores_interactive_scrapes(store):
+    store.add_watch('iphone', 1800)
+    first = store.record_scrape('iphone', [offer(1, 100), offer(2, 200), offer(3, 300)], watch=True, scraped_at=1000)
+    assert first['changes'] is None
+
+    # /scrape interativo com max_products: não registra 'removed' nem muda a base
+    interactive = store.record_scrape('iphone', [offer(1, 100)], scraped_at=1500)
+    assert interactive['changes'] is None
+
+    second = store.record_scrape('iphone', [offer(1, 90), offer(2, 200), offer(3, 300)], watch=True, scraped_at=2000)
+    assert second['changes'] == {'added': 0, 'removed': 0, 'price_changed': 1}
+    assert changes_of(store, 'iphone') == [(1, 'price_changed')]
+
+
+def test_watch_diff_uses_prices_of_previous_snapshot(store):
+    store.add_watch('iphone', 1800)
+    store.record_scrape('iphone', [offer(1, 100), offer(2, 200)], watch=True, scraped_at=1000)
+    # Outro termo atualiza o preço global do produto 1
+    store.record_scrape('apple', [offer(1, 80)], scraped_at=1500)
+
+    result = store.record_scrape('iphone', [offer(1, 80), offer(4, 400)], watch=True, scraped_at=2000)
+    assert result['changes'] == {'added': 1, 'removed': 1, 'price_changed': 1}
+    changes = {change['ID']: change for change in store.watch_changes('iphone')}
+    assert changes[1]['Preço Anterior (US$)'] == '100.0' and changes[1]['Preço (US$)'] == '80.0'
+    assert changes[2]['change'] == 'removed' and changes[2]['Preço Anterior (US$)'] == '200.0'
+    assert changes[4]['change'] == 'added'
+
+
+def test_unwatched_term_records_no_changes(store):
+    result = store.record_scrape('ipad', [offer(1, 100)], watch=True)
+    assert result['changes'] is None
+    assert store.watch_changes('ipad') == []
+
+
+def test_record_scrape_does_not_compact(store, monkeypatch):
+    store.compact_interval = 0
+    monkeypatch.setattr(store, 'compact', lambda *args, **kwargs: pytest.fail('compact() na gravação'))
+    store.record_scrape('iphone', [offer(1, 100)])
+
+
+def test_compact_keeps_last_observation_of_recent_products(store):
+    now = time.time()
+    store.record_scrape('iphone', [offer(1, 100), offer(2, 200)], scraped_at=now - 10 * 86400)
+    store.record_scrape('iphone', [offer(1, 100)], scraped_at=now)
+    removed = store.compact(retention_days=1)
+    assert removed['products'] == 1 and removed['observations'] == 0
+    assert store.get_product(2) is None
+    assert [point['Preço (US$)'] for point in store.price_series(1)] == ['100.0']
+
+
+def test_stats_counts_are_cached(store):
+    store.record_scrape('iphone', [offer(1, 100)])
+    assert store.stats()['products'] == 1
+    store.record_scrape('iphone', [offer(2, 100)])
+    assert store.stats()['products'] == 1
+    store.stats_ttl = 0
+    assert store.stats()['products'] == 2
@@ -0,0 +1,76 @@
+import json
+import threading
+
+from cache import ResultCache
+
+
+def product(pid):
+    return {'Nome': f'Produto {pid}', 'Preço (US$)': '10.0', 'Preço (R$)': '55.0',
+            'Link': f'https://site/produto_{pid}/', 'Imagem': 'N/A'}
+
+
+def read_stream(client, body):
+    lines = [json.loads(line) for line in client.post('/scrape/stream', json=body).get_data(as_text=True).splitlines()]
+    return [line['product']['Nome'] for line in lines if line['type'] == 'product'], lines[-1]
+
+
+def test_flight_follow_replays_published_items():
+    cache = ResultCache()
+    release = threading.Event()
+
+    def compute(publish):
+        publish(1)
+        assert release.wait(5)
+        publish(2)
+        return [1, 2]
+
+    flight, status = cache.join_or_start('k', compute)
+    joined, joined_status = cache.join_or_start('k', compute)
+    assert (status, joined_status) == ('miss', 'coalesced') and joined is flight
+    follower = flight.follow()
+    assert next(follower) == 1
+    release.set()
+    assert list(follower) == [2]
+    assert flight.value == [1, 2]
+    assert cache.lookup('k') == ([1, 2], 'hit')
+
+
+def test_concurrent_streams_share_one_scrape(web, monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fake_iter_search(search_term, info=None, **kwargs):
+        calls.append(search_term)
+        info.update(engine='http', failed_pages=[])
+        yield product(1)
+        started.set()
+        assert release.wait(5)
+        yield product(2)
+
+    monkeypatch.setattr(web, 'iter_search', fake_iter_search)
+    monkeypatch.setattr(web, 'save_scrape', lambda *args, **kwargs: None)
+    body = {'search_term': 'stream coalescido', 'shipping_cost': 10}
+    results = {}
+
+    def run(name):
+        results[name] = read_stream(web.app.test_client(), body)
+
+    first = threading.Thread(target=run, args=('first',))
+    first.start()
+    assert started.wait(5)
+    second = threading.Thread(target=run, args=('second',))
+    second.start()
+    # O segundo stream entra no cálculo em andamento antes de a busca terminar
+    second.join(0.2)
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert calls == ['stream coalescido']
+    assert results['first'][0] == results['second'][0] == ['Produto 1', 'Produto 2']
+    assert results['first'][1]['cache'] == 'miss'
+    assert results['second'][1]['cache'] == 'coalesced'
+    # O resultado fica no cache para o próximo stream
+    names, done = read_stream(web.app.test_client(), body)
+    assert names == ['Produto 1', 'Produto 2'] and done['cache'] == 'hit'
@@ -0,0 +1,133 @@
+import time
+
+import pytest
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.remote.webelement import WebElement
+
+import scraper
+from scraper import PAGE_STATE_JS, accept_cookie_banner, load_search_page, scroll_until_settled, wait_for_products
+
+
+class FakeDriver:
+    """Driver que responde ao PAGE_STATE_JS com estados pré-definidos (o último se repete)"""
+
+    def __init__(self, states, banner=None):
+        self.states = list(states)
+        self.banner = banner
+        self.scrolls = 0
+        self.urls = []
+
+    def get(self, url):
+        self.urls.append(url)
+
+    def execute_script(self, script, *args):
+        if script == PAGE_STATE_JS:
+            return self.states.pop(0) if len(self.states) > 1 else self.states[0]
+        if 'scrollTo' in script:
+            self.scrolls += 1
+        return None
+
+    def find_element(self, by, value):
+        if self.banner is None:
+            raise NoSuchElementException('sem banner')
+        return self.banner
+
+    def find_elements(self, by, value):
+        return [self.banner] if self.banner is not None else []
+
+    def get_cookies(self):
+        return [{'name': 'consent'}] if self.banner is not None and self.banner.clicked else []
+
+
+class FakeButton(WebElement):
+    def __init__(self):
+        self.clicked = False
+
+    def is_displayed(self):
+        return not self.clicked
+
+    def is_enabled(self):
+        return True
+
+    def click(self):
+        self.clicked = True
+
+
+def state(cards, resources=10, pending=0, ready='complete', height=1000):
+    return [cards, resources, pending, ready, height]
+
+
+@pytest.fixture(autouse=True)
+def fast_waits(monkeypatch):
+    monkeypatch.setattr(scraper, 'NETWORK_IDLE_SECONDS', 0.2)
+    monkeypatch.setattr(scraper, 'SCROLL_WAIT_TIMEOUT', 2)
+    monkeypatch.setattr(scraper, 'COOKIE_WAIT_TIMEOUT', 0.3)
+    monkeypatch.setattr(scraper, 'remember_consent_cookies', lambda cookies: None)
+
+
+def test_new_cards_end_the_wait_immediately():
+    started = time.monotonic()
+    result = wait_for_products(FakeDriver([state(20)]), previous_cards=10)
+    assert result['cards'] == 20
+    assert time.monotonic() - started < 0.2
+
+
+def test_waits_for_the_network_to_go_idle():
+    driver = FakeDriver([state(10, pending=2), state(10, pending=1), state(10, resources=12), state(10, resources=12)])
+    started = time.monotonic()
+    result = wait_for_products(driver, previous_cards=10)
+    elapsed = time.monotonic() - started
+    # Só conta como ociosa depois de NETWORK_IDLE_SECONDS sem requisições nem recursos novos
+    assert 0.2 <= elapsed < 1.5
+    assert result['resources'] == 12 and result['pending'] == 0
+
+
+def test_busy_page_gives_up_after_the_timeout():
+    started = time.monotonic()
+    result = wait_for_products(FakeDriver([state(10, pending=1)]), previous_cards=10, timeout=0.3)
+    assert 0.3 <= time.monotonic() - started < 1.0
+    assert result['pending'] == 1
+
+
+def test_scroll_stops_when_nothing_new_loads():
+    driver = FakeDriver([state(10, height=1000), state(20, height=2000), state(30, height=3000), state(30, height=3000)])
+    scroll_until_settled(driver)
+    assert driver.scrolls == 3
+
+
+def test_scroll_is_capped():
+    driver = FakeDriver([state(n * 10, height=n * 1000) for n in range(1, 10)])
+    scroll_until_settled(driver, max_scroll_attempts=2)
+    assert driver.scrolls == 2
+
+
+def test_cookie_banner_is_clicked_when_it_shows_up():
+    button = FakeButton()
+    accept_cookie_banner(FakeDriver([state(0)], banner=button))
+    assert button.clicked
+
+
+def test_missing_banner_waits_only_the_cookie_timeout():
+    started = time.monotonic()
+    accept_cookie_banner(FakeDriver([state(0)]))
+    assert time.monotonic() - started < 1.0
+    # Com o consentimento reaplicado o banner é só conferido, sem espera
+    started = time.monotonic()
+    accept_cookie_banner(FakeDriver([state(0)]), consent_applied=True)
+    assert time.monotonic() - started < 0.1
+
+
+@pytest.mark.parametrize('mode, expected', [
+    ('events', ['accept_cookie_banner', 'scroll_until_settled']),
+    ('fixed', ['_accept_cookies_fixed', '_scroll_fixed']),
+])
+def test_wait_mode_selects_the_waits(monkeypatch, mode, expected):
+    calls = []
+    for name in ('accept_cookie_banner', 'scroll_until_settled', '_accept_cookies_fixed', '_scroll_fixed'):
+        monkeypatch.setattr(scraper, name, lambda *args, name=name, **kwargs: calls.append(name))
+    monkeypatch.setattr(scraper, 'apply_consent_cookies', lambda driver: False)
+    monkeypatch.setattr(scraper, 'SELENIUM_WAIT_MODE', mode)
+    driver = FakeDriver([state(0)])
+    load_search_page(driver, 'https://comprasparaguai.com.br/busca/?q=capa')
+    assert calls == expected
+    assert driver.urls == ['https://comprasparaguai.com.br/busca/?q=capa']